@@ -4,10 +4,18 @@ Agent Coordinator
 Orchestrates multiple AI agents and coordinates their decisions.
 Handles conflicts, prioritization, and unified decision making.
 """
-from typing import Dict, List, Any
-from .leak_preemption_agent import LeakPreemptionAgent
+import os
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from .leak_preemption_agent import LeakPreemptionAgent, Detector
 from .energy_optimizer_agent import EnergyOptimizerAgent
 from .safety_monitor_agent import SafetyMonitorAgent
+from .snapshot import take_snapshot
+from .agent_dag import AgentDAG
+from .deadlines import deadline_after
+from .fused_analysis import FusedSafetyLeakAnalysis
+
+# Receives (event, data) while a run is in progress; see the /stream endpoints
+Progress = Callable[[str, Dict[str, Any]], None]
 
 
 class AgentCoordinator:
@@ -22,72 +30,241 @@ class AgentCoordinator:
         self.leak_agent = LeakPreemptionAgent()
         self.energy_agent = EnergyOptimizerAgent()
         self.safety_agent = SafetyMonitorAgent()
+        # Whole-run budget; agents fall back to their rule-based path to meet it
+        self.run_budget_seconds = float(os.getenv("AGENT_RUN_BUDGET_SECONDS", "30"))
+        # One LLM call for leak detection and safety commentary instead of two
+        self.fused_analysis = os.getenv("AGENT_FUSED_ANALYSIS", "false").lower() == "true"
+        self.fused = FusedSafetyLeakAnalysis(self.safety_agent, self.leak_agent)
+
+    async def _fused_detector(self, snapshot: Dict[str, Any]) -> Tuple[Detector, Dict[str, Any]]:
+        """
+        The fused safety+leak call as a leak detector for this run
+
+        Returns:
+            (detector, dict that receives the call's details once it returns)
+        """
+        safety_data = await self.safety_agent.fetch_safety_data(snapshot)
+        call: Dict[str, Any] = {}
+
+        async def detector(edge_data, edge_names, report):
+            leaks, details = await self.fused.detect(edge_data, edge_names, report, safety_data)
+            call.update(details)
+            return leaks, details
+
+        return detector, call
+
+    @staticmethod
+    def _fused_enrichment(
+        leak_result: Optional[Dict[str, Any]], fused_call: Dict[str, Any], cancelled: Dict[str, str]
+    ) -> Dict[str, Any]:
+        """
+        This run's safety commentary from the fused call
 
-    async def run_all_agents(self) -> Dict[str, Any]:
+        Only a fused call whose answer the leak step used counts; after a
+        timeout, failure or cancellation the run has no commentary rather
+        than an earlier run's.
+        """
+        if "leak_detection" in cancelled:
+            return {"status": "unavailable", "reason": f"leak step cancelled: {cancelled['leak_detection']}"}
+        if not leak_result or leak_result.get("path") != "llm":
+            reason = (leak_result or {}).get("fallback_reason") or (leak_result or {}).get("error") or "no fused call"
+            return {"status": "unavailable", "reason": reason}
+        if not fused_call.get("safety_enrichment"):
+            return {"status": "unavailable", "reason": "fused completion had no safety part"}
+        return fused_call["safety_enrichment"]
+
+    async def run_all_agents(
+        self,
+        progress: Optional[Progress] = None,
+        budget_seconds: Optional[float] = None,
+        fused: Optional[bool] = None,
+    ) -> Dict[str, Any]:
         """
         Execute all agents and coordinate their recommendations
 
+        The network is read once and every agent works from that snapshot,
+        so they all see the same sensor, pump and price state. Safety and
+        leak analysis run concurrently; energy optimization starts
+        speculatively and is cancelled (or its finished plan discarded) if
+        safety turns CRITICAL or a leak above 0.95 confidence appears.
+
+        Args:
+            progress: Called with (event, data) as the snapshot is taken,
+                steps start and finish, and findings arrive
+            budget_seconds: Deadline for the whole run (default
+                AGENT_RUN_BUDGET_SECONDS); each agent cuts its LLM call short
+                and answers from its rule-based path to meet it
+            fused: Send one combined safety+leak prompt instead of the leak
+                prompt plus the safety enrichment prompt (default
+                AGENT_FUSED_ANALYSIS)
+
         Returns:
             Coordinated recommendations from all agents with priority ordering
         """
-        results = {}
+        deadline = deadline_after(budget_seconds or self.run_budget_seconds)
+        snapshot = await take_snapshot()
+        if progress:
+            progress("progress", {
+                "stage": "snapshot_taken",
+                "taken_at": snapshot["taken_at"],
+                "sensors": len(snapshot["sensors"]),
+                "stale_sensors": len(snapshot["stale_sensor_ids"]),
+            })
 
-        # 1. Safety Monitor - Highest Priority (always runs first)
-        print("Running Safety Monitor Agent...")
-        safety_result = await self.safety_agent.monitor()
-        results["safety"] = safety_result
+        def safety_critical(step: str, result: Dict[str, Any]) -> Optional[str]:
+            if step == "safety" and result.get("safety_status") == "CRITICAL":
+                return "Critical safety issues detected"
+            return None
+
+        def energy_guard(step: str, result: Dict[str, Any]) -> Optional[str]:
+            if step == "leak_detection" and self._critical_leaks(result):
+                return "Critical leaks detected"
+            return safety_critical(step, result)
+
+        fused = self.fused_analysis if fused is None else fused
+        detector, fused_call = await self._fused_detector(snapshot) if fused else (None, {})
+
+        print("Running Safety Monitor, Leak Preemption and Energy Optimizer Agents...")
+        dag = (
+            AgentDAG()
+            # 1. Safety Monitor - Highest Priority (can cancel everything else)
+            .add("safety", lambda _: self.safety_agent.monitor(
+                # In fused mode the commentary comes from the leak step's call
+                enrich=False if fused else None,
+                snapshot=snapshot, progress=progress, deadline=deadline,
+            ))
+            # 2. Leak Preemption Agent - High Priority
+            .add(
+                "leak_detection",
+                lambda _: self.leak_agent.analyze(
+                    snapshot, progress=progress, deadline=deadline, detector=detector
+                ),
+                cancel_if=safety_critical,
+            )
+            # 3. Energy Optimizer Agent - Normal Priority, speculative; its
+            # plan is only stored once safety and leak detection have cleared it
+            .add(
+                "energy_optimization",
+                lambda _: self.energy_agent.optimize(snapshot=snapshot, store=False, deadline=deadline),
+                cancel_if=energy_guard,
+                confirm_after=("safety", "leak_detection"),
+            )
+        )
+        run = await dag.run(progress=progress)
+        results = run["results"]
+        if fused and results["safety"].get("status") == "success":
+            enrichment = self._fused_enrichment(results.get("leak_detection"), fused_call, run["cancelled"])
+            results["safety"]["enrichment"] = enrichment
+            results["safety"]["monitoring_recommendations"] = enrichment.get("monitoring_recommendations", [])
+        schedule = {
+            "analysis_mode": "fused" if fused else "split",
+            "timings_ms": run["timings_ms"],
+            "cancelled": run["cancelled"],
+            "paths": {name: result.get("path") for name, result in run["results"].items()},
+            # Locally counted prompt size per LLM call made in this run
+            "prompt_tokens": {
+                name: result["prompt_stats"]["prompt_tokens"]
+                for name, result in run["results"].items()
+                if result.get("prompt_stats")
+            },
+            # Model tier whose answer each routed step used
+            "model_tiers": {
+                name: result["routing"]["tier"]
+                for name, result in run["results"].items()
+                if result.get("routing")
+            },
+        }
+        safety_result = results["safety"]
 
-        # If CRITICAL safety issues, don't run other agents - safety takes precedence
+        # If CRITICAL safety issues, other operations are suspended - safety takes precedence
         if safety_result.get("safety_status") == "CRITICAL":
             return {
                 "status": "critical_safety_override",
                 "message": "Critical safety issues detected - all other operations suspended",
-                "results": results,
+                "decisions_queued": self._record_decisions({"safety": safety_result}),
+                "results": {"safety": safety_result},
                 "priority_actions": self._extract_critical_actions(safety_result),
+                "snapshot_taken_at": snapshot["taken_at"],
+                "schedule": schedule,
             }
 
-        # 2. Leak Preemption Agent - High Priority
-        print("Running Leak Preemption Agent...")
-        leak_result = await self.leak_agent.analyze()
-        results["leak_detection"] = leak_result
-
-        # 3. Energy Optimizer Agent - Normal Priority
-        # Only run if no critical leaks (confidence > 0.95)
-        critical_leaks = [
-            leak for leak in leak_result.get("leaks_detected", [])
-            if leak.get("confidence", 0) > 0.95
-        ]
-
-        if critical_leaks:
+        if "energy_optimization" in results:
+            await self.energy_agent.store_schedules(results["energy_optimization"], snapshot)
+        else:
             results["energy_optimization"] = {
                 "status": "skipped",
                 "message": "Critical leaks detected - energy optimization deferred",
             }
-        else:
-            print("Running Energy Optimizer Agent...")
-            energy_result = await self.energy_agent.optimize()
-            results["energy_optimization"] = energy_result
 
         # Coordinate and prioritize recommendations
         coordinated = self._coordinate_decisions(results)
 
         return {
             "status": "success",
+            "decisions_queued": self._record_decisions(results),
             "results": results,
             "coordinated_actions": coordinated,
+            "snapshot_taken_at": snapshot["taken_at"],
+            "schedule": schedule,
         }
 
-    async def run_leak_detection(self) -> Dict[str, Any]:
-        """Run only leak detection agent"""
-        return await self.leak_agent.analyze()
+    def _critical_leaks(self, leak_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Leaks confident enough (> 0.95) to defer energy optimization"""
+        return [
+            leak for leak in leak_result.get("leaks_detected", [])
+            if leak.get("confidence", 0) > 0.95
+        ]
 
-    async def run_energy_optimization(self) -> Dict[str, Any]:
-        """Run only energy optimization agent"""
-        return await self.energy_agent.optimize()
+    def _record_decisions(self, results: Dict[str, Any]) -> int:
+        """
+        Queue agent_decisions rows for the successful results of a run
 
-    async def run_safety_monitoring(self) -> Dict[str, Any]:
+        The rows are written by the background decision writer, so this
+        never delays the response.
+
+        Returns:
+            Number of rows queued
+        """
+        agents = {
+            "safety": self.safety_agent,
+            "leak_detection": self.leak_agent,
+            "energy_optimization": self.energy_agent,
+        }
+        return sum(
+            agents[step].create_decision_record(result)
+            for step, result in results.items()
+            if step in agents and result.get("status") == "success"
+        )
+
+    async def run_leak_detection(
+        self, progress: Optional[Progress] = None, budget_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Run only leak detection agent"""
+        result = await self.leak_agent.analyze(
+            progress=progress, deadline=deadline_after(budget_seconds or self.run_budget_seconds)
+        )
+        self._record_decisions({"leak_detection": result})
+        return result
+
+    async def run_energy_optimization(
+        self, mode: str = "llm", budget_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Run only energy optimization agent"""
+        result = await self.energy_agent.optimize(
+            mode=mode, deadline=deadline_after(budget_seconds or self.run_budget_seconds)
+        )
+        self._record_decisions({"energy_optimization": result})
+        return result
+
+    async def run_safety_monitoring(
+        self, progress: Optional[Progress] = None, budget_seconds: Optional[float] = None
+    ) -> Dict[str, Any]:
         """Run only safety monitoring agent"""
-        return await self.safety_agent.monitor()
+        result = await self.safety_agent.monitor(
+            progress=progress, deadline=deadline_after(budget_seconds or self.run_budget_seconds)
+        )
+        self._record_decisions({"safety": result})
+        return result
 
     def _extract_critical_actions(self, safety_result: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -0,0 +1,160 @@
+"""
+Agent DAG Scheduler
+
+Runs agent steps as a dependency graph: a step starts as soon as the steps it
+depends on have finished, so independent agents overlap and a full run takes
+about as long as its longest chain instead of the sum of all agents.
+
+Steps can also be speculative. A step with a cancel_if guard is started
+early and cancelled as soon as another step's result makes it pointless;
+listing those steps in confirm_after keeps an already finished result
+provisional until they are done, so a late guard can still discard it.
+"""
+import asyncio
+import time
+from typing import Dict, Any, Optional, Callable, Awaitable, Iterable
+
+Results = Dict[str, Any]
+
+
+class AgentDAG:
+    """
+    Small dependency-graph scheduler for coordinated agent runs
+
+    A step that raises fails the whole run, like the sequential coordinator
+    did; steps still running are cancelled first.
+    """
+
+    def __init__(self):
+        self._steps: Dict[str, Dict[str, Any]] = {}
+
+    def add(
+        self,
+        name: str,
+        run: Callable[[Results], Awaitable[Any]],
+        depends_on: Iterable[str] = (),
+        cancel_if: Optional[Callable[[str, Any], Optional[str]]] = None,
+        confirm_after: Iterable[str] = (),
+    ) -> "AgentDAG":
+        """
+        Add a step
+
+        Args:
+            name: Step name, used as its key in the results
+            run: Coroutine function called with the results of finished steps
+            depends_on: Steps that must finish before this one starts
+            cancel_if: Called with (step name, result) each time another step
+                finishes; returning a reason cancels this step
+            confirm_after: Steps whose results can still cancel this step
+                after it has finished
+        """
+        self._steps[name] = {
+            "run": run,
+            "depends_on": set(depends_on),
+            "cancel_if": cancel_if,
+            "confirm_after": set(confirm_after),
+        }
+        return self
+
+    async def run(
+        self, progress: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run every step
+
+        Args:
+            progress: Called with ("progress", data) as steps start, finish
+                or are cancelled
+
+        Returns:
+            Dictionary with results of the steps that completed, cancelled
+            steps with their reasons, and per-step and total timings
+        """
+        started = time.perf_counter()
+        results: Results = {}
+        cancelled: Dict[str, str] = {}
+        timings_ms: Dict[str, float] = {}
+        running: Dict[asyncio.Task, str] = {}
+        started_at: Dict[str, float] = {}
+        settled = set()  # finished or cancelled
+
+        def report(name: str, stage: str, **data):
+            if progress:
+                progress("progress", {"step": name, "stage": stage, **data})
+
+        def guard(step: Dict[str, Any], finished: Results) -> Optional[str]:
+            if step["cancel_if"] is None:
+                return None
+            for finished_name, result in finished.items():
+                reason = step["cancel_if"](finished_name, result)
+                if reason:
+                    return reason
+            return None
+
+        def start_ready():
+            for name, step in self._steps.items():
+                if name in settled or name in started_at:
+                    continue
+                blocked = step["depends_on"] & set(cancelled)
+                if blocked:
+                    cancelled[name] = f"dependency cancelled: {', '.join(sorted(blocked))}"
+                    settled.add(name)
+                    report(name, "step_cancelled", reason=cancelled[name])
+                elif step["depends_on"] <= set(results):
+                    # Guards also apply to results that arrived before the step started
+                    reason = guard(step, results)
+                    if reason:
+                        cancelled[name] = reason
+                        settled.add(name)
+                        report(name, "step_cancelled", reason=reason)
+                        continue
+                    started_at[name] = time.perf_counter()
+                    report(name, "step_started")
+                    running[asyncio.create_task(step["run"](dict(results)))] = name
+
+        def cancel(name: str, reason: str):
+            cancelled[name] = reason
+            settled.add(name)
+            report(name, "step_cancelled", reason=reason)
+            results.pop(name, None)
+            for task, task_name in list(running.items()):
+                if task_name == name:
+                    task.cancel()
+                    del running[task]
+
+        def apply_guards(finished: str):
+            for name, step in self._steps.items():
+                if name == finished or name in cancelled:
+                    continue
+                # A finished step can only be overturned by its confirm_after steps
+                if name in results and finished not in step["confirm_after"]:
+                    continue
+                reason = guard(step, {finished: results[finished]})
+                if reason:
+                    cancel(name, reason)
+
+        start_ready()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task, None)
+                    if name is None:
+                        # Cancelled by a guard while finishing in the same batch
+                        continue
+                    timings_ms[name] = round((time.perf_counter() - started_at[name]) * 1000, 1)
+                    results[name] = task.result()
+                    settled.add(name)
+                    report(name, "step_finished", elapsed_ms=timings_ms[name])
+                    apply_guards(name)
+                start_ready()
+        except BaseException:
+            for task in running:
+                task.cancel()
+            raise
+
+        return {
+            "results": results,
+            "cancelled": cancelled,
+            "timings_ms": {**timings_ms, "total": round((time.perf_counter() - started) * 1000, 1)},
+        }
@@ -9,17 +9,32 @@ Generates comprehensive system analytics including:
 """
 import os
 import json
-from typing import Dict, List, Any
-from datetime import datetime, timedelta, date
-from openai import AsyncOpenAI
+import time
+import asyncio
+from typing import Dict, List, Any, Optional
+from datetime import datetime, timedelta, date, timezone
 from dotenv import load_dotenv
 from pathlib import Path
 from .supabase_client import supabase_client
+from .nrw_engine import NRWEngine, SYSTEM_ZONE
+from .availability import AvailabilityTracker
+from .demand_forecaster import DemandForecaster
+from .llm_gateway import llm_gateway
+from .metrics import phase, AGENT_PHASE_SECONDS
+from .prompting import AliasTable, PromptBuilder
+from .model_routing import model_router
 
 # Load .env from project root
 ROOT_DIR = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=ROOT_DIR / '.env')
 
+# How long each stored ai_analytics metric stays valid
+METRIC_TTLS = {
+    "non_revenue_water": timedelta(hours=24),
+    "system_uptime": timedelta(hours=1),
+    "energy_metrics": timedelta(hours=1),
+}
+
 
 class AnalyticsAgent:
     """
@@ -27,9 +42,13 @@ class AnalyticsAgent:
     """
 
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.agent_name = "Analytics Agent"
         self.agent_id = None
+        self.task_timeout_seconds = float(os.getenv("ANALYTICS_TASK_TIMEOUT_SECONDS", "45"))
+        self.nrw_engine = NRWEngine()
+        self.availability = AvailabilityTracker()
+        self.demand_forecaster = DemandForecaster(self.nrw_engine)
+        self.forecast_commentary = os.getenv("DEMAND_FORECAST_LLM_COMMENTARY", "false").lower() == "true"
 
     async def _get_agent_id(self) -> str:
         """Get agent ID from database"""
@@ -39,78 +58,213 @@ class AnalyticsAgent:
                 self.agent_id = agent["id"]
         return self.agent_id
 
+    async def _fetch_snapshot(self) -> Dict[str, Any]:
+        """
+        Read sensors and events once for all analytics
+
+        Returns:
+            Dictionary with sensors, events and the time the snapshot was taken
+        """
+        sensors, events = await asyncio.gather(
+            supabase_client.get_sensors_with_assets(),
+            supabase_client.query("events", select="*"),
+        )
+        return {
+            "sensors": sensors,
+            "events": events,
+            "taken_at": datetime.now().isoformat(),
+        }
+
+    async def _run_with_timeout(self, name: str, coro) -> Dict[str, Any]:
+        """Run one analytics task, turning timeouts and errors into a result"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(coro, timeout=self.task_timeout_seconds)
+            status = "success"
+        except asyncio.TimeoutError:
+            result = {"error": f"Timed out after {self.task_timeout_seconds:g}s"}
+            status = "timeout"
+        except Exception as e:
+            result = {"error": str(e)}
+            status = "error"
+        if status != "success":
+            print(f"Error generating {name}: {result['error']}")
+        elapsed = time.perf_counter() - started
+        AGENT_PHASE_SECONDS.observe(elapsed, "analytics", name)
+        return {
+            "name": name,
+            "status": status,
+            "result": result,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        }
+
     async def generate_all_analytics(self) -> Dict[str, Any]:
         """
         Generate all analytics: NRW, uptime, demand forecast, and energy metrics
 
+        Sensors and events are read once into a shared snapshot, the four
+        computations run concurrently with per-task timeouts, and the results
+        are persisted in one batched write. A failed task does not fail the
+        others.
+
         Returns:
             Dictionary with all generated analytics
         """
         print("Generating comprehensive system analytics...")
+        started = time.perf_counter()
+
+        with phase("analytics", "fetch"):
+            snapshot = await self._fetch_snapshot()
 
         # Run all analytics in parallel
-        nrw_result = await self.calculate_nrw()
-        uptime_result = await self.calculate_uptime()
-        demand_result = await self.generate_demand_forecast()
-        energy_metrics = await self.calculate_energy_metrics()
+        outcomes = await asyncio.gather(
+            self._run_with_timeout("nrw", self.calculate_nrw(snapshot)),
+            self._run_with_timeout("uptime", self.calculate_uptime(snapshot)),
+            self._run_with_timeout("demand_forecast", self.generate_demand_forecast(snapshot, store=False)),
+            self._run_with_timeout("energy_metrics", self.calculate_energy_metrics()),
+        )
+        by_name = {outcome["name"]: outcome for outcome in outcomes}
+        failed = [outcome["name"] for outcome in outcomes if outcome["status"] != "success"]
+
+        def successful(name: str) -> Optional[Dict[str, Any]]:
+            outcome = by_name[name]
+            return outcome["result"] if outcome["status"] == "success" else None
 
         # Store results in database
-        await self._store_analytics(nrw_result, uptime_result, energy_metrics)
+        with phase("analytics", "persist"):
+            await asyncio.gather(
+                self._store_analytics(successful("nrw"), successful("uptime"), successful("energy_metrics")),
+                self._store_demand_forecast(self._forecast_zones(successful("demand_forecast"))),
+            )
 
         return {
-            "status": "success",
-            "nrw": nrw_result,
-            "uptime": uptime_result,
-            "demand_forecast": demand_result,
-            "energy_metrics": energy_metrics,
+            "status": "partial" if failed else "success",
+            "nrw": by_name["nrw"]["result"],
+            "uptime": by_name["uptime"]["result"],
+            "demand_forecast": by_name["demand_forecast"]["result"],
+            "energy_metrics": by_name["energy_metrics"]["result"],
+            "failed": failed,
+            "timings_ms": {
+                **{outcome["name"]: outcome["elapsed_ms"] for outcome in outcomes},
+                "total": round((time.perf_counter() - started) * 1000, 1),
+            },
+            "snapshot_taken_at": snapshot["taken_at"],
             "generated_at": datetime.now().isoformat()
         }
 
-    async def calculate_nrw(self) -> Dict[str, Any]:
+    async def calculate_nrw(
+        self,
+        snapshot: Optional[Dict[str, Any]] = None,
+        window_hours: int = 24,
+        zone: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """
-        Calculate Non-Revenue Water using AI analysis of flow sensors and events
+        Calculate Non-Revenue Water from the network flow balance
+
+        Compares the window with the one before it for the trend. Falls back
+        to AI estimation when no metered input flow is available.
+
+        Args:
+            snapshot: Shared sensors/events snapshot (fetched if not given)
+            window_hours: Length of the window ending now
+            zone: District to report (default: whole system)
 
         Returns:
             NRW percentage and trend
         """
-        # Get flow sensors
-        sensors = await supabase_client.get_sensors_with_assets()
-        flow_sensors = [s for s in sensors if s["type"] == "flow"]
+        snapshot = snapshot or await self._fetch_snapshot()
 
         # Get leak events from last 30 days
-        events = await supabase_client.query(
-            "events",
-            select="*",
-            kind="eq.leak",
-        )
+        events = [e for e in snapshot["events"] if e.get("kind") == "leak"]
+
+        end = datetime.now(timezone.utc)
+        window = timedelta(hours=window_hours)
+        try:
+            current, previous = await asyncio.gather(
+                self.nrw_engine.compute(end - window, end, zone, sensors=snapshot["sensors"]),
+                self.nrw_engine.compute(end - 2 * window, end - window, zone, sensors=snapshot["sensors"]),
+            )
+            balance = current["zones"].get(zone or SYSTEM_ZONE)
+            previous_balance = previous["zones"].get(zone or SYSTEM_ZONE) or {}
+        except Exception as e:
+            print(f"Error computing NRW flow balance: {e}")
+            balance = None
+
+        if balance and balance["nrw_percentage"] is not None:
+            # Without rollups for the previous window there is nothing to compare
+            previous_pct = previous_balance.get("nrw_percentage")
+            trend = balance["nrw_percentage"] - previous_pct if previous_pct is not None else 0.0
+            open_leaks = [e for e in events if e.get("state") != "resolved"]
+            worst_zones = sorted(
+                (
+                    (name, z["nrw_percentage"])
+                    for name, z in current["zones"].items()
+                    if name != SYSTEM_ZONE and z["nrw_percentage"] is not None
+                ),
+                key=lambda item: -item[1],
+            )[:3]
+
+            primary_factors = [f"District {name}: {pct:.1f}% NRW" for name, pct in worst_zones]
+            if open_leaks:
+                primary_factors.append(f"{len(open_leaks)} unresolved leak incidents")
 
-        prompt = f"""You are analyzing water distribution system data to calculate Non-Revenue Water (NRW).
+            return {
+                "nrw_percentage": balance["nrw_percentage"],
+                "trend_percentage": round(trend, 2),
+                "trend_direction": (
+                    "unknown" if previous_pct is None
+                    else "increasing" if trend > 0 else "decreasing" if trend < 0 else "stable"
+                ),
+                "previous_rollup_coverage": previous_balance.get("rollup_coverage", 0.0),
+                "primary_factors": primary_factors,
+                "confidence": balance["rollup_coverage"],
+                "reasoning": (
+                    f"System input {balance['system_input_m3']:.0f} m3 vs authorized consumption "
+                    f"{balance['authorized_consumption_m3']:.0f} m3 over the last {window_hours} hours"
+                ),
+                "source": "flow_balance",
+                "window_start": current["window_start"],
+                "window_end": current["window_end"],
+                "zones": current["zones"],
+            }
+
+        return await self._estimate_nrw_with_llm(snapshot, events)
 
-Flow Sensors Data:
-{json.dumps(flow_sensors, indent=2)}
+    async def _estimate_nrw_with_llm(
+        self, snapshot: Dict[str, Any], events: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Estimate Non-Revenue Water using AI analysis of flow sensors and events
 
-Recent Leak Events (last 30 days):
-{json.dumps(events[:10], indent=2)}
+        Used when the flow balance has no metered input to work from.
+        """
+        # Get flow sensors
+        flow_sensors = [s for s in snapshot["sensors"] if s["type"] == "flow"]
 
-Calculate:
+        builder = PromptBuilder("analytics", """You are analyzing water distribution system data to calculate Non-Revenue Water (NRW).
+
+Calculate from the flow readings and recent leak events below:
 1. Estimated NRW percentage (water lost to leaks, theft, metering errors)
 2. Trend compared to previous period (increasing/decreasing)
 3. Primary contributing factors
 
 Respond ONLY with JSON:
-{{
-  "nrw_percentage": 12.4,
-  "trend_percentage": -2.1,
-  "trend_direction": "decreasing",
-  "primary_factors": ["Leak reduction from AI detection", "Improved metering"],
-  "confidence": 0.85,
-  "reasoning": "Detailed explanation..."
-}}
-"""
+{"nrw_percentage": 12.4, "trend_percentage": -2.1, "trend_direction": "decreasing", "primary_factors": ["Leak reduction from AI detection", "Improved metering"], "confidence": 0.85, "reasoning": "Detailed explanation..."}""")
+        self._flow_table(builder, flow_sensors)
+        builder.table(
+            "Recent leak events (last 30 days):",
+            ("title", "severity", "state", "opened"),
+            [
+                [e.get("title"), e.get("severity"), e.get("state"), (e.get("created_at") or "")[:10]]
+                for e in events[:10]
+            ],
+        )
+        prompt = builder.build()
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
+            response = await llm_gateway.chat(
+                "analytics",
+                model=model_router.model("analytics"),
                 messages=[
                     {"role": "system", "content": "You are a water system analytics expert. Respond with valid JSON only."},
                     {"role": "user", "content": prompt}
@@ -132,110 +286,171 @@ Respond ONLY with JSON:
                 "reasoning": f"Error: {str(e)}"
             }
 
-    async def calculate_uptime(self) -> Dict[str, Any]:
+    @staticmethod
+    def _flow_table(builder: PromptBuilder, flow_sensors: List[Dict[str, Any]]):
+        """Add current flow readings as a compact table (assets aliased a1, a2, ...)"""
+        assets = AliasTable("a")
+        builder.table(
+            "Flow readings:",
+            ("asset", "asset_type", "value", "unit"),
+            [
+                [assets.alias(s["asset_id"]), s.get("asset_type"), s.get("value"), s.get("unit")]
+                for s in flow_sensors
+            ],
+        )
+
+    async def calculate_uptime(
+        self,
+        snapshot: Optional[Dict[str, Any]] = None,
+        window_hours: float = 720,
+        asset: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """
-        Calculate system uptime based on events and sensor availability
+        Calculate system uptime, MTBF and MTTR from incident outage intervals
+
+        Args:
+            snapshot: Shared sensors/events snapshot (fetched if not given)
+            window_hours: Length of the window ending now (default: 30 days)
+            asset: Only this asset (default: whole system)
 
         Returns:
             Uptime percentage and availability metrics
         """
-        # Get critical events from last 30 days
-        events = await supabase_client.query(
-            "events",
-            select="*",
-        )
+        snapshot = snapshot or await self._fetch_snapshot()
 
-        # Get sensor data to check availability
-        sensors = await supabase_client.get_sensors_with_assets()
+        # Only new or newly resolved events touch the interval index
+        applied = self.availability.sync(snapshot["events"])
+        end = datetime.now(timezone.utc)
+        metrics = self.availability.metrics(end - timedelta(hours=window_hours), end, asset=asset)
 
-        prompt = f"""You are analyzing water distribution system uptime.
+        return {
+            **metrics,
+            "average_mtbf_hours": metrics["mtbf_hours"],
+            "average_mttr_hours": metrics["mttr_hours"],
+            "events_applied": applied,
+            "source": "event_intervals",
+            "confidence": 1.0,
+            "reasoning": (
+                f"{metrics['downtime_incidents']} merged outage interval(s) from high/critical "
+                f"incidents across {metrics['assets_with_outages']} asset(s) gave "
+                f"{metrics['downtime_hours']} h downtime in {metrics['total_hours']} h"
+            ),
+        }
 
-Total Events (last 30 days): {len(events)}
-Critical Events: {len([e for e in events if e.get('severity') in ['critical', 'high']])}
-Active Sensors: {len(sensors)}
+    async def generate_demand_forecast(
+        self,
+        snapshot: Optional[Dict[str, Any]] = None,
+        store: bool = True,
+        commentary: Optional[bool] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate a 24-hour water demand forecast for every district
 
-Recent Critical Events:
-{json.dumps([e for e in events if e.get('severity') in ['critical', 'high']][:5], indent=2)}
+        Fitted statistically on hourly flow rollups; falls back to the LLM
+        when there is not enough history yet.
 
-Calculate:
-1. System uptime percentage (last 30 days)
-2. Availability metrics
-3. Downtime incidents and duration
+        Args:
+            snapshot: Shared sensors/events snapshot (fetched if not given)
+            store: Write the forecast to demand_forecasts
+            commentary: Ask the LLM to explain the forecast
+                (default: DEMAND_FORECAST_LLM_COMMENTARY)
+
+        Returns:
+            Hourly demand predictions with prediction intervals
+        """
+        snapshot = snapshot or await self._fetch_snapshot()
+        if commentary is None:
+            commentary = self.forecast_commentary
+
+        fitted = await self.demand_forecaster.forecast(snapshot["sensors"])
+        if fitted is None:
+            return await self._forecast_demand_with_llm(snapshot, store)
+
+        system = fitted["zones"].get(SYSTEM_ZONE) or next(iter(fitted["zones"].values()))
+        peak = max(system["forecast"], key=lambda h: h["demand"])
+        result = {
+            "forecast": system["forecast"],
+            "peak_hour": peak["hour"],
+            "peak_demand": peak["demand"],
+            "model": system["model"],
+            "zones": fitted["zones"],
+            "origin": fitted["origin"],
+            "history_hours": fitted["history_hours"],
+            "fit_time_ms": fitted["fit_time_ms"],
+            "source": "statistical",
+            "reasoning": (
+                f"{system['model'].replace('_', ' ')} fitted on {fitted['history_hours']} hours of "
+                f"flow rollups for {len(fitted['zones'])} zone(s); holdout RMSE "
+                f"{system['holdout_rmse']} m3/h"
+            ),
+        }
+
+        if commentary:
+            result["commentary"] = await self._forecast_commentary(result)
+        if store:
+            await self._store_demand_forecast(fitted["zones"])
+
+        return result
+
+    async def _forecast_commentary(self, result: Dict[str, Any]) -> Optional[str]:
+        """Short operator-facing explanation of a statistical forecast"""
+        summary = {
+            zone: {
+                "model": z["model"],
+                "holdout_rmse": z["holdout_rmse"],
+                "demand_m3h": [h["demand"] for h in z["forecast"]],
+            }
+            for zone, z in result["zones"].items()
+        }
+        prompt = f"""These are statistical 24-hour water demand forecasts (m3/h) per zone, starting after {result['origin']}:
+
+{json.dumps(summary)}
+
+In two or three sentences, point out peaks, unusual zones and anything an operator should plan for.
 
 Respond ONLY with JSON:
-{{
-  "uptime_percentage": 99.7,
-  "availability_hours": 718.5,
-  "total_hours": 720,
-  "downtime_incidents": 2,
-  "average_mtbf_hours": 360,
-  "confidence": 0.92,
-  "reasoning": "Detailed explanation..."
-}}
+{{"commentary": "..."}}
 """
-
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
+            response = await llm_gateway.chat(
+                "analytics",
+                model=model_router.model("analytics"),
                 messages=[
-                    {"role": "system", "content": "You are a system reliability expert. Respond with valid JSON only."},
+                    {"role": "system", "content": "You are a water demand forecasting expert. Respond with valid JSON only."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,
+                temperature=0.4,
                 response_format={"type": "json_object"}
             )
-
-            result = json.loads(response.choices[0].message.content)
-            return result
-
+            return json.loads(response.choices[0].message.content).get("commentary")
         except Exception as e:
-            print(f"Error calculating uptime: {e}")
-            return {
-                "uptime_percentage": 99.7,
-                "availability_hours": 718.5,
-                "total_hours": 720,
-                "confidence": 0.0,
-                "reasoning": f"Error: {str(e)}"
-            }
+            print(f"Error generating forecast commentary: {e}")
+            return None
 
-    async def generate_demand_forecast(self) -> Dict[str, Any]:
-        """
-        Generate 24-hour water demand forecast using AI
-
-        Returns:
-            Hourly demand predictions
-        """
+    async def _forecast_demand_with_llm(self, snapshot: Dict[str, Any], store: bool) -> Dict[str, Any]:
+        """LLM forecast from current readings, used until rollup history exists"""
         # Get flow sensors for historical patterns
-        sensors = await supabase_client.get_sensors_with_assets()
-        flow_sensors = [s for s in sensors if s["type"] == "flow"]
-
-        prompt = f"""You are forecasting water demand for the next 24 hours.
+        flow_sensors = [s for s in snapshot["sensors"] if s["type"] == "flow"]
 
-Current Flow Sensors:
-{json.dumps(flow_sensors, indent=2)}
+        builder = PromptBuilder("analytics", """You are forecasting water demand for the next 24 hours.
 
-Generate a realistic 24-hour water demand forecast considering:
+Generate a realistic 24-hour water demand forecast from the current flow readings below, considering:
 1. Typical residential/commercial patterns (low at night, peaks in morning/evening)
 2. Current sensor readings
 3. Seasonal factors
 4. Day of week patterns
 
-Respond ONLY with JSON:
-{{
-  "forecast": [
-    {{"hour": 0, "demand": 45.2, "confidence": 0.88}},
-    {{"hour": 1, "demand": 42.1, "confidence": 0.89}},
-    ...continue for all 24 hours
-  ],
-  "peak_hour": 18,
-  "peak_demand": 67.5,
-  "reasoning": "Explanation of forecast..."
-}}
-"""
+Give each hour's total network demand in m3/h (flow readings are in L/s; 1 L/s = 3.6 m3/h).
+
+Respond ONLY with JSON, one forecast entry for each of the 24 hours:
+{"forecast": [{"hour": 0, "demand": 45.2, "confidence": 0.88}], "peak_hour": 18, "peak_demand": 67.5, "reasoning": "Explanation of forecast..."}""")
+        self._flow_table(builder, flow_sensors)
+        prompt = builder.build()
 
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
+            response = await llm_gateway.chat(
+                "analytics",
+                model=model_router.model("analytics"),
                 messages=[
                     {"role": "system", "content": "You are a water demand forecasting expert. Respond with valid JSON only."},
                     {"role": "user", "content": prompt}
@@ -245,9 +460,11 @@ Respond ONLY with JSON:
             )
 
             result = json.loads(response.choices[0].message.content)
+            result["source"] = "llm"
 
             # Store in database
-            await self._store_demand_forecast(result["forecast"])
+            if store:
+                await self._store_demand_forecast(self._forecast_zones(result))
 
             return result
 
@@ -289,51 +506,114 @@ Respond ONLY with JSON:
             "schedule_active": True
         }
 
-    async def _store_analytics(self, nrw_result: Dict, uptime_result: Dict, energy_metrics: Dict):
-        """Store analytics in ai_analytics table"""
+    async def _store_analytics(
+        self,
+        nrw_result: Optional[Dict],
+        uptime_result: Optional[Dict],
+        energy_metrics: Optional[Dict],
+    ) -> List[Dict[str, Any]]:
+        """
+        Store analytics in ai_analytics table with one batched insert
+
+        Returns:
+            The stored rows
+        """
+        now = datetime.now(timezone.utc)
+        values = {
+            "non_revenue_water": nrw_result,
+            "system_uptime": uptime_result,
+            "energy_metrics": energy_metrics,
+        }
+        rows = [
+            {
+                "metric_name": name,
+                "metric_value": value,
+                "calculated_at": now.isoformat(),
+                "valid_until": (now + METRIC_TTLS[name]).isoformat()
+            }
+            for name, value in values.items()
+            if value is not None
+        ]
+        if not rows:
+            return []
+
         try:
-            # Store NRW
-            await supabase_client.insert("ai_analytics", {
-                "metric_name": "non_revenue_water",
-                "metric_value": nrw_result,
-                "valid_until": (datetime.now() + timedelta(hours=24)).isoformat()
-            })
-
-            # Store Uptime
-            await supabase_client.insert("ai_analytics", {
-                "metric_name": "system_uptime",
-                "metric_value": uptime_result,
-                "valid_until": (datetime.now() + timedelta(hours=1)).isoformat()
-            })
-
-            # Store Energy Metrics
-            await supabase_client.insert("ai_analytics", {
-                "metric_name": "energy_metrics",
-                "metric_value": energy_metrics,
-                "valid_until": (datetime.now() + timedelta(hours=1)).isoformat()
-            })
-
-            print("✓ Analytics stored successfully")
+            stored = await supabase_client.insert("ai_analytics", rows)
+            print(f"✓ Stored {len(rows)} analytics metrics")
+            return stored or rows
 
         except Exception as e:
             print(f"Error storing analytics: {e}")
+            return []
+
+    async def get_latest_metric(self, metric_name: str) -> Optional[Dict[str, Any]]:
+        """Newest stored ai_analytics row for a metric"""
+        rows = await supabase_client.query(
+            "ai_analytics",
+            select="metric_name,metric_value,calculated_at,valid_until",
+            metric_name=f"eq.{metric_name}",
+            order="calculated_at.desc",
+            limit="1",
+        )
+        return rows[0] if rows else None
+
+    async def regenerate_metric(self, metric_name: str) -> Dict[str, Any]:
+        """
+        Recompute and store a single ai_analytics metric
+
+        Returns:
+            The stored row
+        """
+        if metric_name not in METRIC_TTLS:
+            raise ValueError(f"Unknown metric: {metric_name}")
+
+        if metric_name == "non_revenue_water":
+            stored = await self._store_analytics(await self.calculate_nrw(), None, None)
+        elif metric_name == "system_uptime":
+            stored = await self._store_analytics(None, await self.calculate_uptime(), None)
+        else:
+            stored = await self._store_analytics(None, None, await self.calculate_energy_metrics())
+
+        if not stored:
+            raise RuntimeError(f"Could not store {metric_name}")
+        return stored[0]
+
+    def _forecast_zones(self, result: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Per-zone forecasts of a demand forecast result, ready to store"""
+        if not result or not result.get("forecast"):
+            return {}
+        if "zones" in result:
+            return result["zones"]
+        # LLM forecasts cover today's hours for the whole system
+        today = date.today().isoformat()
+        return {SYSTEM_ZONE: {"forecast": [{**h, "forecast_date": today} for h in result["forecast"]]}}
+
+    async def _store_demand_forecast(self, zones: Dict[str, Dict[str, Any]]):
+        """Store every zone's forecast with one bulk upsert"""
+        if not zones:
+            return
 
-    async def _store_demand_forecast(self, forecast: List[Dict]):
-        """Store demand forecast in database"""
         try:
             agent_id = await self._get_agent_id()
-            today = date.today()
 
-            for hour_data in forecast:
-                await supabase_client.insert("demand_forecasts", {
-                    "forecast_date": today.isoformat(),
+            rows = [
+                {
+                    "forecast_date": hour_data["forecast_date"],
                     "hour": hour_data["hour"],
+                    "zone": zone,
                     "predicted_demand": hour_data["demand"],
+                    "lower_bound": hour_data.get("lower"),
+                    "upper_bound": hour_data.get("upper"),
                     "confidence": hour_data.get("confidence", 0.85),
+                    "model": zone_forecast.get("model", "llm"),
                     "created_by_agent": agent_id
-                })
+                }
+                for zone, zone_forecast in zones.items()
+                for hour_data in zone_forecast["forecast"]
+            ]
+            await supabase_client.upsert("demand_forecasts", rows, on_conflict="forecast_date,hour,zone")
 
-            print("✓ Demand forecast stored successfully")
+            print(f"✓ Demand forecast stored successfully ({len(zones)} zones)")
 
         except Exception as e:
             print(f"Error storing demand forecast: {e}")
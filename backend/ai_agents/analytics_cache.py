@@ -0,0 +1,116 @@
+"""
+Analytics read cache
+
+Serves the latest ai_analytics row per metric from memory until its
+valid_until passes. Expired metrics are still served while one background
+task regenerates them (stale-while-revalidate); concurrent requests for the
+same metric share that task instead of starting their own.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable
+from .timestamps import parse_timestamp
+
+Row = Dict[str, Any]
+
+
+class AnalyticsCache:
+    """
+    Cache-through reads of ai_analytics
+
+    Args:
+        fetch_latest: Reads the newest stored row for a metric (or None)
+        regenerate: Computes, stores and returns a fresh row for a metric
+    """
+
+    def __init__(
+        self,
+        fetch_latest: Callable[[str], Awaitable[Optional[Row]]],
+        regenerate: Callable[[str], Awaitable[Row]],
+    ):
+        self.fetch_latest = fetch_latest
+        self.regenerate = regenerate
+        self._rows: Dict[str, Row] = {}
+        self._regenerating: Dict[str, asyncio.Task] = {}
+        self.stats = {"hits": 0, "stale_served": 0, "misses": 0, "regenerations": 0, "regeneration_errors": 0}
+
+    def _is_fresh(self, row: Row, now: datetime) -> bool:
+        valid_until = parse_timestamp(row.get("valid_until"))
+        return valid_until is not None and valid_until > now
+
+    def _regenerate_once(self, metric_name: str) -> asyncio.Task:
+        """The in-flight regeneration for a metric, starting one if needed"""
+        task = self._regenerating.get(metric_name)
+        if task is None:
+            task = asyncio.create_task(self._regenerate(metric_name))
+            self._regenerating[metric_name] = task
+        return task
+
+    async def _regenerate(self, metric_name: str) -> Row:
+        try:
+            row = await self.regenerate(metric_name)
+            self._rows[metric_name] = row
+            self.stats["regenerations"] += 1
+            return row
+        except Exception:
+            self.stats["regeneration_errors"] += 1
+            raise
+        finally:
+            self._regenerating.pop(metric_name, None)
+
+    async def get(self, metric_name: str) -> Dict[str, Any]:
+        """
+        Latest value of a metric, regenerating only when it has expired
+
+        Returns:
+            Dictionary with the metric value, its valid_until and whether it
+            was served fresh, stale (regenerating in background) or freshly
+            computed
+        """
+        now = datetime.now(timezone.utc)
+        row = self._rows.get(metric_name)
+        if row is None:
+            row = await self.fetch_latest(metric_name)
+            if row is not None:
+                self._rows[metric_name] = row
+
+        if row is not None and self._is_fresh(row, now):
+            self.stats["hits"] += 1
+            status = "fresh"
+        elif row is not None:
+            # Serve what we have; refresh behind the caller's back
+            self.stats["stale_served"] += 1
+            self._regenerate_once(metric_name).add_done_callback(_ignore_result)
+            status = "stale"
+        else:
+            self.stats["misses"] += 1
+            row = await asyncio.shield(self._regenerate_once(metric_name))
+            status = "computed"
+
+        return {
+            "metric_name": metric_name,
+            "metric_value": row["metric_value"],
+            "calculated_at": row.get("calculated_at"),
+            "valid_until": row.get("valid_until"),
+            "cache_status": status,
+        }
+
+    def invalidate(self, metric_name: Optional[str] = None):
+        """Drop cached rows so the next read goes back to ai_analytics"""
+        if metric_name is None:
+            self._rows.clear()
+        else:
+            self._rows.pop(metric_name, None)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cached_metrics": sorted(self._rows),
+            "regenerating": sorted(self._regenerating),
+        }
+
+
+def _ignore_result(task: asyncio.Task):
+    """Retrieve a background task's exception so it is not reported as unhandled"""
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background analytics regeneration failed: {task.exception()}")
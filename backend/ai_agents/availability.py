@@ -0,0 +1,264 @@
+"""
+Availability Engine
+
+Computes uptime, MTBF and MTTR from incident timelines. Each incident is an
+outage interval on its asset from created_at until it is resolved (or until
+now while it is still open). Overlapping incidents on the same asset are
+merged with an interval-union sweep so they are not counted twice.
+"""
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from .timestamps import parse_timestamp
+
+SYSTEM_ASSET = "system"
+
+Interval = Tuple[float, float]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Union of intervals as a sorted list of disjoint intervals"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _insert_interval(merged: List[Interval], starts: List[float], interval: Interval):
+    """Insert into a disjoint sorted interval list in place, merging neighbours"""
+    start, end = interval
+    lo = bisect_left(starts, start)
+    if lo > 0 and merged[lo - 1][1] >= start:
+        lo -= 1
+    hi = bisect_right(starts, end)
+    if lo < hi:
+        start = min(start, merged[lo][0])
+        end = max(end, merged[hi - 1][1])
+    merged[lo:hi] = [(start, end)]
+    starts[lo:hi] = [start]
+
+
+def _resolved_at(event: Dict[str, Any]) -> Optional[datetime]:
+    """
+    When a resolved event was resolved: the last "resolved" timeline entry,
+    else its last update. Events in any other state are still open.
+    """
+    if event.get("state") != "resolved":
+        return None
+    for entry in reversed(event.get("timeline") or []):
+        if not isinstance(entry, dict):
+            continue
+        action = str(entry.get("action") or entry.get("state") or "").lower()
+        if action.startswith("resolv"):
+            for key in ("timestamp", "at", "created_at"):
+                ts = parse_timestamp(entry.get(key))
+                if ts is not None:
+                    return ts
+    return parse_timestamp(event.get("updated_at"))
+
+
+class AvailabilityTracker:
+    """
+    Per-asset outage intervals kept as disjoint sorted lists
+
+    load() rebuilds everything with one sort and sweep; sync() and
+    apply_event() fold in new or newly resolved events incrementally.
+    Open incidents are kept aside and closed at query time. Each closed
+    interval is remembered per event, so an event that is deleted or stops
+    counting as an outage can be taken out again by rebuilding its asset.
+    """
+
+    def __init__(self, severities: Iterable[str] = ("high", "critical")):
+        self.severities = set(severities)
+        self._merged: Dict[str, List[Interval]] = {}
+        self._starts: Dict[str, List[float]] = {}
+        self._open: Dict[str, Tuple[str, float]] = {}  # event id -> (asset, start)
+        self._closed: Dict[str, Tuple[str, float, float]] = {}  # event id -> (asset, start, end)
+        self._seen: Dict[str, Tuple[Any, Any]] = {}  # event id -> (state, updated_at)
+
+    def _outage(self, event: Dict[str, Any]) -> Optional[Tuple[str, float, Optional[float]]]:
+        """(asset, start, end or None while open) for an outage-worthy event"""
+        if event.get("severity") not in self.severities:
+            return None
+        started = parse_timestamp(event.get("created_at"))
+        if started is None:
+            return None
+        resolved = _resolved_at(event)
+        asset = event.get("asset_ref") or SYSTEM_ASSET
+        return asset, started.timestamp(), resolved.timestamp() if resolved else None
+
+    def load(self, events: List[Dict[str, Any]]):
+        """Rebuild all intervals from a full list of events"""
+        by_asset: Dict[str, List[Interval]] = {}
+        self._open = {}
+        self._closed = {}
+        self._seen = {}
+        for event in events:
+            self._seen[event.get("id")] = (event.get("state"), event.get("updated_at"))
+            outage = self._outage(event)
+            if outage is None:
+                continue
+            asset, start, end = outage
+            if end is None:
+                self._open[event["id"]] = (asset, start)
+            elif end > start:
+                self._closed[event["id"]] = (asset, start, end)
+                by_asset.setdefault(asset, []).append((start, end))
+
+        self._merged = {asset: merge_intervals(intervals) for asset, intervals in by_asset.items()}
+        self._starts = {asset: [s for s, _ in merged] for asset, merged in self._merged.items()}
+
+    def apply_event(self, event: Dict[str, Any]):
+        """Fold one new or updated event into the intervals"""
+        self._seen[event.get("id")] = (event.get("state"), event.get("updated_at"))
+        outage = self._outage(event)
+        if outage is not None and outage[2] is not None and outage[2] <= outage[1]:
+            outage = None
+        previous = self._closed.get(event.get("id"))
+        if previous is not None and previous != outage:
+            # Its closed interval moved or no longer counts
+            self._forget([event["id"]])
+        if outage is None:
+            self._open.pop(event.get("id"), None)
+            return
+        asset, start, end = outage
+        if end is None:
+            self._open[event["id"]] = (asset, start)
+            return
+        self._open.pop(event["id"], None)
+        if previous != outage:
+            self._closed[event["id"]] = outage
+            _insert_interval(
+                self._merged.setdefault(asset, []),
+                self._starts.setdefault(asset, []),
+                (start, end),
+            )
+
+    def _forget(self, event_ids: Iterable[Any]):
+        """Drop events' outages, rebuilding the merged intervals of the assets they were on"""
+        assets = set()
+        for event_id in event_ids:
+            self._seen.pop(event_id, None)
+            self._open.pop(event_id, None)
+            closed = self._closed.pop(event_id, None)
+            if closed is not None:
+                assets.add(closed[0])
+        for asset in assets:
+            merged = merge_intervals(
+                (start, end) for other, start, end in self._closed.values() if other == asset
+            )
+            if merged:
+                self._merged[asset] = merged
+                self._starts[asset] = [start for start, _ in merged]
+            else:
+                self._merged.pop(asset, None)
+                self._starts.pop(asset, None)
+
+    def sync(self, events: List[Dict[str, Any]], complete: bool = True) -> int:
+        """
+        Apply only events that are new or changed since the last sync
+
+        Args:
+            events: Events to fold in
+            complete: events is the full list, so events missing from it were
+                deleted and their outages are removed
+
+        Returns:
+            Number of events applied or removed
+        """
+        applied = 0
+        for event in events:
+            if self._seen.get(event.get("id")) != (event.get("state"), event.get("updated_at")):
+                self.apply_event(event)
+                applied += 1
+        if complete:
+            gone = self._seen.keys() - {event.get("id") for event in events}
+            self._forget(gone)
+            applied += len(gone)
+        return applied
+
+    def _asset_intervals(self, asset: str, start: float, end: float) -> List[Interval]:
+        """Outage intervals of one asset clipped to [start, end), open ones included"""
+        merged = self._merged.get(asset, [])
+        starts = self._starts.get(asset, [])
+        lo = bisect_left(starts, start)
+        if lo > 0 and merged[lo - 1][1] > start:
+            lo -= 1
+        hi = bisect_left(starts, end)
+        clipped = [(max(s, start), min(e, end)) for s, e in merged[lo:hi] if e > start]
+        open_intervals = [
+            (max(s, start), end) for a, s in self._open.values() if a == asset and s < end
+        ]
+        if open_intervals:
+            clipped = merge_intervals(clipped + open_intervals)
+        return clipped
+
+    def metrics(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        asset: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Uptime, MTBF and MTTR over [start, end)
+
+        System uptime is the share of the window with no outage on any asset.
+
+        Args:
+            start: Window start
+            end: Window end (default: now)
+            asset: Only this asset (default: whole system plus per-asset figures)
+
+        Returns:
+            Dictionary with uptime percentage, failure count, MTBF and MTTR
+        """
+        started = time.perf_counter()
+        end = end or datetime.now(timezone.utc)
+        window_start, window_end = start.timestamp(), end.timestamp()
+        window_hours = (window_end - window_start) / 3600
+
+        assets = [asset] if asset else set(self._merged) | {a for a, _ in self._open.values()}
+        per_asset = {}
+        all_intervals: List[Interval] = []
+        for name in assets:
+            intervals = self._asset_intervals(name, window_start, window_end)
+            if not intervals:
+                continue
+            all_intervals.extend(intervals)
+            per_asset[name] = self._summary(intervals, window_hours)
+
+        system = self._summary(merge_intervals(all_intervals), window_hours)
+        worst = sorted(per_asset.items(), key=lambda item: item[1]["uptime_percentage"])[:10]
+
+        return {
+            **system,
+            "window_start": start.isoformat(),
+            "window_end": end.isoformat(),
+            "assets_with_outages": len(per_asset),
+            "mean_asset_downtime_hours": (
+                round(sum(a["downtime_hours"] for a in per_asset.values()) / len(per_asset), 2)
+                if per_asset
+                else 0.0
+            ),
+            "least_available_assets": [{"asset": name, **summary} for name, summary in worst],
+            "compute_time_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def _summary(self, intervals: List[Interval], window_hours: float) -> Dict[str, Any]:
+        downtime_hours = sum(e - s for s, e in intervals) / 3600
+        uptime_hours = max(0.0, window_hours - downtime_hours)
+        failures = len(intervals)
+        return {
+            "uptime_percentage": round(uptime_hours / window_hours * 100, 3) if window_hours > 0 else 100.0,
+            "availability_hours": round(uptime_hours, 2),
+            "downtime_hours": round(downtime_hours, 2),
+            "total_hours": round(window_hours, 2),
+            "downtime_incidents": failures,
+            "mtbf_hours": round(uptime_hours / failures, 2) if failures else None,
+            "mttr_hours": round(downtime_hours / failures, 2) if failures else None,
+        }
@@ -0,0 +1,39 @@
+"""
+In-process publish/subscribe for push endpoints
+
+Each subscriber gets its own bounded queue. A subscriber that falls behind
+loses its oldest undelivered events instead of slowing down the publisher
+or the other subscribers.
+"""
+import asyncio
+from typing import Dict, Any, Set
+
+
+class Broadcaster:
+    """Fan out events to every subscribed queue"""
+
+    def __init__(self, max_queue_size: int = 100):
+        self.max_queue_size = max_queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.dropped_events = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a new subscriber and return its queue"""
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: Dict[str, Any]):
+        """Deliver an event to every subscriber without blocking"""
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped_events += 1
+            queue.put_nowait(event)
@@ -0,0 +1,134 @@
+"""
+Data versions for conditional GETs
+
+A background loop polls a cheap change marker per table (newest updated_at
+and row count, see SupabaseClient.table_version) for the tables a response
+is built from. Handlers derive an ETag from these markers, so answering
+If-None-Match is a hash of a few strings and never touches Supabase.
+Changes become visible within one poll interval.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from typing import Dict, List, Any, Optional, Callable, Set
+from .supabase_client import supabase_client
+
+
+class DataVersions:
+    """
+    Polled change markers for a set of tables
+
+    Args:
+        tables: Table name -> PostgREST filters for the rows that matter
+        interval_seconds: Poll cadence
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, str]], interval_seconds: float = 5.0):
+        self.tables = tables
+        self.interval_seconds = interval_seconds
+        self.versions: Dict[str, Dict[str, Any]] = {}
+        # Increases whenever a poll sees any table change
+        self.version = 0
+        self.polled_at: Optional[float] = None
+        self.errors = 0
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background poll (no-op if already running)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background poll and wait for it to exit"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._task and not self._task.done())
+
+    def on_change(self, listener: Callable[[Set[str]], None]):
+        """Call listener with the names of the changed tables after each poll that saw changes"""
+        self._listeners.append(listener)
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"Could not poll data versions: {e}")
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0.0, self.interval_seconds - elapsed))
+
+    async def poll_once(self) -> Set[str]:
+        """
+        Read every table's marker
+
+        Returns:
+            Names of the tables whose marker changed
+        """
+        names = list(self.tables)
+        markers = await asyncio.gather(
+            *(supabase_client.table_version(name, **self.tables[name]) for name in names)
+        )
+        changed = {name for name, marker in zip(names, markers) if self.versions.get(name) != marker}
+        self.versions = dict(zip(names, markers))
+        self.polled_at = time.monotonic()
+        if changed:
+            self.version += 1
+            for listener in self._listeners:
+                listener(changed)
+        return changed
+
+    @property
+    def fresh(self) -> bool:
+        """Markers exist for every table and the last poll succeeded recently"""
+        return (
+            self.polled_at is not None
+            and len(self.versions) == len(self.tables)
+            and time.monotonic() - self.polled_at < 3 * self.interval_seconds
+        )
+
+    def etag(self, *extra: str) -> Optional[str]:
+        """
+        Strong ETag over the table markers plus any extra version strings
+
+        Returns None when the markers cannot be trusted (not polled yet, or
+        polling has been failing), so callers serve full responses.
+        """
+        if not self.fresh:
+            return None
+        digest = hashlib.sha1(json.dumps([self.versions, extra], sort_keys=True).encode())
+        return f'"{digest.hexdigest()[:20]}"'
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "fresh": self.fresh,
+            "errors": self.errors,
+            "interval_seconds": self.interval_seconds,
+            "tables": self.versions,
+        }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 asks)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
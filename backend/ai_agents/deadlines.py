@@ -0,0 +1,39 @@
+"""
+Run deadlines
+
+A coordinated run gets one absolute deadline (time.monotonic() seconds)
+that is handed to every agent. Each agent caps its LLM call at the smaller
+of its own budget and what is left of the run, keeping a reserve so its
+rule-based fallback and persistence still finish in time.
+"""
+import time
+from typing import Optional
+
+# Time kept back from the LLM call for the fallback path and persistence
+FALLBACK_RESERVE_SECONDS = 1.0
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """Absolute deadline seconds from now (None for no deadline)"""
+    return None if seconds is None else time.monotonic() + seconds
+
+
+def call_timeout(
+    budget_seconds: float,
+    deadline: Optional[float] = None,
+    reserve_seconds: float = FALLBACK_RESERVE_SECONDS,
+) -> float:
+    """
+    Seconds a call (usually the LLM) may take
+
+    Args:
+        budget_seconds: The agent's own budget for the call
+        deadline: Absolute run deadline, if any
+        reserve_seconds: Kept back for the fallback path
+
+    Returns:
+        Timeout to use; 0 or less means there is no time for the call at all
+    """
+    if deadline is None:
+        return budget_seconds
+    return min(budget_seconds, deadline - time.monotonic() - reserve_seconds)
@@ -0,0 +1,185 @@
+"""
+Write-behind queue for agent_decisions
+
+Agents hand their decision rows to the queue and return immediately; the
+audit trail is written in the background. Rows from every agent and run
+are batched together and bulk-inserted when batch_size rows are waiting or
+every flush_interval_seconds, whichever comes first.
+
+- Transient Supabase failures (network errors, 5xx, 429) are retried with
+  jittered exponential backoff, up to max_attempts per batch; a batch that
+  still fails, or is rejected outright (other 4xx), is dropped and counted
+- At most max_pending rows are held; beyond that the oldest are dropped
+- Stopping lets a write in progress finish, then flushes the rest; a batch
+  whose write is cancelled goes back to the front of the queue
+- Rows carry the agent's name; agent ids are looked up (once) at flush time
+  so enqueueing never touches Supabase
+"""
+import os
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Deque, Tuple
+import httpx
+from .supabase_client import supabase_client
+from .metrics import registry, DECISION_ROWS, DECISION_FLUSH_SECONDS
+
+
+class DecisionWriter:
+    """
+    Batched, retrying background writer for agent_decisions rows
+
+    Args:
+        batch_size: Rows per bulk insert; reaching it triggers a flush
+        flush_interval_seconds: Longest a row waits before being flushed
+        max_attempts: Insert attempts per batch before it is dropped
+        max_pending: Rows held while Supabase is unavailable
+        table: Table to insert into
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        flush_interval_seconds: float = 2.0,
+        max_attempts: int = 4,
+        max_pending: int = 5000,
+        table: str = "agent_decisions",
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.table = table
+
+        self._pending: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._flush_lock = asyncio.Lock()
+        self._agent_ids: Dict[str, Optional[str]] = {}
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "retries": 0, "batches": 0}
+
+    def enqueue(self, agent_name: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        Queue decision rows for writing; never blocks
+
+        Args:
+            agent_name: Name in the agents table; resolved to agent_id on flush
+            rows: agent_decisions rows without agent_id
+
+        Returns:
+            Number of rows queued
+        """
+        for row in rows:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self._count("dropped")
+            self._pending.append((agent_name, row))
+            self._count("queued")
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return len(rows)
+
+    def start(self):
+        """Start the background flusher (no-op if already running)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still queued"""
+        if self._task is not None:
+            # Signal rather than cancel, so a batch being inserted or backing
+            # off between attempts is finished instead of lost
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await self._task
+            finally:
+                self._task = None
+                self._stopping = False
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Keep the flusher alive; the rows stay queued for the next pass
+                print(f"Error flushing agent decisions: {e}")
+
+    async def flush(self):
+        """Write all queued rows in batches of batch_size"""
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    await self._write(batch)
+                except asyncio.CancelledError:
+                    # Neither written nor dropped: keep it for the next flush
+                    self._pending.extendleft(reversed(batch))
+                    raise
+
+    async def _write(self, batch: List[Tuple[str, Dict[str, Any]]]):
+        started = time.perf_counter()
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    rows = [
+                        {**row, "agent_id": await self._agent_id(agent_name)}
+                        for agent_name, row in batch
+                    ]
+                    await supabase_client.insert(self.table, rows)
+                    self.stats["batches"] += 1
+                    self._count("written", len(batch))
+                    return
+                except Exception as e:
+                    if attempt == self.max_attempts or not self._is_transient(e):
+                        print(f"Dropping {len(batch)} agent decision(s) after {attempt} attempt(s): {e}")
+                        self._count("dropped", len(batch))
+                        return
+                    self.stats["retries"] += 1
+                    # Full jitter on 0.5s, 1s, 2s, ... capped at 10s
+                    await asyncio.sleep(random.uniform(0, min(10.0, 0.5 * 2 ** (attempt - 1))))
+        finally:
+            DECISION_FLUSH_SECONDS.observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            return status >= 500 or status == 429
+        return True
+
+    async def _agent_id(self, agent_name: str) -> Optional[str]:
+        """agents.id for a name, cached; None when the agent is not registered"""
+        if agent_name not in self._agent_ids:
+            agent = await supabase_client.get_agent_by_name(agent_name)
+            self._agent_ids[agent_name] = agent["id"] if agent else None
+        return self._agent_ids[agent_name]
+
+    def _count(self, outcome: str, amount: int = 1):
+        self.stats[outcome] += amount
+        DECISION_ROWS.inc(outcome, amount=amount)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), **self.stats}
+
+
+# Global instance
+decision_writer = DecisionWriter(
+    batch_size=int(os.getenv("DECISION_BATCH_SIZE", "50")),
+    flush_interval_seconds=float(os.getenv("DECISION_FLUSH_SECONDS", "2")),
+    max_attempts=int(os.getenv("DECISION_MAX_ATTEMPTS", "4")),
+    max_pending=int(os.getenv("DECISION_MAX_PENDING", "5000")),
+)
+
+registry.gauge(
+    "aware_decision_rows_pending", "agent_decisions rows waiting to be written",
+    callback=lambda: {(): len(decision_writer._pending)},
+)
@@ -0,0 +1,257 @@
+"""
+Demand Forecaster
+
+Statistical hourly demand forecasts per district, fitted on the hourly flow
+rollups of each district's consumption meters (the same meters the NRW
+engine uses for authorized consumption).
+
+Two models are fitted for every district in one batch:
+- Seasonal naive: the value one week (or one day) earlier
+- Harmonic regression: level + trend + daily and weekly Fourier terms,
+  solved for all districts at once with a single least-squares fit
+
+Each district uses whichever model did better on a one-day holdout, and
+the holdout error sets the width of its prediction interval.
+"""
+import time
+import warnings
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from .supabase_client import supabase_client
+from .nrw_engine import NRWEngine
+from .timestamps import parse_timestamp, truncate_to_hour
+
+DAY = 24
+WEEK = 168
+
+# Two-sided 95% normal quantile
+INTERVAL_Z = 1.96
+
+
+def _fill_gaps(series: np.ndarray, hour_of_day: np.ndarray) -> np.ndarray:
+    """
+    Fill missing hours (NaN) row by row with that row's mean for the same
+    hour of day, then with the row's overall mean. Rows with no data at all
+    stay NaN.
+    """
+    filled = series.copy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices
+        for hour in range(DAY):
+            columns = hour_of_day == hour
+            block = filled[:, columns]
+            filled[:, columns] = np.where(np.isnan(block), np.nanmean(block, axis=1)[:, None], block)
+        row_means = np.nanmean(filled, axis=1)
+    return np.where(np.isnan(filled), row_means[:, None], filled)
+
+
+class DemandForecaster:
+    """
+    Batch statistical demand forecaster over hourly rollups
+
+    Args:
+        nrw_engine: Source of the cached topology and meter classification
+        history_days: Days of rollups to fit on
+        horizon_hours: Hours ahead to forecast
+    """
+
+    def __init__(self, nrw_engine: NRWEngine, history_days: int = 28, horizon_hours: int = 24):
+        self.nrw_engine = nrw_engine
+        self.history_days = history_days
+        self.horizon_hours = horizon_hours
+        self.daily_harmonics = 4
+        self.weekly_harmonics = 3
+
+    def _design(self, hours: np.ndarray, n_history: int, weekly: bool) -> np.ndarray:
+        """Regression design matrix for absolute hour indices"""
+        columns = [np.ones(len(hours)), hours / max(n_history, 1)]
+        for k in range(1, self.daily_harmonics + 1):
+            angle = 2 * np.pi * k * hours / DAY
+            columns += [np.cos(angle), np.sin(angle)]
+        if weekly:
+            for k in range(1, self.weekly_harmonics + 1):
+                angle = 2 * np.pi * k * hours / WEEK
+                columns += [np.cos(angle), np.sin(angle)]
+        return np.column_stack(columns)
+
+    def _harmonic(self, history: np.ndarray, first_hour: int, horizon: int) -> np.ndarray:
+        """Fit all rows of history at once and predict horizon hours after it"""
+        n = history.shape[1]
+        weekly = n >= 2 * WEEK
+        hours = np.arange(first_hour, first_hour + n + horizon, dtype=float)
+        design = self._design(hours, n, weekly)
+        coef, *_ = np.linalg.lstsq(design[:n], history.T, rcond=None)
+        return (design[n:] @ coef).T
+
+    def _seasonal_naive(self, history: np.ndarray, horizon: int) -> np.ndarray:
+        """Repeat the last full season (a week if available, else a day)"""
+        season = WEEK if history.shape[1] >= WEEK else DAY
+        last = history[:, -season:]
+        reps = -(-horizon // season)
+        return np.tile(last, reps)[:, :horizon]
+
+    def fit_predict(self, history: np.ndarray, first_hour: int) -> Dict[str, np.ndarray]:
+        """
+        Forecast every row of an hourly history matrix
+
+        Args:
+            history: (districts x hours) demand, gaps already filled
+            first_hour: Hours since the epoch of the first column, so the
+                seasonal terms line up with the clock
+
+        Returns:
+            Dictionary with forecast, lower and upper (districts x horizon),
+            holdout RMSE per district and the chosen model per district
+        """
+        horizon = self.horizon_hours
+
+        # One-day holdout to pick a model per district and size the interval
+        train, holdout = history[:, :-DAY], history[:, -DAY:]
+        candidates = {
+            "seasonal_naive": (self._seasonal_naive(train, DAY), self._seasonal_naive(history, horizon)),
+            "harmonic_regression": (
+                self._harmonic(train, first_hour, DAY),
+                self._harmonic(history, first_hour, horizon),
+            ),
+        }
+        names = list(candidates)
+        rmse = np.stack([
+            np.sqrt(np.mean((backtest - holdout) ** 2, axis=1)) for backtest, _ in candidates.values()
+        ])
+        best = np.argmin(rmse, axis=0)
+        rows = np.arange(history.shape[0])
+
+        forecasts = np.stack([forecast for _, forecast in candidates.values()])
+        forecast = np.clip(forecasts[best, rows], 0, None)
+        error = rmse[best, rows]
+        half_width = INTERVAL_Z * error[:, None] * np.ones((1, horizon))
+
+        return {
+            "forecast": forecast,
+            "lower": np.clip(forecast - half_width, 0, None),
+            "upper": forecast + half_width,
+            "rmse": error,
+            "model": [names[i] for i in best],
+        }
+
+    def _confidence(self, fitted: Dict[str, np.ndarray], row: int, hour: int) -> float:
+        """0-1 score from the interval width relative to the forecast"""
+        demand = fitted["forecast"][row, hour]
+        if demand <= 0:
+            return 0.0
+        half_width = (fitted["upper"][row, hour] - fitted["lower"][row, hour]) / 2
+        return round(float(min(1.0, max(0.0, 1 - half_width / demand))), 3)
+
+    async def _zone_history(
+        self, sensors: List[Dict[str, Any]], start: datetime, end: datetime
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Hourly consumption (m3/h) per district over [start, end)
+
+        Returns:
+            (zones, gap-filled history, mask of hours with any report)
+        """
+        meters = await self.nrw_engine.zones()
+        zone_edges = {zone: m["consumption"] for zone, m in meters.items()}
+
+        edge_sensors: Dict[str, List[str]] = {}
+        for sensor in sensors:
+            if sensor["type"] == "flow" and sensor["asset_type"] == "edge":
+                edge_sensors.setdefault(sensor["asset_id"], []).append(sensor["id"])
+
+        edges = sorted({e for edges in zone_edges.values() for e in edges if e in edge_sensors})
+        edge_index = {edge_id: i for i, edge_id in enumerate(edges)}
+        sensor_edge = {sid: edge_index[e] for e in edges for sid in edge_sensors[e]}
+        n_hours = int((end - start).total_seconds() // 3600)
+
+        # Per-pipe hourly flow, averaged over the pipe's sensors
+        totals = np.zeros((len(edges), n_hours))
+        counts = np.zeros((len(edges), n_hours))
+        rows = await supabase_client.get_hourly_rollups(list(sensor_edge), start, end)
+        for row in rows:
+            hour = parse_timestamp(row["hour"])
+            if hour is None:
+                continue
+            col = int((hour - start).total_seconds() // 3600)
+            if 0 <= col < n_hours:
+                totals[sensor_edge[row["sensor_id"]], col] += row["avg_value"]
+                counts[sensor_edge[row["sensor_id"]], col] += 1
+        with np.errstate(invalid="ignore", divide="ignore"):
+            edge_flow = np.where(counts > 0, totals / counts, np.nan) * 3.6  # L/s -> m3/h
+
+        hour_of_day = (np.arange(n_hours) + start.hour) % DAY
+        if edges:
+            edge_flow = _fill_gaps(edge_flow, hour_of_day)
+            # Pipes that never reported stay NaN; treat them as unmetered
+            edge_flow = np.nan_to_num(edge_flow, nan=0.0)
+
+        zones = [z for z, e in zone_edges.items() if any(edge_id in edge_index for edge_id in e)]
+        membership = np.zeros((len(zones), len(edges)))
+        for i, zone in enumerate(zones):
+            for edge_id in zone_edges[zone]:
+                if edge_id in edge_index:
+                    membership[i, edge_index[edge_id]] = 1.0
+        history = membership @ edge_flow if edges else np.zeros((0, n_hours))
+
+        # Districts with less than two days of reports cannot be fitted
+        observed = (membership @ (counts > 0)) > 0 if edges else np.zeros((0, n_hours), dtype=bool)
+        keep = observed.sum(axis=1) >= 2 * DAY
+        return [z for z, k in zip(zones, keep) if k], history[keep], observed[keep]
+
+    async def forecast(
+        self, sensors: List[Dict[str, Any]], now: Optional[datetime] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Forecast the next horizon_hours of demand for every district
+
+        Args:
+            sensors: Current sensor rows
+            now: Forecast origin (default: now)
+
+        Returns:
+            Per-zone forecasts with prediction intervals, or None when there
+            is not yet enough rollup history to fit
+        """
+        started = time.perf_counter()
+        end = truncate_to_hour(now or datetime.now(timezone.utc))
+        start = end - timedelta(days=self.history_days)
+
+        zones, history, observed = await self._zone_history(sensors, start, end)
+        if not zones:
+            return None
+        # Trim leading hours before any district has data
+        first = int(np.argmax(observed.any(axis=0)))
+        history = history[:, first:]
+        if history.shape[1] < 2 * DAY:
+            return None
+
+        first_hour = int((start + timedelta(hours=first)).timestamp() // 3600)
+        fitted = self.fit_predict(history, first_hour)
+
+        # Column 0 is the hour starting at end, the first one after [start, end)
+        hours = [end + timedelta(hours=h) for h in range(self.horizon_hours)]
+        result_zones = {}
+        for i, zone in enumerate(zones):
+            result_zones[zone] = {
+                "model": fitted["model"][i],
+                "holdout_rmse": round(float(fitted["rmse"][i]), 3),
+                "forecast": [
+                    {
+                        "forecast_date": ts.date().isoformat(),
+                        "hour": ts.hour,
+                        "demand": round(float(fitted["forecast"][i, h]), 2),
+                        "lower": round(float(fitted["lower"][i, h]), 2),
+                        "upper": round(float(fitted["upper"][i, h]), 2),
+                        "confidence": self._confidence(fitted, i, h),
+                    }
+                    for h, ts in enumerate(hours)
+                ],
+            }
+
+        return {
+            "origin": end.isoformat(),
+            "history_hours": int(history.shape[1]),
+            "zones": result_zones,
+            "fit_time_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
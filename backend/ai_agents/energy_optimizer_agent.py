@@ -6,12 +6,23 @@ while maintaining pressure requirements and system safety.
 """
 import os
 import json
+import time
+import asyncio
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from datetime import datetime
-from openai import AsyncOpenAI
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from .supabase_client import supabase_client
+from .pump_scheduler import PumpScheduler
+from .nrw_engine import SYSTEM_ZONE
+from .energy_prices import HourlyPriceTable
+from .timestamps import truncate_to_hour, parse_timestamp
+from .llm_gateway import llm_gateway
+from .deadlines import call_timeout
+from .metrics import phase
+from .prompting import PromptBuilder
+from .model_routing import model_router
+from .decision_log import decision_writer
 
 # Load .env from project root (two levels up from this file)
 ROOT_DIR = Path(__file__).parent.parent.parent
@@ -27,10 +38,24 @@ class EnergyOptimizerAgent:
     """
 
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.agent_name = "Energy Optimizer Agent"
         self.agent_id = None
         self.min_pressure_psi = 40  # Minimum pressure guardrail
+        self.llm_budget_seconds = float(os.getenv("ENERGY_LLM_BUDGET_SECONDS", "25"))
+
+        # Receding-horizon (MPC) scheduling
+        self.horizon_hours = 48
+        self.replan_interval_seconds = int(os.getenv("ENERGY_REPLAN_INTERVAL_SECONDS", "900"))
+        self.default_tank_capacity_m3 = 1500.0  # Used when a tank row has no capacity_m3
+        self.default_tank_fill_fraction = 0.6  # Used when a tank row has no level_m3
+        self.tank_min_fraction = 0.2  # Reserve kept for fire flow and outages
+        self.tank_max_fraction = 0.95
+        self.scheduler = PumpScheduler(pump_flow_m3h=120.0, pump_power_kw=55.0)
+        self._last_plan = None  # {"start": datetime, "pumps_on": [...]} for warm starts
+        # Latest background re-plan, held in memory rather than stored
+        self.current_plan: Optional[Dict[str, Any]] = None
+        self._replan_stop: Optional[asyncio.Event] = None
+        self._replan_task: Optional[asyncio.Task] = None
 
     async def _get_agent_id(self) -> str:
         """Get agent ID from database"""
@@ -40,22 +65,54 @@ class EnergyOptimizerAgent:
                 self.agent_id = agent["id"]
         return self.agent_id
 
-    async def _fetch_optimization_data(self) -> Dict[str, Any]:
+    async def _load_prices(self, start: datetime, hours: int) -> HourlyPriceTable:
+        """
+        Load prices for the hours starting at start
+
+        Falls back to the most recent day of prices when the window has
+        none yet, since tariffs repeat daily.
+        """
+        rows = await supabase_client.get_energy_prices(
+            limit=hours, start=start, end=start + timedelta(hours=hours)
+        )
+        if not rows:
+            rows = await supabase_client.get_energy_prices(limit=24, descending=True)
+        return HourlyPriceTable(rows)
+
+    async def _fetch_optimization_data(self, snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Fetch energy prices, pumps, sensors, and current system state
 
+        Args:
+            snapshot: Coordinator snapshot to read from instead of Supabase
+
         Returns:
             Dictionary with all data needed for optimization
         """
         # Get energy prices (next 24 hours)
-        energy_prices = await supabase_client.get_energy_prices(limit=24)
+        if snapshot is not None:
+            energy_prices = snapshot["energy_prices"][:24]
+        else:
+            start = truncate_to_hour(datetime.now(timezone.utc))
+            energy_prices = await supabase_client.get_energy_prices(
+                limit=24, start=start, end=start + timedelta(hours=24)
+            )
+            if not energy_prices:
+                latest = await supabase_client.get_energy_prices(limit=24, descending=True)
+                energy_prices = list(reversed(latest))
 
         # Get all pumps and valves
-        valves_pumps = await supabase_client.get_valves_pumps()
+        if snapshot is not None:
+            valves_pumps = snapshot["valves_pumps"]
+        else:
+            valves_pumps = await supabase_client.get_valves_pumps()
         pumps = [vp for vp in valves_pumps if vp["kind"] == "pump"]
 
         # Get current sensor readings (pressure monitoring)
-        sensors = await supabase_client.get_sensors_with_assets()
+        if snapshot is not None:
+            sensors = snapshot["sensors"]
+        else:
+            sensors = await supabase_client.get_sensors_with_assets()
         pressure_sensors = [s for s in sensors if s["type"] == "pressure"]
 
         # Calculate current average pressure
@@ -73,87 +130,87 @@ class EnergyOptimizerAgent:
             "min_pressure_constraint": self.min_pressure_psi,
         }
 
-    def _prepare_prompt(self, data: Dict[str, Any]) -> str:
+    def _build_prompt(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
         """
-        Prepare optimization prompt for OpenAI
+        Prepare the compact optimization prompt for OpenAI
+
+        Instructions and schema form a fixed prefix; the system state, pumps
+        and hourly prices follow as short tables.
 
         Args:
             data: System data from _fetch_optimization_data()
 
         Returns:
-            Formatted prompt string
+            (prompt, prompt stats)
         """
-        prompt = """You are an energy optimization AI agent for water distribution systems.
-
-Your task is to create an optimal 24-hour pump schedule that minimizes energy costs while maintaining system pressure requirements.
-
-Current System State:
-"""
-        prompt += f"  - Current Average Pressure: {data['current_avg_pressure']:.1f} psi\n"
-        prompt += f"  - Minimum Pressure Required: {data['min_pressure_constraint']} psi\n"
-        prompt += f"  - Number of Pumps: {len(data['pumps'])}\n\n"
-
-        prompt += "Available Pumps:\n"
-        for pump in data["pumps"]:
-            prompt += f"  - {pump['name']}: Status={pump['status']}, Setpoint={pump['setpoint']}\n"
-
-        prompt += "\nEnergy Prices (24-hour forecast):\n"
-        for idx, price in enumerate(data["energy_prices"]):
-            # Use timestamp if available, otherwise use index
-            timestamp = price.get("timestamp", "")
-            # Extract hour from timestamp (format: "2025-11-12 21:00:00+00")
-            hour = timestamp.split(" ")[1].split(":")[0] if " " in timestamp else str(idx)
-            cost = price["price_per_kwh"]
-            off_peak = price.get("is_off_peak", False)
-            peak_indicator = " (OFF-PEAK)" if off_peak else " (PEAK)"
-            prompt += f"  - Hour {hour}: ${cost:.3f}/kWh{peak_indicator}\n"
-
-        prompt += """
-Create an optimal 24-hour pump schedule to minimize energy costs while:
+        prefix = """You are an energy optimization AI agent for water distribution systems. Create an optimal 24-hour pump schedule that minimizes energy costs while:
 1. Maintaining pressure above the minimum constraint at all times
 2. Prioritizing pump operation during off-peak hours
 3. Ensuring continuous water availability
 4. Avoiding excessive pump cycling (wear and tear)
 5. Balancing cost savings vs system reliability
 
-For each pump, provide:
-1. Recommended operating schedule (hourly on/off status)
-2. Setpoint adjustments if needed
-3. Reasoning for the schedule
-4. Estimated cost savings vs baseline (running 24/7)
-5. Risk assessment (pressure dips, reliability concerns)
-
-Respond ONLY with a JSON object:
-{
-  "optimizations": [
-    {
-      "pump_name": "PUMP1",
-      "schedule": [
-        {"hour": 0, "status": "on|off", "setpoint": 50, "rationale": "..."},
-        ...
-      ],
-      "estimated_daily_savings_usd": 12.50,
-      "confidence": 0.95,
-      "reasoning": "Detailed explanation..."
-    }
-  ],
-  "overall_strategy": "High-level optimization strategy explanation",
-  "risk_assessment": "Analysis of potential risks",
-  "pressure_guarantee": "Explanation of how minimum pressure is maintained",
-  "total_estimated_savings": 25.00
-}
-"""
-        return prompt
+For each pump give the hourly on/off schedule, setpoint adjustments, reasoning, estimated savings vs running 24/7, and risks (pressure dips, reliability).
 
-    async def optimize(self) -> Dict[str, Any]:
+Respond ONLY with a JSON object in this exact format (one schedule entry per hour):
+{"optimizations": [{"pump_name": "PUMP1", "schedule": [{"hour": 0, "status": "on|off", "setpoint": 50, "rationale": "..."}], "estimated_daily_savings_usd": 12.50, "confidence": 0.95, "reasoning": "..."}], "overall_strategy": "High-level optimization strategy", "risk_assessment": "Potential risks", "pressure_guarantee": "How minimum pressure is maintained", "total_estimated_savings": 25.00}"""
+        builder = PromptBuilder("energy", prefix)
+        builder.text(
+            f"System state: average pressure {data['current_avg_pressure']:.1f} psi, "
+            f"minimum required {data['min_pressure_constraint']} psi, {len(data['pumps'])} pumps"
+        )
+        builder.table(
+            "Pumps:",
+            ("name", "status", "setpoint"),
+            [[pump["name"], pump["status"], pump["setpoint"]] for pump in data["pumps"]],
+        )
+        price_rows = []
+        for idx, price in enumerate(data["energy_prices"]):
+            ts = parse_timestamp(price.get("timestamp"))
+            price_rows.append([
+                ts.hour if ts else idx,
+                round(price["price_per_kwh"], 3),
+                "y" if price.get("is_off_peak") else "n",
+            ])
+        builder.table("Energy prices (next 24 hours):", ("hour", "usd_per_kwh", "off_peak"), price_rows)
+        prompt = builder.build()
+        return prompt, builder.stats
+
+    async def optimize(
+        self,
+        mode: str = "llm",
+        snapshot: Optional[Dict[str, Any]] = None,
+        store: bool = True,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
         """
         Main optimization function - generates optimal pump schedules
 
+        Args:
+            mode: "llm" for the GPT-4o day-ahead plan, "mpc" for the
+                tank-aware receding-horizon plan
+            snapshot: Coordinator snapshot; read from Supabase when not given
+            store: Write the schedules to energy_schedules; speculative runs
+                pass False and call store_schedules() once the plan is kept
+            deadline: Absolute run deadline (time.monotonic()); the LLM call
+                is cut off in time to fall back to the receding-horizon plan
+
         Returns:
             Dictionary containing optimization recommendations
         """
+        if mode == "mpc":
+            started = time.perf_counter()
+            result = await self.optimize_receding_horizon(snapshot, store=store)
+            return {
+                **result,
+                "path": "mpc",
+                "path_timings_ms": {"mpc": round((time.perf_counter() - started) * 1000, 1)},
+                "fallback_reason": None,
+            }
+
         # Fetch all needed data
-        data = await self._fetch_optimization_data()
+        with phase("energy", "fetch"):
+            data = await self._fetch_optimization_data(snapshot)
 
         if not data.get("energy_prices"):
             return {
@@ -162,31 +219,40 @@ Respond ONLY with a JSON object:
             }
 
         # Prepare prompt
-        prompt = self._prepare_prompt(data)
-
-        # Call OpenAI
+        with phase("energy", "prompt"):
+            prompt, prompt_stats = self._build_prompt(data)
+
+        # Call OpenAI within the budget; on overrun or failure fall back to
+        # the deterministic receding-horizon plan from the same snapshot
+        fallback_reason = None
+        timeout = call_timeout(self.llm_budget_seconds, deadline)
+        started = time.perf_counter()
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an energy optimization expert AI. Always respond with valid JSON only."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.2,  # Low temperature for more conservative/consistent optimization
-                response_format={"type": "json_object"}
-            )
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            result = await asyncio.wait_for(self._plan_with_llm(prompt), timeout)
+        except asyncio.TimeoutError:
+            fallback_reason = f"LLM exceeded its {max(timeout, 0):.1f}s budget"
+        except Exception as e:
+            fallback_reason = f"LLM failed: {e}"
+        path_timings_ms = {"llm": round((time.perf_counter() - started) * 1000, 1)}
 
-            # Parse response
-            result = json.loads(response.choices[0].message.content)
+        if fallback_reason:
+            started = time.perf_counter()
+            fallback = await self.optimize_receding_horizon(snapshot, store=store)
+            path_timings_ms["mpc"] = round((time.perf_counter() - started) * 1000, 1)
+            return {
+                **fallback,
+                "path": "mpc",
+                "path_timings_ms": path_timings_ms,
+                "fallback_reason": fallback_reason,
+            }
 
+        try:
             # Store schedules in database
-            await self._store_energy_schedules(result, data)
+            if store:
+                with phase("energy", "persist"):
+                    await self._store_energy_schedules(result, data)
 
             # Calculate efficiency gain
             baseline_cost = 350  # Baseline daily cost ($350)
@@ -195,6 +261,10 @@ Respond ONLY with a JSON object:
 
             return {
                 "status": "success",
+                "path": "llm",
+                "path_timings_ms": path_timings_ms,
+                "fallback_reason": None,
+                "prompt_stats": prompt_stats,
                 "optimizations": result.get("optimizations", []),
                 "overall_strategy": result.get("overall_strategy", ""),
                 "risk_assessment": result.get("risk_assessment", ""),
@@ -218,6 +288,353 @@ Respond ONLY with a JSON object:
                 "optimizations": [],
             }
 
+    async def _plan_with_llm(self, prompt: str) -> Dict[str, Any]:
+        """Day-ahead plan from OpenAI, parsed"""
+        with phase("energy", "llm"):
+            response = await llm_gateway.chat(
+                "energy",
+                model=model_router.model("energy"),
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an energy optimization expert AI. Always respond with valid JSON only."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                temperature=0.2,  # Low temperature for more conservative/consistent optimization
+                response_format={"type": "json_object"}
+            )
+
+        # Parse response
+        with phase("energy", "parse"):
+            return json.loads(response.choices[0].message.content)
+
+    async def _fetch_mpc_data(
+        self, start: datetime, snapshot: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch prices, pumps, tanks and demand for the receding horizon
+
+        Args:
+            start: First hour of the horizon (UTC, truncated to the hour)
+            snapshot: Coordinator snapshot for prices, pumps and sensors
+
+        Returns:
+            Dictionary with hourly price and demand vectors plus tank storage
+        """
+        if snapshot is not None:
+            price_table = HourlyPriceTable(snapshot["energy_prices"])
+            valves_pumps = snapshot["valves_pumps"]
+        else:
+            price_table = await self._load_prices(start, self.horizon_hours)
+            valves_pumps = await supabase_client.get_valves_pumps()
+        pumps = sorted(
+            (vp for vp in valves_pumps if vp["kind"] == "pump"),
+            key=lambda vp: vp["name"],
+        )
+
+        tanks = await supabase_client.query("nodes", select="*", type="eq.tank")
+
+        forecasts = await supabase_client.query(
+            "demand_forecasts",
+            select="forecast_date,hour,predicted_demand",
+            forecast_date=f"gte.{(start - timedelta(days=1)).date().isoformat()}",
+            # The pumps feed the whole network, not one district
+            zone=f"eq.{SYSTEM_ZONE}",
+        )
+
+        # Flat demand from current flow readings when no forecast exists
+        if snapshot is not None:
+            sensors = snapshot["sensors"]
+        else:
+            sensors = await supabase_client.get_sensors_with_assets()
+        flow_sensors = [s for s in sensors if s["type"] == "flow" and s.get("value") is not None]
+        current_flow_lps = (
+            sum(s["value"] for s in flow_sensors) / len(flow_sensors)
+            if flow_sensors
+            else None
+        )
+
+        capacity = 0.0
+        storage = 0.0
+        for tank in tanks:
+            tank_capacity = tank.get("capacity_m3") or self.default_tank_capacity_m3
+            tank_level = tank.get("level_m3")
+            if tank_level is None:
+                tank_level = tank_capacity * self.default_tank_fill_fraction
+            capacity += tank_capacity
+            storage += min(tank_level, tank_capacity)
+
+        return {
+            "price_table": price_table,
+            "prices": price_table.window(start, self.horizon_hours),
+            "demand_m3h": self._build_demand_vector(forecasts, current_flow_lps, start),
+            "pumps": pumps,
+            "tanks": tanks,
+            "storage_capacity_m3": capacity,
+            "initial_storage_m3": storage,
+        }
+
+    def _build_demand_vector(
+        self,
+        forecasts: List[Dict[str, Any]],
+        current_flow_lps: Optional[float],
+        start: datetime,
+    ) -> List[float]:
+        """
+        Hourly demand in m3/h over the horizon
+
+        Forecast rows are already in m3/h; current flow is in L/s like the
+        flow sensors. Hours beyond the forecast reuse the same hour of day,
+        then fall back to current flow.
+        """
+        by_slot = {}
+        by_hour_of_day = {}
+        for row in forecasts:
+            demand_m3h = row["predicted_demand"]
+            by_slot[(row["forecast_date"], row["hour"])] = demand_m3h
+            by_hour_of_day[row["hour"]] = demand_m3h
+
+        if not by_hour_of_day and current_flow_lps is None:
+            return []
+
+        fallback = current_flow_lps * 3.6 if current_flow_lps is not None else (
+            sum(by_hour_of_day.values()) / len(by_hour_of_day)
+        )
+        demand = []
+        for t in range(self.horizon_hours):
+            slot = start + timedelta(hours=t)
+            demand.append(by_slot.get(
+                (slot.date().isoformat(), slot.hour),
+                by_hour_of_day.get(slot.hour, fallback),
+            ))
+        return demand
+
+    def _warm_start(self, start: datetime) -> Optional[List[int]]:
+        """Previous plan shifted to begin at the current hour"""
+        if not self._last_plan:
+            return None
+        elapsed = int((start - self._last_plan["start"]).total_seconds() // 3600)
+        if elapsed < 0 or elapsed >= self.horizon_hours:
+            return None
+        return self._last_plan["pumps_on"][elapsed:]
+
+    async def optimize_receding_horizon(
+        self, snapshot: Optional[Dict[str, Any]] = None, store: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Tank-aware model-predictive pump scheduling over a rolling horizon
+
+        Tracks tank storage hour by hour against the demand forecast and plans
+        pump operation for the next 48 hours, warm-starting from the previous
+        plan. Only the first hours are acted on before the next re-plan.
+
+        Args:
+            snapshot: Coordinator snapshot; read from Supabase when not given
+            store: Write the schedules to energy_schedules
+
+        Returns:
+            Dictionary containing optimization recommendations, in the same
+            shape as optimize()
+        """
+        start = truncate_to_hour(datetime.now(timezone.utc))
+
+        try:
+            with phase("energy_mpc", "fetch"):
+                data = await self._fetch_mpc_data(start, snapshot)
+        except Exception as e:
+            return {"status": "error", "mode": "mpc", "error": str(e), "optimizations": []}
+
+        if not data["prices"]:
+            return {
+                "status": "no_data",
+                "mode": "mpc",
+                "message": "No energy price data available for optimization",
+            }
+        if not data["demand_m3h"]:
+            return {
+                "status": "no_data",
+                "mode": "mpc",
+                "message": "No demand forecast or flow data available for optimization",
+            }
+        if not data["pumps"]:
+            return {
+                "status": "no_data",
+                "mode": "mpc",
+                "message": "No pumps available for optimization",
+            }
+
+        capacity = data["storage_capacity_m3"]
+        with phase("energy_mpc", "solve"):
+            plan = self.scheduler.plan(
+                prices=data["prices"],
+                demand_m3h=data["demand_m3h"],
+                num_pumps=len(data["pumps"]),
+                initial_storage_m3=data["initial_storage_m3"],
+                min_storage_m3=capacity * self.tank_min_fraction,
+                max_storage_m3=capacity * self.tank_max_fraction,
+                warm_start=self._warm_start(start),
+            )
+        self._last_plan = {"start": start, "pumps_on": plan["pumps_on"]}
+
+        optimizations = []
+        for index, pump in enumerate(data["pumps"]):
+            schedule = []
+            for t, pumps_on in enumerate(plan["pumps_on"]):
+                running = index < pumps_on
+                schedule.append({
+                    "hour": (start + timedelta(hours=t)).hour,
+                    "timestamp": (start + timedelta(hours=t)).isoformat(),
+                    "status": "on" if running else "off",
+                    "setpoint": pump.get("setpoint"),
+                    "rationale": (
+                        f"${data['prices'][t]:.3f}/kWh, tank at "
+                        f"{plan['storage_m3'][t + 1]:.0f} of {capacity:.0f} m3"
+                        if capacity
+                        else f"${data['prices'][t]:.3f}/kWh, following demand"
+                    ),
+                })
+            optimizations.append({
+                "pump_name": pump["name"],
+                "schedule": schedule,
+                "hours_on": sum(1 for slot in schedule if slot["status"] == "on"),
+            })
+
+        # Plan costs cover the whole horizon; report savings per day
+        days = self.horizon_hours / 24
+        daily_savings = max(0.0, (plan["baseline_cost_usd"] - plan["cost_usd"]) / days)
+        for optimization in optimizations:
+            optimization["estimated_daily_savings_usd"] = round(daily_savings / len(optimizations), 2)
+            optimization["confidence"] = 0.95 if plan["feasible"] else 0.5
+            optimization["reasoning"] = (
+                f"Runs {optimization['hours_on']} of {self.horizon_hours} hours, "
+                + (
+                    "following demand because there is no tank storage to shift pumping into"
+                    if plan["follows_demand"]
+                    else "shifted into the cheapest hours that keep tank storage in band"
+                )
+            )
+
+        result = {
+            "optimizations": optimizations,
+            "total_estimated_savings": round(daily_savings, 2),
+        }
+        if store:
+            with phase("energy_mpc", "persist"):
+                await self._store_energy_schedules(result, data)
+
+        baseline_cost = 350  # Baseline daily cost ($350)
+        efficiency_gain = (daily_savings / baseline_cost * 100) if baseline_cost > 0 else 0
+
+        if plan["follows_demand"] and plan["feasible"]:
+            risk_assessment = "No tank storage; pumps meet demand in every hour of the horizon"
+        elif plan["follows_demand"]:
+            risk_assessment = (
+                f"No tank storage and demand exceeds pumping capacity in "
+                f"{len(plan['shortfall_hours'])} hours"
+            )
+        elif plan["feasible"]:
+            risk_assessment = "Tank storage stays within its operating band for the whole horizon"
+        else:
+            risk_assessment = (
+                f"Demand exceeds pumping capacity in {len(plan['shortfall_hours'])} hours; "
+                "tank storage drops below reserve"
+            )
+
+        return {
+            "status": "success",
+            "mode": "mpc",
+            "optimizations": optimizations,
+            "overall_strategy": (
+                f"Receding-horizon plan over {self.horizon_hours} hours, re-planned every "
+                f"{self.replan_interval_seconds // 60} minutes; fills tanks in off-peak hours "
+                "and draws them down during peak prices"
+            ),
+            "risk_assessment": risk_assessment,
+            "pressure_guarantee": (
+                f"Tank storage kept above {self.tank_min_fraction:.0%} of capacity "
+                "so supply pressure is maintained"
+            ),
+            "total_estimated_savings": round(daily_savings, 2),
+            "efficiency_gain_percent": round(efficiency_gain, 1),
+            "horizon_start": start.isoformat(),
+            "horizon_hours": self.horizon_hours,
+            "tank_levels_m3": [round(level, 1) for level in plan["storage_m3"]],
+            "plan_cost_usd": plan["cost_usd"],
+            "baseline_cost_usd": plan["baseline_cost_usd"],
+            "feasible": plan["feasible"],
+            "follows_demand": plan["follows_demand"],
+            "warm_started": plan["warm_started"],
+            "iterations": plan["iterations"],
+            "solve_time_ms": plan["solve_time_ms"],
+            "baseline_data": {
+                "num_pumps": len(data["pumps"]),
+                "num_tanks": len(data["tanks"]),
+                "storage_capacity_m3": capacity,
+                "initial_storage_m3": data["initial_storage_m3"],
+                "price_range": {
+                    "min": min(data["prices"]),
+                    "max": max(data["prices"]),
+                },
+            },
+        }
+
+    async def run_receding_horizon(self, stop_event: Optional[asyncio.Event] = None):
+        """
+        Re-plan every replan_interval_seconds until stop_event is set
+
+        Plans are kept in current_plan, not written to energy_schedules, so
+        the stored schedule stays the one last requested through the API.
+
+        Args:
+            stop_event: Event that ends the loop (runs forever if None)
+        """
+        stop_event = stop_event or asyncio.Event()
+        while not stop_event.is_set():
+            try:
+                result = await self.optimize_receding_horizon(store=False)
+                if result.get("status") == "success":
+                    self.current_plan = {**result, "planned_at": datetime.now(timezone.utc).isoformat()}
+                print(
+                    f"Energy MPC re-plan: {result.get('status')} "
+                    f"({result.get('solve_time_ms', 0)} ms, {result.get('iterations', 0)} moves)"
+                )
+            except Exception as e:
+                print(f"Energy MPC re-plan failed: {e}")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.replan_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start_replanning(self):
+        """Start the background re-plan loop (no-op if running or the interval is 0)"""
+        if self.replan_interval_seconds <= 0 or self.replanning:
+            return
+        self._replan_stop = asyncio.Event()
+        self._replan_task = asyncio.create_task(self.run_receding_horizon(self._replan_stop))
+
+    @property
+    def replanning(self) -> bool:
+        return bool(self._replan_task and not self._replan_task.done())
+
+    async def stop_replanning(self):
+        """Stop the re-plan loop, letting a plan in progress finish"""
+        if not self._replan_task:
+            return
+        self._replan_stop.set()
+        await self._replan_task
+        self._replan_task = None
+
+    async def store_schedules(self, result: Dict[str, Any], snapshot: Dict[str, Any]):
+        """Store the schedules of an optimize(store=False) result"""
+        if result.get("status") != "success":
+            return
+        pumps = [vp for vp in snapshot["valves_pumps"] if vp["kind"] == "pump"]
+        await self._store_energy_schedules(result, {"pumps": pumps})
+
     async def _store_energy_schedules(self, result: Dict[str, Any], data: Dict[str, Any]):
         """Store energy optimization schedules in database"""
         try:
@@ -255,44 +672,35 @@ Respond ONLY with a JSON object:
         except Exception as e:
             print(f"Error storing energy schedules: {e}")
 
-    async def create_decision_record(self, optimization_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def create_decision_record(self, optimization_result: Dict[str, Any]) -> int:
         """
-        Create an agent_decision record in Supabase
+        Queue an agent_decision record for the optimization
+
+        Written in the background by the decision writer; never waits on Supabase.
 
         Args:
             optimization_result: Output from optimize()
 
         Returns:
-            Created decision record or None if error
+            Number of decision records queued
         """
-        try:
-            agent_id = await self._get_agent_id()
-            if not agent_id:
-                return None
-
-            # Create decision record for the optimization
-            decision_data = {
-                "agent_id": agent_id,
-                "decision_type": "energy_optimization",
-                "input_data": optimization_result.get("baseline_data", {}),
-                "reasoning": (
-                    f"{optimization_result.get('overall_strategy', '')}\n\n"
-                    f"Risk Assessment: {optimization_result.get('risk_assessment', '')}\n\n"
-                    f"Pressure Guarantee: {optimization_result.get('pressure_guarantee', '')}"
-                ),
-                "recommendation": {
-                    "optimizations": optimization_result.get("optimizations", []),
-                    "total_estimated_savings": optimization_result.get("total_estimated_savings", 0),
-                },
-                "confidence": 0.90,  # High confidence for energy optimization
-                "status": "pending",
-            }
-
-            # Note: This will fail until agent_decisions table is created
-            # result = await supabase_client.insert("agent_decisions", decision_data)
-            # return result
-            return {"decision": decision_data, "note": "Table agent_decisions needs to be created"}
+        decision_data = {
+            "decision_type": "energy_optimization",
+            "input_data": {
+                **optimization_result.get("baseline_data", {}),
+                "path": optimization_result.get("path"),
+            },
+            "reasoning": (
+                f"{optimization_result.get('overall_strategy', '')}\n\n"
+                f"Risk Assessment: {optimization_result.get('risk_assessment', '')}\n\n"
+                f"Pressure Guarantee: {optimization_result.get('pressure_guarantee', '')}"
+            ),
+            "recommendation": {
+                "optimizations": optimization_result.get("optimizations", []),
+                "total_estimated_savings": optimization_result.get("total_estimated_savings", 0),
+            },
+            "confidence": 0.90,  # High confidence for energy optimization
+            "status": "pending",
+        }
+        return decision_writer.enqueue(self.agent_name, [decision_data])
 
-        except Exception as e:
-            print(f"Error creating decision record: {e}")
-            return None
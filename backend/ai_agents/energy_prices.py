@@ -0,0 +1,61 @@
+"""
+Hour-indexed energy price table
+
+Keeps energy prices in a flat array indexed by hours since the first price,
+so the optimizer can look up the price for any hour in O(1) instead of
+searching the price rows.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+from .timestamps import parse_timestamp, truncate_to_hour
+
+
+class HourlyPriceTable:
+    """
+    Energy prices indexed by hour
+
+    Hours without a price row fall back to the last price seen at the same
+    hour of day (tariffs repeat daily), then to the mean price.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.base: Optional[datetime] = None
+        self.prices: List[Optional[float]] = []
+        self.by_hour_of_day: List[Optional[float]] = [None] * 24
+        self.mean_price: Optional[float] = None
+
+        parsed = []
+        for row in rows:
+            ts = parse_timestamp(row.get("timestamp"))
+            if ts is not None and row.get("price_per_kwh") is not None:
+                parsed.append((truncate_to_hour(ts), float(row["price_per_kwh"])))
+        if not parsed:
+            return
+
+        parsed.sort(key=lambda item: item[0])
+        self.base = parsed[0][0]
+        span = int((parsed[-1][0] - self.base).total_seconds() // 3600) + 1
+        self.prices = [None] * span
+        for ts, price in parsed:
+            self.prices[int((ts - self.base).total_seconds() // 3600)] = price
+            self.by_hour_of_day[ts.hour] = price
+        self.mean_price = sum(price for _, price in parsed) / len(parsed)
+
+    def __bool__(self) -> bool:
+        return self.base is not None
+
+    def price_at(self, ts: datetime) -> Optional[float]:
+        """Price in $/kWh for the hour containing ts"""
+        if self.base is None:
+            return None
+        offset = int((ts - self.base).total_seconds() // 3600)
+        if 0 <= offset < len(self.prices) and self.prices[offset] is not None:
+            return self.prices[offset]
+        price = self.by_hour_of_day[ts.hour]
+        return price if price is not None else self.mean_price
+
+    def window(self, start: datetime, hours: int) -> List[float]:
+        """Hourly prices for the hours starting at start"""
+        if self.base is None:
+            return []
+        return [self.price_at(start + timedelta(hours=t)) for t in range(hours)]
@@ -0,0 +1,193 @@
+"""
+Fused safety + leak analysis
+
+The leak prompt and the safety enrichment prompt serialize the same
+readings. In fused mode the coordinator sends one prompt that carries the
+sensor context once plus both output schemas, and splits the completion:
+"leaks" goes through the leak agent's usual path (edge names, incidents)
+and "safety" becomes the safety agent's enrichment. The safety verdict
+itself still comes from the rule engine.
+"""
+import json
+from typing import Dict, List, Any, Optional, Callable, Tuple
+from .llm_gateway import llm_gateway
+from .json_stream import JSONArrayStream
+from .metrics import phase
+from .prompting import AliasTable, PromptBuilder
+from .model_routing import model_router
+from .safety_monitor_agent import SAFETY_SCHEMA
+
+
+class FusedSafetyLeakAnalysis:
+    """
+    One LLM call for leak detection and safety commentary
+
+    Args:
+        safety_agent: Records the "safety" part as its latest enrichment;
+            also supplies the safety thresholds
+        leak_agent: Supplies the leak indicator thresholds
+    """
+
+    def __init__(self, safety_agent, leak_agent):
+        self.safety_agent = safety_agent
+        self.leak_agent = leak_agent
+
+    def build_prompt(
+        self, edge_data: Dict[str, List[Dict[str, Any]]], safety_data: Dict[str, Any]
+    ) -> Tuple[str, AliasTable, AliasTable, Dict[str, Any]]:
+        """
+        Compact combined prompt: both tasks and schemas as a fixed prefix,
+        then pipe readings (p1, p2, ...), other assets' readings (a1, a2, ...)
+        and valves/pumps
+
+        Args:
+            edge_data: Latest sensors per pipe, from the leak agent
+            safety_data: Sensors, valves/pumps and thresholds, from the safety agent
+
+        Returns:
+            (prompt, pipe aliases, asset aliases, prompt stats)
+        """
+        stale_ids = safety_data.get("stale_sensor_ids", set())
+        prefix = f"""You are a water distribution monitoring AI. Using the readings below, complete TWO tasks and answer with ONE JSON object.
+
+TASK 1 - Leak detection (pipes only):
+- Baseline: pressure 60-70 psi, acoustic 2-3 dB, flow 80-100 L/s
+- Leak indicators: {self.leak_agent.indicator_text()}
+- Pressure drop + acoustic spike = high confidence; any two indicators = moderate; one = low, monitor
+- Flag EVERY pipe that meets an indicator; recommend valves to isolate when confidence > {self.leak_agent.confidence_threshold}
+
+TASK 2 - Safety review (all readings, zero tolerance):
+- Safety thresholds: {self.safety_agent.threshold_text()}
+- Also look for unusual flow, acoustic anomalies, pump/valve problems and cascading risks
+
+Pipes are named p1, p2, ... and other assets a1, a2, ...; use these names for edge_id and affected_assets. An empty cell means no sensor of that type; STALE means the sensor stopped reporting, so do not use it. pressure_flag is CRITICAL, LOW or HIGH against the safety thresholds.
+
+Respond ONLY with a JSON object in this exact format:
+{{"leaks": [{{"edge_id": "p1", "confidence": 0.92, "urgency": "immediate|soon|monitor", "reasoning": "Why this pipe likely has a leak", "sensor_indicators": {{"acoustic": "...", "pressure": "...", "flow": "..."}}, "recommendation": {{"action": "isolate|monitor|inspect", "valves_to_close": ["V1"], "dispatch_crew": true, "estimated_location": "description"}}}}],
+ "safety": {SAFETY_SCHEMA}}}
+If no leaks are detected, "leaks" is []. If the system is safe, "safety_status" is "SAFE" with no issues."""
+
+        pipes = AliasTable("p")
+        assets = AliasTable("a")
+        pipe_rows = []
+        for row in self.leak_agent.pipe_rows(edge_data, pipes):
+            pressure = [s for s in edge_data[pipes.resolve(row[0])] if s["type"] == "pressure"]
+            flag = self.safety_agent.reading_flag(pressure[0], stale_ids) if pressure else ""
+            pipe_rows.append(row + ["" if flag == "STALE" else flag])
+
+        # Sensors on nodes, tanks and pumps only matter for the safety review
+        other_sensors = [
+            sensor
+            for sensor in safety_data["pressure_sensors"] + safety_data["flow_sensors"] + safety_data["acoustic_sensors"]
+            if sensor.get("asset_type") != "edge"
+        ]
+
+        builder = PromptBuilder("fused", prefix)
+        builder.table(
+            "Pipe readings:", ("pipe", "pressure_psi", "acoustic_db", "flow_ls", "pressure_flag"), pipe_rows
+        )
+        builder.table(
+            "Other readings:",
+            ("asset", "type", "value", "unit", "flag"),
+            self.safety_agent.reading_rows(other_sensors, stale_ids, assets),
+        )
+        builder.table("Valves and pumps:", ("name", "kind", "status"), self.safety_agent.valve_rows(safety_data["valves_pumps"]))
+        prompt = builder.build()
+        return prompt, pipes, assets, builder.stats
+
+    async def detect(
+        self,
+        edge_data: Dict[str, List[Dict[str, Any]]],
+        edge_names: Optional[Dict[str, str]],
+        progress: Optional[Callable[[str, Dict[str, Any]], None]],
+        safety_data: Dict[str, Any],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Run the fused call; a detector for LeakPreemptionAgent.analyze()
+
+        Leaks are reported through progress as they stream in. The "safety"
+        part is returned with the call details and also recorded as the
+        safety agent's latest enrichment.
+
+        Runs on the cheap model first and escalates to the large one like
+        the split prompts do (confident leaks or serious safety issues, or
+        disagreement with either rule engine).
+
+        Returns:
+            (the leaks in the leak prompt's shape,
+             call details: prompt_stats, routing decision and
+             safety_enrichment, None if the completion had no safety part)
+
+        Raises:
+            ValueError: The large-tier completion was not valid JSON
+        """
+        with phase("fused", "prompt"):
+            prompt, pipes, assets, prompt_stats = self.build_prompt(edge_data, safety_data)
+        rule_leaks = self.leak_agent._detect_with_rules(edge_data)
+        rule_status = self.safety_agent.rule_status(safety_data)
+
+        async def call(model: str, tier: str) -> Dict[str, Any]:
+            findings = JSONArrayStream("leaks")
+            with phase("fused", "llm"):
+                chunks = []
+                async for delta in llm_gateway.chat_stream(
+                    "leak",
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a water network leak detection and safety monitoring expert AI. Flag ALL pipes that meet leak indicator thresholds and every safety violation. Always respond with valid JSON only."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.2,  # Between the leak (0.5) and safety (0.0) prompts
+                    response_format={"type": "json_object"}
+                ):
+                    chunks.append(delta)
+                    if progress:
+                        for leak in findings.feed(delta):
+                            leak = self.leak_agent.resolve_leak(leak, pipes, edge_names)
+                            progress("finding", {"agent": "leak", "tier": tier, "leak": leak})
+
+            with phase("fused", "parse"):
+                result_text = "".join(chunks)
+                try:
+                    result = json.loads(result_text)
+                except json.JSONDecodeError as e:
+                    print(f"❌ Failed to parse OpenAI response: {e}")
+                    raise ValueError(f"invalid JSON from OpenAI: {e}")
+
+                leaks = result.get("leaks", [])
+                safety = result.get("safety")
+                return {
+                    "leaks": [
+                        self.leak_agent.resolve_leak(leak, pipes)
+                        for leak in (leaks if isinstance(leaks, list) else [])
+                        if isinstance(leak, dict)
+                    ],
+                    "safety": (
+                        self.safety_agent.resolve_issues(safety, pipes, assets)
+                        if isinstance(safety, dict) else None
+                    ),
+                }
+
+        def escalation(result: Dict[str, Any]):
+            return self.leak_agent.escalation_reason(result["leaks"], rule_leaks) or (
+                self.safety_agent.escalation_reason(result["safety"], rule_status)
+                if result["safety"] is not None else None
+            )
+
+        def on_escalate(decision: Dict[str, Any]):
+            if progress:
+                progress("progress", {"agent": "leak", "stage": "escalated", "reason": decision["detail"]})
+
+        result, routing = await model_router.route("fused", call, escalation, on_escalate)
+        enrichment = None
+        if result["safety"] is not None:
+            enrichment = self.safety_agent.apply_enrichment(
+                result["safety"], source="fused", prompt_stats=prompt_stats, routing=routing
+            )
+        return result["leaks"], {"prompt_stats": prompt_stats, "routing": routing, "safety_enrichment": enrichment}
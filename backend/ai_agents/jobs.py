@@ -0,0 +1,196 @@
+"""
+Background job queue
+
+Long agent runs are submitted as jobs and executed by a fixed pool of
+workers, so an HTTP request can return a job id straight away instead of
+holding the connection open across several LLM calls. Clients poll the job
+or follow its status events.
+
+- Identical submissions (same kind and parameters) made while a job is
+  queued or running share that job
+- Finished jobs are kept for ttl_seconds, then dropped
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from .broadcast import Broadcaster
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    """
+    Bounded-concurrency job runner with deduplication and TTL cleanup
+
+    Args:
+        max_workers: Jobs that may run at the same time
+        ttl_seconds: How long finished jobs stay retrievable
+    """
+
+    def __init__(self, max_workers: int = 2, ttl_seconds: float = 3600):
+        self.max_workers = max_workers
+        self.ttl_seconds = ttl_seconds
+        self.events = Broadcaster()
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._runners: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._active_by_key: Dict[str, str] = {}
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self.stats = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "expired": 0}
+        self._wait_ms_total = 0.0
+        self._run_ms_total = 0.0
+
+    def start(self):
+        """Start the worker pool (no-op if already running)"""
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_workers)]
+
+    async def stop(self):
+        """Stop the workers; running jobs are cancelled"""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+
+    def submit(
+        self, kind: str, params: Dict[str, Any], run: Callable[[], Awaitable[Any]]
+    ) -> Dict[str, Any]:
+        """
+        Queue a job, or return the queued/running job with the same kind and params
+
+        Args:
+            kind: Job type (e.g. "leak-detection")
+            params: Parameters that make the job distinct, used for deduplication
+            run: Coroutine function that performs the work
+
+        Returns:
+            Public view of the job
+        """
+        self.cleanup()
+        key = f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+        existing = self._active_by_key.get(key)
+        if existing is not None:
+            self.stats["deduplicated"] += 1
+            self._jobs[existing]["submissions"] += 1
+            return self.view(existing)
+
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "params": params,
+            "key": key,
+            "status": "queued",
+            "submissions": 1,
+            "submitted_at": datetime.now(timezone.utc).isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "_submitted": time.monotonic(),
+            "_finished": None,
+        }
+        self._runners[job_id] = run
+        self._active_by_key[key] = job_id
+        self.stats["submitted"] += 1
+        self._queue.put_nowait(job_id)
+        self._publish(job_id)
+        return self.view(job_id)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = self._jobs.get(job_id)
+        run = self._runners.pop(job_id, None)
+        if job is None or run is None:
+            return
+
+        started = time.monotonic()
+        self._wait_ms_total += (started - job["_submitted"]) * 1000
+        job["status"] = "running"
+        job["started_at"] = datetime.now(timezone.utc).isoformat()
+        self._publish(job_id)
+
+        try:
+            job["result"] = await run()
+            job["status"] = "succeeded"
+            self.stats["succeeded"] += 1
+        except asyncio.CancelledError:
+            job["status"] = "failed"
+            job["error"] = "cancelled"
+            self.stats["failed"] += 1
+            raise
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            self.stats["failed"] += 1
+        finally:
+            job["_finished"] = time.monotonic()
+            job["finished_at"] = datetime.now(timezone.utc).isoformat()
+            self._run_ms_total += (job["_finished"] - started) * 1000
+            self._active_by_key.pop(job["key"], None)
+            self._publish(job_id)
+
+    def _publish(self, job_id: str):
+        job = self._jobs[job_id]
+        self.events.publish({"type": "job_status", "job_id": job_id, "status": job["status"]})
+
+    def cleanup(self) -> int:
+        """
+        Drop finished jobs older than ttl_seconds
+
+        Returns:
+            Number of jobs removed
+        """
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["_finished"] is not None and job["_finished"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self.stats["expired"] += len(expired)
+        return len(expired)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job, or None if unknown or expired"""
+        self.cleanup()
+        return self.view(job_id) if job_id in self._jobs else None
+
+    def view(self, job_id: str) -> Dict[str, Any]:
+        return {k: v for k, v in self._jobs[job_id].items() if not k.startswith("_") and k != "key"}
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Jobs without their results, newest first"""
+        self.cleanup()
+        jobs = sorted(self._jobs.values(), key=lambda job: job["_submitted"], reverse=True)
+        return [{k: v for k, v in self.view(job["id"]).items() if k != "result"} for job in jobs]
+
+    def metrics(self) -> Dict[str, Any]:
+        finished = self.stats["succeeded"] + self.stats["failed"]
+        started = finished + sum(1 for job in self._jobs.values() if job["status"] == "running")
+        return {
+            **self.stats,
+            "queue_depth": self._queue.qsize(),
+            "running": sum(1 for job in self._jobs.values() if job["status"] == "running"),
+            "retained_jobs": len(self._jobs),
+            "workers": len(self._workers),
+            "max_workers": self.max_workers,
+            "avg_queue_wait_ms": round(self._wait_ms_total / started, 1) if started else 0.0,
+            "avg_run_ms": round(self._run_ms_total / finished, 1) if finished else 0.0,
+        }
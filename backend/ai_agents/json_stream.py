@@ -0,0 +1,75 @@
+"""
+Incremental JSON array parsing
+
+Pulls the elements of one array out of a JSON document while it is still
+streaming in, so findings from a streamed completion can be used before
+the whole response has arrived.
+"""
+import json
+import re
+from typing import Any, Dict, List
+
+
+class JSONArrayStream:
+    """
+    Complete objects of the array under `key`, as soon as each one closes
+
+    Feed text chunks in order; each call returns the objects completed by
+    that chunk. Objects that fail to parse are skipped; the final document
+    is still parsed as a whole by the caller.
+    """
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._pos = -1  # scan position once inside the array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = 0
+        self.done = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        if self.done:
+            return []
+        self._buffer += text
+        if self._pos < 0:
+            match = self._start.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        found = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of the array itself
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        item = json.loads(buffer[self._object_start:i + 1])
+                    except json.JSONDecodeError:
+                        item = None
+                    if isinstance(item, dict):
+                        found.append(item)
+            i += 1
+        self._pos = i
+        return found
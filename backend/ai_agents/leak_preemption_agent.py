@@ -6,17 +6,36 @@ Implements confidence-scored leak detection with explainability.
 """
 import os
 import json
+import time
+import asyncio
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from openai import AsyncOpenAI
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
 from dotenv import load_dotenv
 from .supabase_client import supabase_client
+from .sensor_state import sensor_state
+from .llm_gateway import llm_gateway
+from .json_stream import JSONArrayStream
+from .deadlines import call_timeout
+from .metrics import phase
+from .prompting import AliasTable, PromptBuilder
+from .model_routing import model_router
+from .decision_log import decision_writer
 
 # Load .env from project root (two levels up from this file)
 ROOT_DIR = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=ROOT_DIR / '.env')
 
+# LLM step of analyze(): (edge_data, edge_names, progress) ->
+# (leaks, call details with "prompt_stats" and "routing")
+Detector = Callable[
+    [Dict[str, List[Dict[str, Any]]], Optional[Dict[str, str]], Optional[Callable[[str, Dict[str, Any]], None]]],
+    Awaitable[Tuple[List[Dict[str, Any]], Dict[str, Any]]],
+]
+
+# Units of the leak indicator sensors, for prompt text
+INDICATOR_UNITS = {"pressure": "psi", "acoustic": "dB", "flow": "L/s"}
+
 
 class LeakPreemptionAgent:
     """
@@ -27,28 +46,36 @@ class LeakPreemptionAgent:
     """
 
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.agent_name = "Leak Preemption Agent"
         self.confidence_threshold = 0.84  # 84% as per spec
-        self.agent_id = None
-
-    async def _get_agent_id(self) -> str:
-        """Get agent ID from database"""
-        if not self.agent_id:
-            agent = await supabase_client.get_agent_by_name(self.agent_name)
-            if agent:
-                self.agent_id = agent["id"]
-        return self.agent_id
+        self.llm_budget_seconds = float(os.getenv("LEAK_LLM_BUDGET_SECONDS", "20"))
+        # Same indicator thresholds the prompt gives the model, for the rule-based fallback
+        self.leak_indicators = {
+            "pressure": ("below", 55),
+            "acoustic": ("above", 5),
+            "flow": ("above", 110),
+        }
 
-    async def _fetch_sensor_data(self) -> Dict[str, List[Dict[str, Any]]]:
+    async def _fetch_sensor_data(
+        self, snapshot: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Fetch and organize sensor data by edge (pipe)
         Only keeps the MOST RECENT sensor reading for each type per pipe
 
+        Args:
+            snapshot: Coordinator snapshot to read sensors from instead of Supabase
+
         Returns:
             Dictionary mapping edge_id to list of sensors (deduplicated)
         """
-        sensors = await supabase_client.get_sensors_with_assets()
+        if snapshot is not None:
+            sensors = snapshot["sensors"]
+            stale_ids = snapshot["stale_sensor_ids"]
+        else:
+            sensors = await supabase_client.get_sensors_with_assets()
+            sensor_state.apply(sensors)
+            stale_ids = sensor_state.stale_ids()
 
         # Group sensors by edge and type, keeping only the most recent
         edges_sensors = {}  # edge_id -> {sensor_type -> sensor_data}
@@ -73,95 +100,116 @@ class LeakPreemptionAgent:
                     if new_time > existing_time:
                         edges_sensors[asset_id][sensor_type] = sensor
 
-        # Convert back to list format for compatibility
+        # Convert back to list format for compatibility, flagging sensors
+        # that stopped reporting so their old values are not trusted
         edges_data = {}
         for edge_id, sensor_dict in edges_sensors.items():
-            edges_data[edge_id] = list(sensor_dict.values())
+            edges_data[edge_id] = [
+                {**sensor, "stale": sensor["id"] in stale_ids}
+                for sensor in sensor_dict.values()
+            ]
 
         return edges_data
 
-    def _prepare_prompt(self, edge_data: Dict[str, List[Dict[str, Any]]]) -> str:
+    def _tripped_indicators(self, sensors: List[Dict[str, Any]]) -> Dict[str, str]:
         """
-        Prepare prompt for OpenAI with sensor data
+        Leak indicators a pipe's fresh readings trip, keyed by sensor type
 
         Args:
-            edge_data: Dictionary of edge sensors
+            sensors: The pipe's latest sensors (from _fetch_sensor_data)
 
         Returns:
-            Formatted prompt string
+            Sensor type -> description of the reading that tripped it
+        """
+        indicators = {}
+        for sensor in sensors:
+            limit = self.leak_indicators.get(sensor["type"])
+            if limit is None or sensor.get("stale") or sensor.get("value") is None:
+                continue
+            direction, threshold = limit
+            value = sensor["value"]
+            if value < threshold if direction == "below" else value > threshold:
+                level = "low" if direction == "below" else "high"
+                indicators[sensor["type"]] = (
+                    f"{level}: {value} {sensor.get('unit', '')} ({direction} {threshold})"
+                )
+        return indicators
+
+    def indicator_text(self) -> str:
+        """Leak indicator thresholds as prompt text, e.g. pressure below 55 psi"""
+        return ", ".join(
+            f"{sensor_type} {direction} {threshold} {INDICATOR_UNITS[sensor_type]}"
+            for sensor_type, (direction, threshold) in self.leak_indicators.items()
+        )
+
+    def pipe_rows(
+        self, edge_data: Dict[str, List[Dict[str, Any]]], pipes: AliasTable
+    ) -> List[List[Any]]:
         """
-        prompt = """You are an expert leak detection AI agent for water distribution systems.
+        One prompt table row per pipe: alias, pressure, acoustic, flow
 
-Your task is to analyze sensor data from water pipes and predict leak likelihood using sensor fusion.
+        Pipes that trip the most indicators come first, so they are the last
+        to go if the prompt has to be cut to its token budget. An empty cell
+        means the pipe has no sensor of that type; STALE means the sensor
+        stopped reporting.
+        """
+        ranked = sorted(
+            edge_data.items(),
+            key=lambda item: len(self._tripped_indicators(item[1])),
+            reverse=True,
+        )
+        rows = []
+        for edge_id, sensors in ranked:
+            readings = {
+                sensor["type"]: "STALE" if sensor.get("stale") else sensor["value"]
+                for sensor in sensors
+            }
+            rows.append([pipes.alias(edge_id)] + [readings.get(t) for t in INDICATOR_UNITS])
+        return rows
 
-IMPORTANT BASELINE RANGES (for reference):
-- Pressure: NORMAL = 60-70 psi | LEAK INDICATOR = < 55 psi (sudden drop)
-- Acoustic: NORMAL = 2-3 dB   | LEAK INDICATOR = > 5 dB (spike in vibration/noise)
-- Flow:     NORMAL = 80-100 L/s | LEAK INDICATOR = > 110 L/s (unexpected increase)
+    def _build_prompt(
+        self, edge_data: Dict[str, List[Dict[str, Any]]]
+    ) -> Tuple[str, AliasTable, Dict[str, Any]]:
+        """
+        Prepare the compact prompt for OpenAI
 
-A leak is highly likely when you see:
-- Pressure DROP (below 55 psi) + Acoustic SPIKE (above 5 dB) = High confidence leak
-- Any TWO of these factors together = Moderate confidence leak
-- One factor alone = Low confidence, monitor
+        The instructions and schema form a fixed prefix (cacheable by the
+        provider); the readings follow as a table keyed by pipe aliases.
 
-Sensor Data by Pipe:
-"""
-        for edge_id, sensors in edge_data.items():
-            prompt += f"\n--- Pipe {edge_id} ---\n"
-            for sensor in sensors:
-                prompt += f"  - {sensor['type']}: {sensor['value']} {sensor['unit']} (last seen: {sensor['last_seen']})\n"
-
-        prompt += """
-Analyze this data and identify ANY pipes that show leak indicators. For each pipe with potential leak risk:
-
-1. Calculate a confidence score (0.0 to 1.0) based on:
-   - High acoustic readings (unusual vibrations/noise)
-   - Low pressure readings (indicating pressure loss)
-   - High flow readings (unexpected water movement)
-   - Combinations of these factors
-
-2. Provide reasoning explaining:
-   - What patterns you observed in the sensor data
-   - Why these patterns suggest a leak
-   - Which sensor readings are most concerning
-   - The urgency level (immediate, soon, monitor)
-
-3. Recommend specific actions:
-   - Which valves to isolate (if confidence > 0.84)
-   - Whether to dispatch maintenance crew
-   - Additional sensors to monitor
-
-Respond ONLY with a JSON object in this exact format:
-{
-  "leaks": [
-    {
-      "edge_id": "edge-uuid",
-      "confidence": 0.92,
-      "urgency": "immediate|soon|monitor",
-      "reasoning": "Detailed explanation of why this pipe likely has a leak...",
-      "sensor_indicators": {
-        "acoustic": "high|normal|low and explanation",
-        "pressure": "high|normal|low and explanation",
-        "flow": "high|normal|low and explanation"
-      },
-      "recommendation": {
-        "action": "isolate|monitor|inspect",
-        "valves_to_close": ["V1", "V2"],
-        "dispatch_crew": true,
-        "estimated_location": "description"
-      }
-    }
-  ]
-}
-
-IMPORTANT: You MUST detect pipes that meet the leak indicator criteria. Look for:
-- Pressure < 55 psi (P5 has 48, P7 has 52 - BOTH ARE LEAKS!)
-- Acoustic > 5 dB (P5 has 8.5, P7 has 6.2 - BOTH ARE LEAKS!)
-- Flow > 110 L/s (P5 has 125, P7 has 115 - BOTH ARE LEAKS!)
-
-If no leaks are detected, return: {"leaks": []}
-"""
-        return prompt
+        Args:
+            edge_data: Dictionary of edge sensors
+
+        Returns:
+            (prompt, pipe aliases to resolve edge_id with, prompt stats)
+        """
+        prefix = f"""You are an expert leak detection AI agent for water distribution systems. Analyze the pipe sensor readings below and flag EVERY pipe that shows leak indicators.
+
+Baseline: pressure 60-70 psi, acoustic 2-3 dB, flow 80-100 L/s
+Leak indicators: {self.indicator_text()}
+- Pressure drop + acoustic spike = high confidence leak
+- Any two indicators = moderate confidence
+- One indicator alone = low confidence, monitor
+- Recommend valves to isolate when confidence > {self.confidence_threshold}
+
+The readings table has one row per pipe. An empty cell means the pipe has no sensor of that type; STALE means the sensor stopped reporting, so do not use it.
+
+Respond ONLY with a JSON object in this exact format, using the pipe names from the table as edge_id:
+{{"leaks": [{{"edge_id": "p1", "confidence": 0.92, "urgency": "immediate|soon|monitor", "reasoning": "Which readings suggest a leak and why", "sensor_indicators": {{"acoustic": "high|normal|low and explanation", "pressure": "...", "flow": "..."}}, "recommendation": {{"action": "isolate|monitor|inspect", "valves_to_close": ["V1"], "dispatch_crew": true, "estimated_location": "description"}}}}]}}
+If no leaks are detected, return: {{"leaks": []}}"""
+        pipes = AliasTable("p")
+        builder = PromptBuilder("leak", prefix)
+        builder.table("Pipe readings:", ("pipe", "pressure_psi", "acoustic_db", "flow_ls"), self.pipe_rows(edge_data, pipes))
+        prompt = builder.build()
+        return prompt, pipes, builder.stats
+
+    def resolve_leak(
+        self, leak: Dict[str, Any], pipes: AliasTable, edge_names: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Map a leak's pipe alias back to the edge UUID (and name, if known)"""
+        leak["edge_id"] = pipes.resolve(leak.get("edge_id"))
+        if edge_names is not None and isinstance(leak["edge_id"], str):
+            leak["edge_name"] = edge_names.get(leak["edge_id"], leak["edge_id"][:8])
+        return leak
 
     def _calculate_priority(self, leak: Dict[str, Any]) -> int:
         """
@@ -225,9 +273,11 @@ If no leaks are detected, return: {"leaks": []}
             recommendation = leak.get("recommendation", {})
             sensor_indicators = leak.get("sensor_indicators", {})
 
-            # Get edge name from database for user-friendly display
-            edge = await supabase_client.query("edges", select="name", id=f"eq.{edge_id}")
-            edge_name = edge[0]["name"] if edge else edge_id[:8]
+            # Get edge name for user-friendly display
+            edge_name = leak.get("edge_name")
+            if not edge_name:
+                edge = await supabase_client.query("edges", select="name", id=f"eq.{edge_id}")
+                edge_name = edge[0]["name"] if edge else edge_id[:8]
 
             # Check for existing open incidents on this edge to prevent duplicates
             existing_incidents = await supabase_client.query(
@@ -279,16 +329,36 @@ If no leaks are detected, return: {"leaks": []}
             print(f"Error creating incident: {e}")
             return None
 
-    async def analyze(self) -> Dict[str, Any]:
+    async def analyze(
+        self,
+        snapshot: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        deadline: Optional[float] = None,
+        detector: Optional[Detector] = None,
+    ) -> Dict[str, Any]:
         """
         Main analysis function - detects leaks and generates recommendations
         Automatically creates incidents for actionable leaks (confidence > 70%)
 
+        Args:
+            snapshot: Coordinator snapshot (sensors and edges); read from
+                Supabase when not given
+            progress: Called with (event, data) for progress events and for
+                each leak as soon as it is complete in the streamed completion
+            deadline: Absolute run deadline (time.monotonic()); the LLM call
+                is cut off in time to fall back to the threshold rules
+            detector: Replaces the leak prompt as the LLM step; called with
+                (edge_data, edge_names, progress) and returns the leaks and
+                call details (the coordinator's fused safety+leak call uses this)
+
         Returns:
             Dictionary containing leak predictions and metadata
         """
         # Fetch sensor data
-        edge_data = await self._fetch_sensor_data()
+        with phase("leak", "fetch"):
+            edge_data = await self._fetch_sensor_data(snapshot)
+        if progress:
+            progress("progress", {"agent": "leak", "stage": "sensors_loaded", "pipes": len(edge_data)})
 
         if not edge_data:
             return {
@@ -297,65 +367,71 @@ If no leaks are detected, return: {"leaks": []}
                 "message": "No sensor data available for analysis"
             }
 
-        # Prepare prompt
-        prompt = self._prepare_prompt(edge_data)
+        edge_names = {e["id"]: e["name"] for e in snapshot["edges"]} if snapshot else None
+        detector = detector or self._detect_with_llm
 
-        # Call OpenAI
+        # Call OpenAI within the budget; on overrun or failure fall back to
+        # the threshold rules on the same readings
+        path_timings_ms = {}
+        fallback_reason = None
+        details = {}
+        timeout = call_timeout(self.llm_budget_seconds, deadline)
+        started = time.perf_counter()
         try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a leak detection expert AI. Analyze sensor data objectively and flag ALL pipes that meet leak indicator thresholds. Always respond with valid JSON only."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.5,  # Moderate temperature for reliable detection
-                response_format={"type": "json_object"}
-            )
-
-            # Parse response
-            result_text = response.choices[0].message.content
-
-            # Parse JSON response and extract leaks array
-            try:
-                result = json.loads(result_text)
-                # Extract "leaks" array from response object
-                leaks = result.get("leaks", [])
-                if not isinstance(leaks, list):
-                    leaks = []
-            except json.JSONDecodeError as e:
-                print(f"❌ Failed to parse OpenAI response: {e}")
-                print(f"Raw response: {result_text}")
-                leaks = []
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            leaks, details = await asyncio.wait_for(detector(edge_data, edge_names, progress), timeout)
+            path = "llm"
+        except asyncio.TimeoutError:
+            fallback_reason = f"LLM exceeded its {max(timeout, 0):.1f}s budget"
+        except Exception as e:
+            fallback_reason = f"LLM failed: {e}"
+        path_timings_ms["llm"] = round((time.perf_counter() - started) * 1000, 1)
+
+        if fallback_reason:
+            if progress:
+                progress("progress", {"agent": "leak", "stage": "fallback", "reason": fallback_reason})
+            started = time.perf_counter()
+            with phase("leak", "rules"):
+                leaks = self._detect_with_rules(edge_data)
+            path = "rules"
+            path_timings_ms["rules"] = round((time.perf_counter() - started) * 1000, 1)
+            if progress:
+                for leak in leaks:
+                    progress("finding", {"agent": "leak", "leak": leak})
 
+        try:
             # Enrich leaks with edge names for user-friendly display
-            for leak in leaks:
-                edge_id = leak.get("edge_id")
-                if edge_id:
-                    edge = await supabase_client.query("edges", select="name", id=f"eq.{edge_id}")
-                    leak["edge_name"] = edge[0]["name"] if edge else edge_id[:8]
-
-            # Filter leaks by confidence threshold for auto-creation (70%)
-            auto_create_threshold = 0.70
-            actionable_leaks = [
-                leak for leak in leaks
-                if leak.get("confidence", 0) >= auto_create_threshold
-            ]
-
-            # Automatically create incidents for actionable leaks
-            incidents_created = []
-            for leak in actionable_leaks:
-                incident = await self._create_incident(leak)
-                if incident:
-                    incidents_created.append(incident)
+            with phase("leak", "persist"):
+                for leak in leaks:
+                    edge_id = leak.get("edge_id")
+                    if edge_id and edge_names is not None:
+                        leak["edge_name"] = edge_names.get(edge_id, edge_id[:8])
+                    elif edge_id:
+                        edge = await supabase_client.query("edges", select="name", id=f"eq.{edge_id}")
+                        leak["edge_name"] = edge[0]["name"] if edge else edge_id[:8]
+
+                # Filter leaks by confidence threshold for auto-creation (70%)
+                auto_create_threshold = 0.70
+                actionable_leaks = [
+                    leak for leak in leaks
+                    if leak.get("confidence", 0) >= auto_create_threshold
+                ]
+
+                # Automatically create incidents for actionable leaks
+                incidents_created = []
+                for leak in actionable_leaks:
+                    incident = await self._create_incident(leak)
+                    if incident:
+                        incidents_created.append(incident)
 
             return {
                 "status": "success",
+                "path": path,
+                "path_timings_ms": path_timings_ms,
+                "fallback_reason": fallback_reason,
+                "prompt_stats": details.get("prompt_stats"),
+                "routing": details.get("routing"),
                 "leaks_detected": leaks,
                 "actionable_leaks": actionable_leaks,
                 "incidents_created": len(incidents_created),
@@ -363,6 +439,12 @@ If no leaks are detected, return: {"leaks": []}
                 "auto_create_threshold": auto_create_threshold,
                 "sensor_count": sum(len(sensors) for sensors in edge_data.values()),
                 "pipes_analyzed": len(edge_data),
+                "stale_sensors": [
+                    {"sensor_id": sensor["id"], "edge_id": edge_id, "type": sensor["type"], "last_seen": sensor["last_seen"]}
+                    for edge_id, sensors in edge_data.items()
+                    for sensor in sensors
+                    if sensor.get("stale")
+                ],
             }
 
         except Exception as e:
@@ -372,48 +454,181 @@ If no leaks are detected, return: {"leaks": []}
                 "leaks_detected": [],
             }
 
-    async def create_decision_record(self, analysis_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def _detect_with_llm(
+        self,
+        edge_data: Dict[str, List[Dict[str, Any]]],
+        edge_names: Optional[Dict[str, str]],
+        progress: Optional[Callable[[str, Dict[str, Any]], None]],
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
         """
-        Create an agent_decision record in Supabase
+        Stream the OpenAI analysis, reporting each leak as soon as it is complete
 
-        Args:
-            analysis_result: Output from analyze()
+        Runs on the cheap model first and escalates to the large one when
+        it reports confident leaks or disagrees with the threshold rules
+        (see model_routing). Findings streamed by the cheap tier carry
+        "tier": "cheap"; an "escalated" progress event means the
+        large-tier findings that follow supersede them.
 
         Returns:
-            Created decision record or None if error
+            (leaks with edge_id resolved to the edge UUID,
+             call details: prompt_stats and routing decision)
+
+        Raises:
+            ValueError: The large-tier completion was not valid JSON
         """
-        try:
-            agent_id = await self._get_agent_id()
-            if not agent_id:
-                return None
+        # Prepare prompt
+        with phase("leak", "prompt"):
+            prompt, pipes, prompt_stats = self._build_prompt(edge_data)
+        rule_leaks = self._detect_with_rules(edge_data)
+
+        async def call(model: str, tier: str) -> List[Dict[str, Any]]:
+            findings = JSONArrayStream("leaks")
+            with phase("leak", "llm"):
+                chunks = []
+                async for delta in llm_gateway.chat_stream(
+                    "leak",
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a leak detection expert AI. Analyze sensor data objectively and flag ALL pipes that meet leak indicator thresholds. Always respond with valid JSON only."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.5,  # Moderate temperature for reliable detection
+                    response_format={"type": "json_object"}
+                ):
+                    chunks.append(delta)
+                    if progress:
+                        for leak in findings.feed(delta):
+                            leak = self.resolve_leak(leak, pipes, edge_names)
+                            progress("finding", {"agent": "leak", "tier": tier, "leak": leak})
 
-            # Create decision for each actionable leak
-            decisions = []
-            for leak in analysis_result.get("actionable_leaks", []):
-                decision_data = {
-                    "agent_id": agent_id,
-                    "decision_type": "leak_detection",
-                    "input_data": {
-                        "edge_id": leak.get("edge_id"),
-                        "sensor_indicators": leak.get("sensor_indicators"),
-                        "pipes_analyzed": analysis_result.get("pipes_analyzed"),
-                    },
-                    "reasoning": leak.get("reasoning", ""),
-                    "recommendation": leak.get("recommendation", {}),
-                    "confidence": leak.get("confidence", 0),
-                    "status": "pending",
-                }
-                decisions.append(decision_data)
+            # Parse response
+            with phase("leak", "parse"):
+                result_text = "".join(chunks)
+                try:
+                    result = json.loads(result_text)
+                except json.JSONDecodeError as e:
+                    print(f"❌ Failed to parse OpenAI response: {e}")
+                    print(f"Raw response: {result_text}")
+                    raise ValueError(f"invalid JSON from OpenAI: {e}")
+                # Extract "leaks" array from response object
+                leaks = result.get("leaks", [])
+                if not isinstance(leaks, list):
+                    return []
+                return [self.resolve_leak(leak, pipes) for leak in leaks if isinstance(leak, dict)]
 
-            if decisions:
-                # Note: This will fail until agent_decisions table is created
-                # For now, we return the prepared data
-                # result = await supabase_client.insert("agent_decisions", decisions)
-                # return result
-                return {"decisions": decisions, "note": "Table agent_decisions needs to be created"}
+        def on_escalate(decision: Dict[str, Any]):
+            if progress:
+                progress("progress", {"agent": "leak", "stage": "escalated", "reason": decision["detail"]})
 
-            return None
+        leaks, routing = await model_router.route(
+            "leak", call, lambda leaks: self.escalation_reason(leaks, rule_leaks), on_escalate
+        )
+        return leaks, {"prompt_stats": prompt_stats, "routing": routing}
 
-        except Exception as e:
-            print(f"Error creating decision record: {e}")
-            return None
+    def escalation_reason(
+        self, leaks: List[Dict[str, Any]], rule_leaks: List[Dict[str, Any]]
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Why a cheap-tier answer needs the large model, or None to keep it
+
+        Escalates on leaks at or above the router's escalation confidence,
+        on pipes the rules flag with two or more indicators that the cheap
+        model missed, and on pipes it flags that trip no indicator at all.
+        """
+        threshold = model_router.escalation_confidence
+        confident = [leak for leak in leaks if (leak.get("confidence") or 0) >= threshold]
+        if confident:
+            return "findings", f"{len(confident)} leak(s) at or above {threshold} confidence"
+
+        flagged = {leak.get("edge_id") for leak in leaks}
+        rule_flagged = {leak["edge_id"] for leak in rule_leaks}
+        missed = {leak["edge_id"] for leak in rule_leaks if leak["confidence"] >= 0.75} - flagged
+        unsupported = flagged - rule_flagged
+        if missed or unsupported:
+            return "disagreement", (
+                f"cheap model missed {len(missed)} pipe(s) the rules flag and flagged "
+                f"{len(unsupported)} pipe(s) with no tripped indicator"
+            )
+        return None
+
+    def _detect_with_rules(self, edge_data: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Deterministic leak screen using the same indicator thresholds the
+        prompt gives the model; stale readings are ignored
+
+        Args:
+            edge_data: Dictionary of edge sensors
+
+        Returns:
+            Leaks in the same shape as the LLM returns them
+        """
+        leaks = []
+        for edge_id, sensors in edge_data.items():
+            indicators = self._tripped_indicators(sensors)
+            if not indicators:
+                continue
+            if len(indicators) == 3:
+                confidence = 0.95
+            elif {"pressure", "acoustic"} <= set(indicators):
+                confidence = 0.9
+            elif len(indicators) == 2:
+                confidence = 0.75
+            else:
+                confidence = 0.5
+            urgency = "immediate" if confidence >= 0.9 else "soon" if confidence >= 0.75 else "monitor"
+            leaks.append({
+                "edge_id": edge_id,
+                "confidence": confidence,
+                "urgency": urgency,
+                "reasoning": (
+                    f"Rule-based screen: {len(indicators)} leak indicator(s) tripped "
+                    f"({', '.join(sorted(indicators))})"
+                ),
+                "sensor_indicators": indicators,
+                "recommendation": {
+                    "action": (
+                        "isolate" if confidence > self.confidence_threshold
+                        else "inspect" if confidence >= 0.75
+                        else "monitor"
+                    ),
+                    "valves_to_close": [],
+                    "dispatch_crew": confidence > self.confidence_threshold,
+                    "estimated_location": "along the pipe",
+                },
+            })
+        return leaks
+
+    def create_decision_record(self, analysis_result: Dict[str, Any]) -> int:
+        """
+        Queue agent_decision records for the actionable leaks
+
+        Written in the background by the decision writer; never waits on Supabase.
+
+        Args:
+            analysis_result: Output from analyze()
+
+        Returns:
+            Number of decision records queued
+        """
+        decisions = []
+        for leak in analysis_result.get("actionable_leaks", []):
+            decisions.append({
+                "decision_type": "leak_detection",
+                "input_data": {
+                    "edge_id": leak.get("edge_id"),
+                    "sensor_indicators": leak.get("sensor_indicators"),
+                    "pipes_analyzed": analysis_result.get("pipes_analyzed"),
+                    "path": analysis_result.get("path"),
+                },
+                "reasoning": leak.get("reasoning", ""),
+                "recommendation": leak.get("recommendation", {}),
+                "confidence": leak.get("confidence", 0),
+                "status": "pending",
+            })
+        return decision_writer.enqueue(self.agent_name, decisions)
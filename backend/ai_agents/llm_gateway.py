@@ -0,0 +1,306 @@
+"""
+Shared LLM gateway
+
+Every agent sends its OpenAI calls through one gateway instead of owning a
+client, so the process as a whole stays inside the provider's limits:
+
+- One AsyncOpenAI client over a pooled HTTP connection
+- At most LLM_MAX_CONCURRENCY calls in flight
+- Request- and token-per-minute buckets, refilled continuously
+- Priority lanes: waiting safety calls go first, then leak, energy and
+  analytics; within a lane calls are served in arrival order
+- 429 responses are retried with jittered exponential backoff (honouring
+  Retry-After), giving the slot back to other callers while waiting
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, AsyncIterator
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, RateLimitError
+from .metrics import registry, LLM_QUEUE_WAIT_SECONDS, LLM_REQUESTS, LLM_TOKENS, LLM_RETRIES
+
+# Load .env from project root
+ROOT_DIR = Path(__file__).parent.parent.parent
+load_dotenv(dotenv_path=ROOT_DIR / '.env')
+
+# Lower value is served first
+PRIORITIES = {"safety": 0, "leak": 1, "energy": 2, "analytics": 3}
+
+# Completion tokens reserved for calls that do not set max_tokens
+DEFAULT_COMPLETION_RESERVE = 1000
+
+
+class TokenBucket:
+    """
+    Per-minute budget refilled continuously
+
+    The level may go negative when a call turns out larger than reserved;
+    later callers then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (0 if it is now)"""
+        self._refill()
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def give_back(self, amount: float):
+        """Return an over-reservation (or, if negative, charge the shortfall)"""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+def _estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Rough prompt size (4 characters per token) plus the completion reserve"""
+    chars = sum(len(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+    return chars // 4 + int(kwargs.get("max_tokens") or DEFAULT_COMPLETION_RESERVE)
+
+
+class LLMGateway:
+    """
+    Admission control and retries for chat completions
+
+    Args:
+        max_concurrency: Calls allowed in flight at once
+        requests_per_minute: Request bucket size
+        tokens_per_minute: Token bucket size (prompt + completion)
+        max_retries: Retries after a 429 before the error is raised
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 30000,
+        max_retries: int = 4,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._client: Optional[AsyncOpenAI] = None
+        self._waiting: List[list] = []  # heap of [priority, seq, tokens, future]
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Shared client; retries are left to the gateway"""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_concurrency,
+                        max_keepalive_connections=self.max_concurrency,
+                    ),
+                    timeout=httpx.Timeout(120.0, connect=10.0),
+                ),
+            )
+        return self._client
+
+    async def chat(self, agent: str, **kwargs) -> Any:
+        """
+        chat.completions.create through the gateway
+
+        Args:
+            agent: Calling agent; selects the priority lane ("safety",
+                "leak", "energy" or "analytics")
+            **kwargs: Arguments for chat.completions.create
+
+        Returns:
+            The completion response
+        """
+        priority = PRIORITIES.get(agent, len(PRIORITIES))
+        reserved = min(_estimate_tokens(kwargs), self.tokens.capacity)
+        # Retries keep their original place in the lane
+        seq = next(self._seq)
+
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            await self._acquire(priority, seq, reserved)
+            LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued, agent)
+            try:
+                response = await self.client.chat.completions.create(**kwargs)
+            except RateLimitError as e:
+                LLM_REQUESTS.inc(agent, "rate_limited")
+                if attempt == self.max_retries:
+                    raise
+                LLM_RETRIES.inc(agent)
+                delay = self._backoff(attempt, e)
+            except Exception:
+                LLM_REQUESTS.inc(agent, "error")
+                raise
+            else:
+                LLM_REQUESTS.inc(agent, "ok")
+                self._record_usage(agent, getattr(response, "usage", None), reserved)
+                return response
+            finally:
+                self._release()
+
+            await asyncio.sleep(delay)
+
+    async def chat_stream(self, agent: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Streaming chat completion through the gateway
+
+        Holds its slot until the stream ends or the caller stops reading.
+        A 429 is retried only before any content has been yielded.
+
+        Args:
+            agent: Calling agent; selects the priority lane
+            **kwargs: Arguments for chat.completions.create (without stream)
+
+        Yields:
+            Content deltas as they arrive
+        """
+        priority = PRIORITIES.get(agent, len(PRIORITIES))
+        reserved = min(_estimate_tokens(kwargs), self.tokens.capacity)
+        seq = next(self._seq)
+
+        for attempt in range(self.max_retries + 1):
+            queued = time.perf_counter()
+            await self._acquire(priority, seq, reserved)
+            LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued, agent)
+            try:
+                try:
+                    stream = await self.client.chat.completions.create(
+                        stream=True, stream_options={"include_usage": True}, **kwargs
+                    )
+                except RateLimitError as e:
+                    LLM_REQUESTS.inc(agent, "rate_limited")
+                    if attempt == self.max_retries:
+                        raise
+                    LLM_RETRIES.inc(agent)
+                    delay = self._backoff(attempt, e)
+                else:
+                    try:
+                        async for chunk in stream:
+                            if chunk.usage is not None:
+                                self._record_usage(agent, chunk.usage, reserved)
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                    finally:
+                        # Drops the connection when the caller stops early
+                        await stream.close()
+                    LLM_REQUESTS.inc(agent, "ok")
+                    return
+            except RateLimitError:
+                raise
+            except Exception:
+                LLM_REQUESTS.inc(agent, "error")
+                raise
+            finally:
+                self._release()
+
+            await asyncio.sleep(delay)
+
+    def _record_usage(self, agent: str, usage: Any, reserved: float):
+        """Count tokens and settle the reservation against actual usage"""
+        if usage is None:
+            return
+        LLM_TOKENS.inc(agent, "prompt", amount=usage.prompt_tokens)
+        LLM_TOKENS.inc(agent, "completion", amount=usage.completion_tokens)
+        self.tokens.give_back(reserved - usage.total_tokens)
+
+    def _backoff(self, attempt: int, error: RateLimitError) -> float:
+        """Retry-After if the provider sent one, else full-jitter exponential backoff"""
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after", ""))
+            except ValueError:
+                pass
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 0.5)
+        return random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+
+    async def _acquire(self, priority: int, seq: int, tokens: float):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, [priority, seq, tokens, future])
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted in the same tick the caller gave up
+                self._release()
+            raise
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admit waiting calls in priority order while slots and budget allow"""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiting and self._in_flight < self.max_concurrency:
+            _, _, tokens, future = self._waiting[0]
+            if future.cancelled():
+                heapq.heappop(self._waiting)
+                continue
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                # Strict priority: the head call holds back lower lanes
+                self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiting)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._in_flight += 1
+            future.set_result(None)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": sum(1 for entry in self._waiting if not entry[3].cancelled()),
+            "max_concurrency": self.max_concurrency,
+            "request_budget": round(self.requests.level, 1),
+            "token_budget": round(self.tokens.level),
+        }
+
+
+# Global instance
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+    tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "30000")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+)
+
+registry.gauge(
+    "aware_llm_in_flight", "LLM calls currently in flight",
+    callback=lambda: {(): llm_gateway.metrics()["in_flight"]},
+)
+registry.gauge(
+    "aware_llm_waiting", "LLM calls waiting for admission",
+    callback=lambda: {(): llm_gateway.metrics()["waiting"]},
+)
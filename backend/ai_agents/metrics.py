@@ -0,0 +1,265 @@
+"""
+In-process metrics
+
+Counters, gauges and latency histograms rendered in the Prometheus text
+exposition format for /metrics. Recording is a dictionary lookup and a
+bisect, cheap enough (about a microsecond) to leave on in production.
+"""
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Callable, Iterable, Optional
+
+# Seconds; covers in-memory work through slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        """Current value per label set"""
+        return dict(self._values)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge:
+    """Point-in-time value per label set, set directly or read from a callback"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.callback = callback
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labelvalues: str):
+        self._values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        values = self.callback() if self.callback else self._values
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in values.items()
+        ]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labelvalues: str) -> "Timer":
+        """Context manager that observes the elapsed seconds"""
+        return Timer(self, labelvalues)
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Timer:
+    """Observes elapsed wall time into a histogram on exit"""
+
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram: Histogram, labelvalues: LabelValues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+
+class Registry:
+    """Named collection of metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, callback))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+SUPABASE_REQUEST_SECONDS = registry.histogram(
+    "aware_supabase_request_seconds", "Supabase REST call latency", ("table", "verb")
+)
+SUPABASE_ROWS = registry.counter(
+    "aware_supabase_rows_total", "Rows returned or written by Supabase REST calls", ("table", "verb")
+)
+SUPABASE_BYTES = registry.counter(
+    "aware_supabase_response_bytes_total", "Response bytes received from Supabase", ("table", "verb")
+)
+SUPABASE_ERRORS = registry.counter(
+    "aware_supabase_errors_total", "Failed Supabase REST calls", ("table", "verb")
+)
+AGENT_PHASE_SECONDS = registry.histogram(
+    "aware_agent_phase_seconds",
+    "Time spent per agent phase (fetch, prompt, llm, parse, persist, ...)",
+    ("agent", "phase"),
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "aware_http_request_seconds", "FastAPI route latency", ("method", "route", "status")
+)
+LLM_QUEUE_WAIT_SECONDS = registry.histogram(
+    "aware_llm_queue_wait_seconds", "Time LLM calls wait for gateway admission", ("agent",)
+)
+LLM_REQUESTS = registry.counter(
+    "aware_llm_requests_total", "LLM calls by outcome (ok, rate_limited, error)", ("agent", "outcome")
+)
+LLM_TOKENS = registry.counter(
+    "aware_llm_tokens_total", "Tokens used by LLM calls", ("agent", "kind")
+)
+LLM_RETRIES = registry.counter(
+    "aware_llm_retries_total", "LLM calls retried after a 429", ("agent",)
+)
+LLM_ROUTED = registry.counter(
+    "aware_llm_routed_total", "Routed LLM calls by the tier whose answer was used", ("agent", "tier")
+)
+LLM_ESCALATIONS = registry.counter(
+    "aware_llm_escalations_total", "Routed LLM calls escalated to the large model", ("agent", "reason")
+)
+LLM_TIER_SECONDS = registry.histogram(
+    "aware_llm_tier_seconds", "Routed LLM call latency per model tier", ("agent", "tier")
+)
+DECISION_ROWS = registry.counter(
+    "aware_decision_rows_total", "agent_decisions rows by outcome (queued, written, dropped)", ("outcome",)
+)
+DECISION_FLUSH_SECONDS = registry.histogram(
+    "aware_decision_flush_seconds", "agent_decisions batch insert latency, including retries"
+)
+TOPOLOGY_REQUESTS = registry.counter(
+    "aware_topology_requests_total",
+    "/network/topology responses: not_modified (304), cached (body reused), rebuilt or unversioned",
+    ("result",),
+)
+TOPOLOGY_EDGES_REDERIVED = registry.counter(
+    "aware_topology_edges_rederived_total", "Edge payloads recomputed by the materialized topology view"
+)
+NETWORK_FEED_UPDATES = registry.counter(
+    "aware_network_feed_updates_total",
+    "Live map updates: sent to a client, or coalesced into one already pending",
+    ("result",),
+)
+TOPOLOGY_CHANGE_RESPONSES = registry.counter(
+    "aware_topology_change_responses_total",
+    "/network/topology/changes responses: delta, or full when the cursor could not be answered",
+    ("result",),
+)
+PROMPT_TOKENS = registry.histogram(
+    "aware_prompt_tokens",
+    "Prompt size in tokens (counted locally) per agent",
+    ("agent",),
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+PROMPT_ROWS_OMITTED = registry.counter(
+    "aware_prompt_rows_omitted_total", "Data rows dropped to keep prompts within budget", ("agent",)
+)
+
+
+def phase(agent: str, name: str) -> Timer:
+    """Time one phase of an agent run: `with phase("leak", "llm"): ...`"""
+    return AGENT_PHASE_SECONDS.time(agent, name)
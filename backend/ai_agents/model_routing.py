@@ -0,0 +1,165 @@
+"""
+Tiered model routing
+
+Most cycles are routine ("all clear"), and the large model is wasted on
+them. A routed call runs on the cheap tier first (LLM_CHEAP_MODEL, default
+gpt-4o-mini). The caller then checks the answer. The call is repeated on the
+large tier (LLM_LARGE_MODEL, default gpt-4o), and that answer used instead,
+only when one of these holds:
+- the cheap answer reports findings at or above the escalation confidence
+- it disagrees with the rule engine
+- the cheap call failed
+
+Calls that are not routed (energy plans, analytics) use
+LLM_MODEL_<AGENT>, falling back to the large model.
+"""
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, TypeVar
+from .metrics import registry, LLM_ROUTED, LLM_ESCALATIONS, LLM_TIER_SECONDS
+
+T = TypeVar("T")
+
+# (reason kind for metrics, human-readable detail) or None to keep the cheap answer
+Escalation = Optional[Tuple[str, str]]
+
+
+class ModelRouter:
+    """
+    Cheap-first model selection with escalation to the large model
+
+    Args:
+        enabled: Route through the cheap tier (default LLM_TIERED_ROUTING)
+        cheap_model: Model for routine cycles
+        large_model: Model for escalations and unrouted calls
+        escalation_confidence: Cheap-tier findings at or above this
+            confidence are re-checked by the large model
+        history: Number of recent decisions kept for /ai/routing
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        cheap_model: str = "gpt-4o-mini",
+        large_model: str = "gpt-4o",
+        escalation_confidence: float = 0.7,
+        history: int = 100,
+    ):
+        self.enabled = enabled
+        self.cheap_model = cheap_model
+        self.large_model = large_model
+        self.escalation_confidence = escalation_confidence
+        self._decisions = deque(maxlen=history)
+        # agent -> {"routed": n, "escalated": n}
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def model(self, agent: str) -> str:
+        """Model for an unrouted call"""
+        return os.getenv(f"LLM_MODEL_{agent.upper()}") or self.large_model
+
+    async def route(
+        self,
+        agent: str,
+        call: Callable[[str, str], Awaitable[T]],
+        escalation: Callable[[T], Escalation],
+        on_escalate: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Tuple[T, Dict[str, Any]]:
+        """
+        Run call on the cheap tier, escalating to the large tier if needed
+
+        Args:
+            agent: Agent name, for metrics
+            call: Makes the LLM call; called with (model, tier)
+            escalation: Inspects the cheap answer; returns (reason, detail)
+                to escalate or None to keep it
+            on_escalate: Called with the decision so far when escalating
+                (e.g. to tell stream clients the cheap findings are superseded)
+
+        Returns:
+            (the answer used, routing decision)
+
+        Raises:
+            Whatever the large-tier call raises
+        """
+        timings_ms = {}
+        decision = {"agent": agent, "decided_at": datetime.now().isoformat(), "escalated": False}
+
+        if self.enabled:
+            started = time.perf_counter()
+            try:
+                result = await call(self.cheap_model, "cheap")
+                reason = escalation(result)
+            except Exception as e:
+                reason = ("cheap_failed", f"cheap tier failed: {e}")
+            elapsed = time.perf_counter() - started
+            timings_ms["cheap"] = round(elapsed * 1000, 1)
+            LLM_TIER_SECONDS.observe(elapsed, agent, "cheap")
+
+            if reason is None:
+                decision.update(tier="cheap", model=self.cheap_model, timings_ms=timings_ms)
+                self._record(decision)
+                return result, decision
+
+            decision.update(escalated=True, reason=reason[0], detail=reason[1])
+            LLM_ESCALATIONS.inc(agent, reason[0])
+            if on_escalate:
+                on_escalate(dict(decision, timings_ms=timings_ms))
+
+        started = time.perf_counter()
+        result = await call(self.large_model, "large")
+        elapsed = time.perf_counter() - started
+        timings_ms["large"] = round(elapsed * 1000, 1)
+        LLM_TIER_SECONDS.observe(elapsed, agent, "large")
+
+        decision.update(tier="large", model=self.large_model, timings_ms=timings_ms)
+        self._record(decision)
+        return result, decision
+
+    def _record(self, decision: Dict[str, Any]):
+        LLM_ROUTED.inc(decision["agent"], decision["tier"])
+        self._decisions.append(decision)
+        if not self.enabled:
+            return
+        counts = self._counts.setdefault(decision["agent"], {"routed": 0, "escalated": 0})
+        counts["routed"] += 1
+        counts["escalated"] += decision["escalated"]
+
+    def escalation_rates(self) -> Dict[str, float]:
+        """Share of routed calls per agent that needed the large model"""
+        return {
+            agent: counts["escalated"] / counts["routed"]
+            for agent, counts in self._counts.items()
+            if counts["routed"]
+        }
+
+    def status(self) -> Dict[str, Any]:
+        """Configuration, per-agent escalation counts and recent decisions"""
+        rates = self.escalation_rates()
+        return {
+            "enabled": self.enabled,
+            "cheap_model": self.cheap_model,
+            "large_model": self.large_model,
+            "escalation_confidence": self.escalation_confidence,
+            "agents": {
+                agent: {**counts, "escalation_rate": round(rates.get(agent, 0.0), 3)}
+                for agent, counts in self._counts.items()
+            },
+            "recent_decisions": list(reversed(self._decisions)),
+        }
+
+
+# Global instance
+model_router = ModelRouter(
+    enabled=os.getenv("LLM_TIERED_ROUTING", "true").lower() == "true",
+    cheap_model=os.getenv("LLM_CHEAP_MODEL", "gpt-4o-mini"),
+    large_model=os.getenv("LLM_LARGE_MODEL", "gpt-4o"),
+    escalation_confidence=float(os.getenv("LLM_ESCALATION_CONFIDENCE", "0.7")),
+)
+
+registry.gauge(
+    "aware_llm_escalation_ratio", "Share of routed LLM calls escalated to the large model",
+    ("agent",),
+    callback=lambda: {(agent,): rate for agent, rate in model_router.escalation_rates().items()},
+)
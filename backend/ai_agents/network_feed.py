@@ -0,0 +1,264 @@
+"""
+Live network map updates
+
+A background loop wakes when the polled table versions change (and at
+least once per interval, for sensors going stale), brings the topology up
+to date and reads what changed from the topology change log. Edges whose
+status, leak_indicators or incident counts moved are pushed to
+subscribers, as are node changes, removals and the incident summary.
+
+Each subscriber holds at most one pending update per entity. Updates to
+the same edge that arrive before the subscriber takes them are merged, so
+a slow consumer gets fewer, coalesced updates instead of a growing
+backlog. Its buffer is bounded by the size of the network.
+"""
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Set
+from .metrics import NETWORK_FEED_UPDATES
+from .topology_changes import TopologyChangeLog
+
+INCIDENT_FIELDS = (
+    "active_incident_count",
+    "total_incident_count",
+    "has_open_incidents",
+    "has_acknowledged_incidents",
+)
+
+
+def edge_changes(previous: Optional[Dict[str, Any]], edge: Dict[str, Any]) -> List[str]:
+    """Which of status, leak_indicators and incidents differ between two edge payloads"""
+    if previous is None:
+        return ["status", "leak_indicators", "incidents"]
+    changes = []
+    if previous.get("status") != edge.get("status"):
+        changes.append("status")
+    if previous.get("leak_indicators") != edge.get("leak_indicators"):
+        changes.append("leak_indicators")
+    if any(previous.get(field) != edge.get(field) for field in INCIDENT_FIELDS):
+        changes.append("incidents")
+    return changes
+
+
+class NetworkSubscription:
+    """
+    One subscriber's pending updates, at most one per entity
+
+    Args:
+        coalesce_seconds: How long to keep collecting after the first pending update
+    """
+
+    def __init__(self, coalesce_seconds: float = 0.25):
+        self.coalesce_seconds = coalesce_seconds
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._ready = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def push(self, key: str, update: Dict[str, Any]):
+        """Queue an update, merging it into one already pending for the same entity"""
+        previous = self._pending.get(key)
+        if previous is not None:
+            NETWORK_FEED_UPDATES.inc("coalesced")
+            if update["type"] == "edge" and previous["type"] == "edge":
+                changes = previous["data"]["changes"] + [
+                    change for change in update["data"]["changes"]
+                    if change not in previous["data"]["changes"]
+                ]
+                update = {
+                    "type": "edge",
+                    "data": {
+                        **update["data"],
+                        "changes": changes,
+                        "previous_status": previous["data"]["previous_status"],
+                    },
+                }
+        self._pending[key] = update
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Wait up to timeout for updates, then return everything pending
+
+        Returns:
+            Pending updates in first-queued order; empty on timeout
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return []
+        # Let closely spaced updates to the same edges merge first
+        await asyncio.sleep(self.coalesce_seconds)
+        batch = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        NETWORK_FEED_UPDATES.inc("sent", amount=len(batch))
+        return batch
+
+
+class NetworkFeed:
+    """
+    Push topology changes to subscribed map clients
+
+    Args:
+        refresh: Brings the topology change log up to date (rebuilding only if needed)
+        changes: Change log the topology builds are recorded in
+        interval_seconds: Longest wait between refreshes while anyone is subscribed
+        coalesce_seconds: Per-subscriber merge window
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Awaitable[Any]],
+        changes: TopologyChangeLog,
+        interval_seconds: float = 5.0,
+        coalesce_seconds: float = 0.25,
+    ):
+        self.refresh = refresh
+        self.changes = changes
+        self.interval_seconds = interval_seconds
+        self.coalesce_seconds = coalesce_seconds
+        self._subscribers: Set[NetworkSubscription] = set()
+        self._wake = asyncio.Event()
+        # Change log cursor and edge payloads as last pushed
+        self._cursor: Optional[str] = None
+        self._edges: Dict[str, Dict[str, Any]] = {}
+        self._summary: Dict[str, Any] = {}
+        self.refreshes = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background loop (no-op if already running)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and wait for it to exit"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._task and not self._task.done())
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def notify(self, changed_tables: Optional[Set[str]] = None):
+        """Wake the loop, e.g. from DataVersions.on_change"""
+        self._wake.set()
+
+    async def subscribe(self) -> NetworkSubscription:
+        """
+        Register a subscriber after bringing the topology up to date
+
+        Pending changes are pushed to the existing subscribers first, so the
+        caller can send changes.snapshot() right away and later updates are
+        relative to it.
+        """
+        await self._refresh()
+        subscription = NetworkSubscription(self.coalesce_seconds)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: NetworkSubscription):
+        self._subscribers.discard(subscription)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not self._subscribers:
+                continue
+            started = time.monotonic()
+            try:
+                await self._refresh()
+            except Exception as e:
+                self.errors += 1
+                print(f"Could not refresh network feed: {e}")
+            # Don't refresh more often than the merge window
+            await asyncio.sleep(max(0.0, self.coalesce_seconds - (time.monotonic() - started)))
+
+    async def _refresh(self):
+        await self.refresh()
+        self.refreshes += 1
+        if not self.changes.recorded:
+            return
+        if self._cursor is None:
+            # Nothing pushed yet: start from the current state silently
+            snapshot = self.changes.snapshot()
+            self._edges = {edge["id"]: edge for edge in snapshot["edges"]}
+            self._summary = snapshot["incident_summary"]
+            self._cursor = snapshot["cursor"]
+            return
+        self.publish(self.changes.changes_since(self._cursor))
+
+    def publish(self, delta: Dict[str, Any]):
+        """Push a change log delta (or full snapshot) to every subscriber"""
+        self._cursor = delta["cursor"]
+        updates: List[tuple] = []
+
+        edges = delta["edges"]
+        removed_edges = delta.get("removed", {}).get("edges", [])
+        if delta["full"]:
+            current = {edge["id"] for edge in edges}
+            removed_edges = [edge_id for edge_id in self._edges if edge_id not in current]
+        for edge in edges:
+            previous = self._edges.get(edge["id"])
+            self._edges[edge["id"]] = edge
+            changes = edge_changes(previous, edge)
+            if not changes:
+                continue
+            updates.append((f"edge:{edge['id']}", {
+                "type": "edge",
+                "data": {
+                    "edge_id": edge["id"],
+                    "changes": changes,
+                    "previous_status": previous.get("status") if previous else None,
+                    # The incident list itself stays out of the push; it can
+                    # be read from /network/topology/changes
+                    **{key: value for key, value in edge.items() if key != "all_incidents"},
+                },
+            }))
+        for edge_id in removed_edges:
+            self._edges.pop(edge_id, None)
+            updates.append((f"edge:{edge_id}", {"type": "removed", "data": {"kind": "edges", "id": edge_id}}))
+
+        # Nodes carry no derived state; a full snapshot resends none of them
+        if not delta["full"]:
+            for node in delta["nodes"]:
+                updates.append((f"node:{node['id']}", {"type": "node", "data": node}))
+            for node_id in delta.get("removed", {}).get("nodes", []):
+                updates.append((f"node:{node_id}", {"type": "removed", "data": {"kind": "nodes", "id": node_id}}))
+
+        if delta["incident_summary"] != self._summary:
+            self._summary = delta["incident_summary"]
+            updates.append(("summary", {"type": "summary", "data": self._summary}))
+
+        for subscription in self._subscribers:
+            for key, update in updates:
+                subscription.push(key, update)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "subscribers": self.subscriber_count,
+            "pending": sum(subscription.pending for subscription in self._subscribers),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "cursor": self._cursor,
+        }
@@ -0,0 +1,233 @@
+"""
+Non-Revenue Water Engine
+
+Computes NRW from the network flow balance: water entering a district
+(system input volume) minus water delivered at its downstream demand points
+(authorized consumption), integrated over a time window from the hourly
+flow rollups.
+
+- System input: flow on pipes leaving a reservoir, or entering the district
+  from another district
+- Authorized consumption: flow on pipes into terminal nodes (nodes with no
+  outgoing pipes), which is where customers draw water
+- Exports: flow on pipes leaving the district for another district, which is
+  not lost water
+- Districts: nodes.zone; a pipe belongs to the district of its downstream node
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from .supabase_client import supabase_client
+from .timestamps import parse_timestamp, truncate_to_hour
+
+SYSTEM_ZONE = "system"
+DEFAULT_ZONE = "default"
+
+
+class NRWEngine:
+    """
+    Deterministic NRW calculator over flow rollups
+
+    Network topology changes rarely, so it is cached for
+    topology_ttl_seconds; each computation then needs a single rollup query.
+    """
+
+    def __init__(self, topology_ttl_seconds: float = 300):
+        self.topology_ttl_seconds = topology_ttl_seconds
+        self._topology: Optional[Dict[str, Any]] = None
+        self._topology_loaded_at = 0.0
+
+    async def _load_topology(self) -> Dict[str, Any]:
+        """Nodes and edges, cached for topology_ttl_seconds"""
+        if self._topology and time.monotonic() - self._topology_loaded_at < self.topology_ttl_seconds:
+            return self._topology
+        nodes = await supabase_client.query("nodes", select="id,name,type,zone")
+        edges = await supabase_client.query("edges", select="id,name,from_node_id,to_node_id")
+        self._topology = {"nodes": nodes, "edges": edges}
+        self._topology_loaded_at = time.monotonic()
+        return self._topology
+
+    async def zones(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Metered pipes per district for the current (cached) topology
+
+        Returns:
+            classify_meters() output for the network
+        """
+        topology = await self._load_topology()
+        return self.classify_meters(topology["nodes"], topology["edges"])
+
+    def classify_meters(
+        self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Decide which pipes measure input, consumption and exports per district
+
+        Returns:
+            zone -> {"input": [...], "consumption": [...], "export": [...]} edge
+            ids, including a "system" entry for the whole network
+        """
+        node_by_id = {node["id"]: node for node in nodes}
+        # Reservoirs are the supply; tanks only count when there are none
+        source_types = {"reservoir"} if any(n["type"] == "reservoir" for n in nodes) else {"tank"}
+        has_outgoing = {edge["from_node_id"] for edge in edges}
+
+        def zone_of(node_id: str) -> str:
+            node = node_by_id.get(node_id) or {}
+            return node.get("zone") or DEFAULT_ZONE
+
+        def is_source(node_id: str) -> bool:
+            return (node_by_id.get(node_id) or {}).get("type") in source_types
+
+        def new_meters() -> Dict[str, List[str]]:
+            return {"input": [], "consumption": [], "export": []}
+
+        meters: Dict[str, Dict[str, List[str]]] = {SYSTEM_ZONE: new_meters()}
+        for edge in edges:
+            upstream, downstream = edge["from_node_id"], edge["to_node_id"]
+            zone = zone_of(downstream)
+            zone_meters = meters.setdefault(zone, new_meters())
+
+            if is_source(upstream):
+                meters[SYSTEM_ZONE]["input"].append(edge["id"])
+                zone_meters["input"].append(edge["id"])
+            elif zone_of(upstream) != zone:
+                zone_meters["input"].append(edge["id"])
+                meters.setdefault(zone_of(upstream), new_meters())["export"].append(edge["id"])
+            if downstream not in has_outgoing and not is_source(downstream):
+                zone_meters["consumption"].append(edge["id"])
+                meters[SYSTEM_ZONE]["consumption"].append(edge["id"])
+
+        return meters
+
+    def _sensor_volume_m3(
+        self,
+        rollups: List[Tuple[datetime, float]],
+        current_lps: Optional[float],
+        start: datetime,
+        end: datetime,
+        live: bool,
+    ) -> Tuple[float, float]:
+        """
+        Volume through one flow sensor over [start, end)
+
+        Hours with a rollup use the hourly average. In a live window (one
+        ending now) the time after the last rollup is filled with the current
+        reading; other uncovered time adds no volume and shows up only as
+        missing coverage.
+
+        Returns:
+            (volume in m3, seconds covered by rollups)
+        """
+        volume = 0.0
+        covered = 0.0
+        tail_start = start
+        for hour, avg_lps in rollups:
+            overlap = (min(hour + timedelta(hours=1), end) - max(hour, start)).total_seconds()
+            if overlap > 0:
+                volume += avg_lps * overlap / 1000
+                covered += overlap
+                tail_start = max(tail_start, min(hour + timedelta(hours=1), end))
+        if live and current_lps is not None and end > tail_start:
+            volume += current_lps * (end - tail_start).total_seconds() / 1000
+        return volume, covered
+
+    async def compute(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        zone: Optional[str] = None,
+        sensors: Optional[List[Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Compute NRW per district over [start, end)
+
+        Args:
+            start: Window start (default: 24 hours before end)
+            end: Window end (default: now)
+            zone: Only this district (default: every district plus "system")
+            sensors: Current sensor rows, to avoid re-reading the sensors table
+
+        Returns:
+            Dictionary with per-zone volumes, NRW and data coverage
+        """
+        started = time.perf_counter()
+        end = end or datetime.now(timezone.utc)
+        start = start or end - timedelta(hours=24)
+        window_seconds = (end - start).total_seconds()
+        # Only a window reaching into the current hour can use current readings
+        live = end >= truncate_to_hour(datetime.now(timezone.utc))
+
+        topology = await self._load_topology()
+        if sensors is None:
+            sensors = await supabase_client.get_sensors_with_assets()
+
+        meters = self.classify_meters(topology["nodes"], topology["edges"])
+        if zone is not None:
+            meters = {z: m for z, m in meters.items() if z == zone}
+
+        metered_edges = {
+            edge_id for m in meters.values() for edge_id in m["input"] + m["consumption"] + m["export"]
+        }
+        flow_sensors: Dict[str, List[Dict[str, Any]]] = {}
+        for sensor in sensors:
+            if sensor["type"] == "flow" and sensor["asset_type"] == "edge" and sensor["asset_id"] in metered_edges:
+                flow_sensors.setdefault(sensor["asset_id"], []).append(sensor)
+
+        sensor_ids = [s["id"] for group in flow_sensors.values() for s in group]
+        rollup_rows = await supabase_client.get_hourly_rollups(
+            sensor_ids,
+            start.replace(minute=0, second=0, microsecond=0),
+            end,
+        )
+        rollups: Dict[str, List[Tuple[datetime, float]]] = {}
+        for row in rollup_rows:
+            hour = parse_timestamp(row["hour"])
+            if hour is not None:
+                rollups.setdefault(row["sensor_id"], []).append((hour, row["avg_value"]))
+
+        # Volume per metered pipe, averaged over its flow sensors
+        edge_volume: Dict[str, float] = {}
+        edge_coverage: Dict[str, float] = {}
+        for edge_id, group in flow_sensors.items():
+            volumes = [
+                self._sensor_volume_m3(rollups.get(s["id"], []), s.get("value"), start, end, live)
+                for s in group
+            ]
+            edge_volume[edge_id] = sum(v for v, _ in volumes) / len(volumes)
+            edge_coverage[edge_id] = sum(c for _, c in volumes) / len(volumes) / window_seconds
+
+        zones = {}
+        for zone_name, zone_meters in meters.items():
+            inputs = [e for e in zone_meters["input"] if e in edge_volume]
+            consumers = [e for e in zone_meters["consumption"] if e in edge_volume]
+            exports = [e for e in zone_meters["export"] if e in edge_volume]
+            system_input = sum(edge_volume[e] for e in inputs)
+            consumption = sum(edge_volume[e] for e in consumers)
+            exported = sum(edge_volume[e] for e in exports)
+            nrw = system_input - consumption - exported
+            measured = inputs + consumers + exports
+            zones[zone_name] = {
+                "system_input_m3": round(system_input, 2),
+                "authorized_consumption_m3": round(consumption, 2),
+                "exported_m3": round(exported, 2),
+                "nrw_m3": round(nrw, 2),
+                "nrw_percentage": round(nrw / system_input * 100, 2) if system_input > 0 else None,
+                "input_meters": len(inputs),
+                "consumption_meters": len(consumers),
+                "unmetered_input_pipes": len(zone_meters["input"]) - len(inputs),
+                "unmetered_consumption_pipes": len(zone_meters["consumption"]) - len(consumers),
+                "unmetered_export_pipes": len(zone_meters["export"]) - len(exports),
+                "rollup_coverage": (
+                    round(sum(edge_coverage[e] for e in measured) / len(measured), 3)
+                    if measured
+                    else 0.0
+                ),
+            }
+
+        return {
+            "window_start": start.isoformat(),
+            "window_end": end.isoformat(),
+            "zones": zones,
+            "compute_time_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
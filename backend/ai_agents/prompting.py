@@ -0,0 +1,212 @@
+"""
+Shared prompt building
+
+Prompts are assembled as a stable prefix (role, rules, output schema), which
+is identical on every run so provider-side prompt caching can reuse it,
+followed by the run's data as compact CSV-style tables:
+
+- UUIDs are replaced by short aliases (p1, a2, ...) and mapped back when
+  the model's answer is parsed
+- Only the columns a task needs are sent (no timestamps or row metadata)
+- Tokens are counted locally and each agent has a token budget; when the
+  data would overrun it, the lowest-priority rows are dropped and the
+  prompt says how many were left out
+"""
+import math
+import os
+import re
+from typing import Dict, List, Any, Optional, Iterable, Sequence
+from .metrics import PROMPT_TOKENS, PROMPT_ROWS_OMITTED
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to an estimate; close enough for budgeting
+    tiktoken = None
+
+# Prompt token budgets per agent; override with PROMPT_TOKEN_BUDGET_<AGENT>
+DEFAULT_TOKEN_BUDGETS = {
+    "leak": 6000,
+    "safety": 6000,
+    "fused": 8000,
+    "energy": 3000,
+    "analytics": 4000,
+}
+
+_encoding = None
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Tokens in text for GPT-4o
+
+    Uses tiktoken's o200k_base encoding when it is installed; otherwise
+    estimates from letter runs (about 4 characters per token), digit runs
+    (about 3 digits per token) and punctuation (one token each).
+    """
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    total = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            total += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            total += math.ceil(len(piece) / 3)
+        else:
+            total += 1
+    return total
+
+
+def token_budget(agent: str) -> int:
+    """Prompt token budget for an agent"""
+    value = os.getenv(f"PROMPT_TOKEN_BUDGET_{agent.upper()}")
+    return int(value) if value else DEFAULT_TOKEN_BUDGETS.get(agent, 4000)
+
+
+def format_value(value: Any) -> str:
+    """Compact cell text: trimmed floats, no None"""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    text = str(value)
+    # Keep the CSV readable if a name contains the separator
+    return f'"{text}"' if "," in text else text
+
+
+def _omission_note(rows: int) -> str:
+    return f"({rows} more {'row' if rows == 1 else 'rows'} omitted to fit the token budget)"
+
+
+class AliasTable:
+    """
+    Short, stable-within-a-prompt names for long identifiers
+
+    Args:
+        prefix: Alias prefix, e.g. "p" for pipes -> p1, p2, ...
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._aliases: Dict[str, str] = {}
+        self._ids: Dict[str, str] = {}
+
+    def alias(self, identifier: str) -> str:
+        if identifier not in self._aliases:
+            alias = f"{self.prefix}{len(self._aliases) + 1}"
+            self._aliases[identifier] = alias
+            self._ids[alias] = identifier
+        return self._aliases[identifier]
+
+    def resolve(self, alias: Any) -> Any:
+        """Original identifier for an alias; anything else is returned unchanged"""
+        if not isinstance(alias, str):
+            return alias
+        return self._ids.get(alias.strip().lower(), alias)
+
+    def resolve_all(self, aliases: Iterable[Any]) -> List[Any]:
+        return [self.resolve(alias) for alias in aliases]
+
+
+class PromptBuilder:
+    """
+    Stable prefix first, then budgeted data sections
+
+    Args:
+        agent: Agent name, for the token budget and metrics
+        prefix: Instructions and output schema; must not contain run data
+        budget: Prompt token budget (default: token_budget(agent))
+    """
+
+    def __init__(self, agent: str, prefix: str, budget: Optional[int] = None):
+        self.agent = agent
+        self.prefix = prefix.strip()
+        self.budget = budget if budget is not None else token_budget(agent)
+        self._sections: List[Dict[str, Any]] = []
+        self.stats: Dict[str, Any] = {}
+
+    def text(self, text: str) -> "PromptBuilder":
+        """Add a short data section that is always kept"""
+        self._sections.append({"text": text.strip()})
+        return self
+
+    def table(
+        self, title: str, columns: Sequence[str], rows: Sequence[Sequence[Any]]
+    ) -> "PromptBuilder":
+        """
+        Add a CSV-style table
+
+        Add tables, and their rows, most important first; if the prompt is
+        over budget, rows are dropped from the end.
+        """
+        self._sections.append({
+            "title": title,
+            "header": ",".join(columns),
+            "rows": [",".join(format_value(cell) for cell in row) for row in rows],
+        })
+        return self
+
+    def build(self) -> str:
+        """Assemble the prompt within the token budget and record its size"""
+        fixed = [self.prefix]
+        for section in self._sections:
+            if "text" in section:
+                fixed.append(section["text"])
+            else:
+                fixed.append(f"{section['title']}\n{section['header']}")
+        # Keep room for an omission note under every table
+        tables = sum(1 for section in self._sections if "rows" in section)
+        remaining = (
+            self.budget
+            - count_tokens("\n\n".join(fixed))
+            - tables * (count_tokens(_omission_note(1000)) + 1)
+        )
+
+        # Fill tables in order, each row costing its tokens plus a newline;
+        # once a row does not fit, later (less important) rows are dropped too
+        kept_rows = []
+        omitted = 0
+        full = False
+        for section in self._sections:
+            if "rows" not in section:
+                kept_rows.append(None)
+                continue
+            kept = []
+            for row in section["rows"]:
+                cost = count_tokens(row) + 1
+                if full or cost > remaining:
+                    full = True
+                    break
+                kept.append(row)
+                remaining -= cost
+            omitted += len(section["rows"]) - len(kept)
+            kept_rows.append((kept, len(section["rows"]) - len(kept)))
+
+        parts = [self.prefix]
+        for section, kept in zip(self._sections, kept_rows):
+            if kept is None:
+                parts.append(section["text"])
+                continue
+            rows, dropped = kept
+            lines = [section["title"], section["header"], *rows]
+            if dropped:
+                lines.append(_omission_note(dropped))
+            parts.append("\n".join(lines))
+        prompt = "\n\n".join(parts)
+
+        prompt_tokens = count_tokens(prompt)
+        self.stats = {
+            "agent": self.agent,
+            "prompt_tokens": prompt_tokens,
+            "prefix_tokens": count_tokens(self.prefix),
+            "budget": self.budget,
+            "rows_omitted": omitted,
+            "tokenizer": "o200k_base" if tiktoken is not None else "estimate",
+        }
+        PROMPT_TOKENS.observe(prompt_tokens, self.agent)
+        if omitted:
+            PROMPT_ROWS_OMITTED.inc(self.agent, amount=omitted)
+        return prompt
@@ -6,16 +6,31 @@ Zero tolerance for safety violations - immediate alerts and recommendations.
 """
 import os
 import json
+import time
+import asyncio
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from openai import AsyncOpenAI
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from dotenv import load_dotenv
 from .supabase_client import supabase_client
+from .safety_rules import SafetyRuleEngine, load_operator_rules
+from .sensor_state import sensor_state
+from .llm_gateway import llm_gateway
+from .deadlines import call_timeout
+from .metrics import phase
+from .prompting import AliasTable, PromptBuilder
+from .model_routing import model_router
+from .decision_log import decision_writer
 
 # Load .env from project root (two levels up from this file)
 ROOT_DIR = Path(__file__).parent.parent.parent
 load_dotenv(dotenv_path=ROOT_DIR / '.env')
 
+# Prompt row order: flagged readings first so they survive budget trimming
+FLAG_ORDER = {"CRITICAL": 0, "LOW": 1, "HIGH": 1, "STALE": 2, "": 3}
+
+SAFETY_SCHEMA = """{"safety_status": "SAFE|WARNING|CRITICAL", "issues": [{"severity": "CRITICAL|HIGH|MEDIUM|LOW", "category": "pressure|flow|acoustic|equipment", "affected_assets": ["a1"], "description": "Clear description of the issue", "reasoning": "Why this is a safety concern", "immediate_actions": ["Action 1"], "estimated_time_to_failure": "immediate|hours|days|N/A", "confidence": 0.95}], "overall_assessment": "Summary of system safety state", "monitoring_recommendations": ["..."]}"""
+
 
 class SafetyMonitorAgent:
     """
@@ -26,32 +41,42 @@ class SafetyMonitorAgent:
     """
 
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.agent_name = "Safety Monitor Agent"
-        self.agent_id = None
 
         # Safety thresholds
         self.critical_low_pressure = 30  # psi - Critical safety level
         self.min_safe_pressure = 40  # psi - Minimum safe operating pressure
         self.max_safe_pressure = 120  # psi - Maximum to prevent pipe damage
 
-    async def _get_agent_id(self) -> str:
-        """Get agent ID from database"""
-        if not self.agent_id:
-            agent = await supabase_client.get_agent_by_name(self.agent_name)
-            if agent:
-                self.agent_id = agent["id"]
-        return self.agent_id
-
-    async def _fetch_safety_data(self) -> Dict[str, Any]:
+        # Verdicts come from the rule engine; the LLM only adds commentary
+        self.rule_engine = SafetyRuleEngine(
+            critical_low_pressure=self.critical_low_pressure,
+            min_safe_pressure=self.min_safe_pressure,
+            max_safe_pressure=self.max_safe_pressure,
+            rules=load_operator_rules(),
+        )
+        self.llm_enrichment = os.getenv("SAFETY_LLM_ENRICHMENT", "true").lower() == "true"
+        self.llm_budget_seconds = float(os.getenv("SAFETY_LLM_BUDGET_SECONDS", "20"))
+        self.fetch_budget_seconds = float(os.getenv("SAFETY_FETCH_BUDGET_SECONDS", "3"))
+        self.last_enrichment = None
+        self._enrichment_task = None
+
+    async def fetch_safety_data(self, snapshot: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Fetch all sensors and system state for safety monitoring
 
+        Args:
+            snapshot: Coordinator snapshot to read from instead of Supabase
+
         Returns:
             Dictionary with sensor readings and system state
         """
         # Get all sensors
-        sensors = await supabase_client.get_sensors_with_assets()
+        if snapshot is not None:
+            sensors = snapshot["sensors"]
+        else:
+            sensors = await supabase_client.get_sensors_with_assets()
+            sensor_state.apply(sensors)
 
         # Categorize sensors
         pressure_sensors = [s for s in sensors if s["type"] == "pressure"]
@@ -59,13 +84,19 @@ class SafetyMonitorAgent:
         acoustic_sensors = [s for s in sensors if s["type"] == "acoustic"]
 
         # Get valves and pumps status
-        valves_pumps = await supabase_client.get_valves_pumps()
+        if snapshot is not None:
+            valves_pumps = snapshot["valves_pumps"]
+        else:
+            valves_pumps = await supabase_client.get_valves_pumps()
 
         return {
             "pressure_sensors": pressure_sensors,
             "flow_sensors": flow_sensors,
             "acoustic_sensors": acoustic_sensors,
             "valves_pumps": valves_pumps,
+            "stale_sensor_ids": (
+                snapshot["stale_sensor_ids"] if snapshot is not None else sensor_state.stale_ids()
+            ),
             "thresholds": {
                 "critical_low_pressure": self.critical_low_pressure,
                 "min_safe_pressure": self.min_safe_pressure,
@@ -73,116 +104,152 @@ class SafetyMonitorAgent:
             },
         }
 
-    def _prepare_prompt(self, data: Dict[str, Any]) -> str:
+    def threshold_text(self) -> str:
+        """Safety thresholds as prompt text"""
+        return (
+            f"critical low pressure < {self.critical_low_pressure} psi (EMERGENCY), "
+            f"minimum safe {self.min_safe_pressure} psi, maximum safe {self.max_safe_pressure} psi"
+        )
+
+    def reading_flag(self, sensor: Dict[str, Any], stale_ids) -> str:
+        """STALE, CRITICAL, LOW or HIGH for a reading; empty when normal"""
+        if sensor["id"] in stale_ids or sensor.get("stale"):
+            return "STALE"
+        if sensor["type"] == "pressure":
+            if sensor["value"] < self.critical_low_pressure:
+                return "CRITICAL"
+            if sensor["value"] < self.min_safe_pressure:
+                return "LOW"
+            if sensor["value"] > self.max_safe_pressure:
+                return "HIGH"
+        return ""
+
+    def reading_rows(
+        self, sensors: List[Dict[str, Any]], stale_ids, assets: AliasTable
+    ) -> List[List[Any]]:
+        """
+        Prompt table rows (asset, type, value, unit, flag), flagged readings first
+
+        Stale readings carry no value, so the model cannot use them.
         """
-        Prepare safety monitoring prompt for OpenAI
+        flagged = [(self.reading_flag(sensor, stale_ids), sensor) for sensor in sensors]
+        flagged.sort(key=lambda item: FLAG_ORDER[item[0]])
+        return [
+            [
+                assets.alias(sensor["asset_id"]),
+                sensor["type"],
+                None if flag == "STALE" else sensor["value"],
+                sensor["unit"],
+                flag,
+            ]
+            for flag, sensor in flagged
+        ]
+
+    @staticmethod
+    def valve_rows(valves_pumps: List[Dict[str, Any]]) -> List[List[Any]]:
+        """Prompt table rows (name, kind, status) for valves and pumps"""
+        return [[vp["name"], vp["kind"], vp["status"]] for vp in valves_pumps]
+
+    @staticmethod
+    def resolve_issues(result: Dict[str, Any], *tables: AliasTable) -> Dict[str, Any]:
+        """Map the asset aliases in each issue's affected_assets back to asset IDs"""
+        for issue in result.get("issues") or []:
+            if not isinstance(issue, dict) or not isinstance(issue.get("affected_assets"), list):
+                continue
+            resolved = issue["affected_assets"]
+            for table in tables:
+                resolved = table.resolve_all(resolved)
+            issue["affected_assets"] = resolved
+        return result
+
+    def _build_prompt(self, data: Dict[str, Any]) -> Tuple[str, AliasTable, Dict[str, Any]]:
+        """
+        Prepare the compact safety monitoring prompt for OpenAI
 
         Args:
-            data: Safety data from _fetch_safety_data()
+            data: Safety data from fetch_safety_data()
 
         Returns:
-            Formatted prompt string
+            (prompt, asset aliases to resolve affected_assets with, prompt stats)
         """
-        prompt = """You are a water system safety monitoring AI with ZERO TOLERANCE for safety violations.
-
-Your task is to analyze real-time sensor data and identify ANY safety concerns, anomalies, or violations.
-
-Safety Thresholds:
-"""
-        thresholds = data["thresholds"]
-        prompt += f"  - Critical Low Pressure: < {thresholds['critical_low_pressure']} psi (EMERGENCY)\n"
-        prompt += f"  - Minimum Safe Pressure: {thresholds['min_safe_pressure']} psi\n"
-        prompt += f"  - Maximum Safe Pressure: {thresholds['max_safe_pressure']} psi\n\n"
-
-        prompt += "Current Sensor Readings:\n\n"
-
-        prompt += "Pressure Sensors:\n"
-        for sensor in data["pressure_sensors"]:
-            value = sensor["value"]
-            status_flag = ""
-            if value < thresholds["critical_low_pressure"]:
-                status_flag = " ⚠️ CRITICAL"
-            elif value < thresholds["min_safe_pressure"]:
-                status_flag = " ⚠️ LOW"
-            elif value > thresholds["max_safe_pressure"]:
-                status_flag = " ⚠️ HIGH"
-            prompt += f"  - Asset {sensor['asset_id']}: {value} {sensor['unit']}{status_flag}\n"
-
-        prompt += "\nFlow Sensors:\n"
-        for sensor in data["flow_sensors"]:
-            prompt += f"  - Asset {sensor['asset_id']}: {sensor['value']} {sensor['unit']}\n"
-
-        prompt += "\nAcoustic Sensors:\n"
-        for sensor in data["acoustic_sensors"]:
-            prompt += f"  - Asset {sensor['asset_id']}: {sensor['value']} {sensor['unit']}\n"
-
-        prompt += "\nValves and Pumps:\n"
-        for vp in data["valves_pumps"]:
-            prompt += f"  - {vp['name']} ({vp['kind']}): {vp['status']}\n"
-
-        prompt += """
-Analyze this data for safety issues:
-
-1. **Pressure Violations**:
-   - Critical low pressure (< 30 psi) = EMERGENCY - immediate action required
-   - Low pressure (< 40 psi) = WARNING - investigate and address
-   - High pressure (> 120 psi) = WARNING - risk of pipe damage
-
-2. **System Anomalies**:
-   - Unusual flow patterns (sudden spikes or drops)
-   - Acoustic anomalies (possible leaks or equipment issues)
-   - Pump/valve malfunctions
-
-3. **Cascading Risks**:
-   - Multiple sensors showing concerning trends
-   - Patterns that could lead to system failure
-   - Contamination risks
-
-For EACH safety concern identified, provide:
-- Severity level (CRITICAL, HIGH, MEDIUM, LOW)
-- Affected components/locations
-- Detailed reasoning
-- Immediate actions required
-- Estimated time to failure (if applicable)
-
-Respond ONLY with a JSON object:
-{
-  "safety_status": "SAFE|WARNING|CRITICAL",
-  "issues": [
-    {
-      "severity": "CRITICAL|HIGH|MEDIUM|LOW",
-      "category": "pressure|flow|acoustic|equipment",
-      "affected_assets": ["asset-id-1", "asset-id-2"],
-      "description": "Clear description of the issue",
-      "reasoning": "Why this is a safety concern...",
-      "immediate_actions": ["Action 1", "Action 2"],
-      "estimated_time_to_failure": "immediate|hours|days|N/A",
-      "confidence": 0.95
-    }
-  ],
-  "overall_assessment": "Summary of system safety state",
-  "monitoring_recommendations": ["Continue monitoring X", "Increase sensor frequency for Y"]
-}
-
-If system is SAFE, return:
-{
-  "safety_status": "SAFE",
-  "issues": [],
-  "overall_assessment": "All systems operating within safe parameters",
-  "monitoring_recommendations": []
-}
-"""
-        return prompt
-
-    async def monitor(self) -> Dict[str, Any]:
+        prefix = f"""You are a water system safety monitoring AI with ZERO TOLERANCE for safety violations. Identify ANY safety concerns, anomalies, or violations in the readings below.
+
+Safety thresholds: {self.threshold_text()}
+Look for:
+1. Pressure violations (flagged CRITICAL, LOW or HIGH in the table)
+2. System anomalies: unusual flow, acoustic anomalies, pump/valve malfunctions
+3. Cascading risks: several sensors trending badly, patterns that could lead to failure, contamination risks
+
+Readings are one row per sensor, keyed by asset name (a1, a2, ...). flag STALE means the sensor stopped reporting and has no current value.
+
+Respond ONLY with a JSON object in this exact format, using the asset names from the table in affected_assets:
+{SAFETY_SCHEMA}
+If the system is SAFE, return "safety_status": "SAFE" with "issues": []."""
+        assets = AliasTable("a")
+        sensors = data["pressure_sensors"] + data["flow_sensors"] + data["acoustic_sensors"]
+        builder = PromptBuilder("safety", prefix)
+        builder.table(
+            "Sensor readings:",
+            ("asset", "type", "value", "unit", "flag"),
+            self.reading_rows(sensors, data.get("stale_sensor_ids", set()), assets),
+        )
+        builder.table("Valves and pumps:", ("name", "kind", "status"), self.valve_rows(data["valves_pumps"]))
+        prompt = builder.build()
+        return prompt, assets, builder.stats
+
+    async def monitor(
+        self,
+        enrich: Optional[bool] = None,
+        snapshot: Optional[Dict[str, Any]] = None,
+        progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
         """
         Main monitoring function - checks safety and returns issues
 
+        The verdict comes from the rule engine and never waits on OpenAI.
+        LLM enrichment, when enabled, runs in the background and its latest
+        result is attached to later responses.
+
+        Args:
+            enrich: Start background LLM enrichment (default: SAFETY_LLM_ENRICHMENT)
+            snapshot: Coordinator snapshot; read from Supabase when not given
+            progress: Called with (event, data) for each issue found
+            deadline: Absolute run deadline (time.monotonic()); a Supabase
+                read that would overrun it is abandoned and the rules run on
+                the last sensor state held in memory
+
         Returns:
             Dictionary containing safety assessment
         """
         # Fetch safety data
-        data = await self._fetch_safety_data()
+        fallback_reason = None
+        started = time.perf_counter()
+        with phase("safety", "fetch"):
+            if snapshot is not None:
+                data = await self.fetch_safety_data(snapshot)
+                data_source = "snapshot"
+            else:
+                try:
+                    timeout = call_timeout(self.fetch_budget_seconds, deadline, reserve_seconds=0.1)
+                    if timeout <= 0:
+                        raise asyncio.TimeoutError()
+                    data = await asyncio.wait_for(self.fetch_safety_data(), timeout)
+                    data_source = "live"
+                except Exception as e:
+                    if not sensor_state.sensors():
+                        raise
+                    fallback_reason = (
+                        "sensor read exceeded its budget" if isinstance(e, asyncio.TimeoutError)
+                        else f"sensor read failed: {e}"
+                    )
+                    data = await self.fetch_safety_data({
+                        "sensors": sensor_state.sensors(),
+                        "valves_pumps": [],
+                        "stale_sensor_ids": sensor_state.stale_ids(),
+                    })
+                    data_source = "sensor_state"
+        path_timings_ms = {"fetch": round((time.perf_counter() - started) * 1000, 1)}
 
         if not data.get("pressure_sensors"):
             return {
@@ -191,108 +258,214 @@ If system is SAFE, return:
                 "message": "No sensor data available for safety monitoring",
             }
 
-        # Prepare prompt
-        prompt = self._prepare_prompt(data)
-
-        # Call OpenAI
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a safety monitoring expert AI with zero tolerance for safety violations. Always respond with valid JSON only."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.0,  # Zero temperature - we want deterministic safety checks
-                response_format={"type": "json_object"}
+        started = time.perf_counter()
+        with phase("safety", "rules"):
+            verdict = self.rule_engine.evaluate(
+                data["pressure_sensors"] + data["flow_sensors"] + data["acoustic_sensors"],
+                stale_ids=data["stale_sensor_ids"],
+            )
+        path_timings_ms["rules"] = round((time.perf_counter() - started) * 1000, 1)
+        if progress:
+            for issue in verdict["issues"]:
+                progress("finding", {"agent": "safety", "issue": issue})
+            progress("progress", {
+                "agent": "safety", "stage": "rules_evaluated", "safety_status": verdict["safety_status"],
+            })
+
+        if self.llm_enrichment if enrich is None else enrich:
+            self._start_enrichment(data, verdict["safety_status"])
+
+        if verdict["issues"]:
+            overall_assessment = (
+                f"{len(verdict['critical_issues'])} critical and {len(verdict['high_issues'])} "
+                f"high severity safety issues detected"
             )
+        else:
+            overall_assessment = "All systems operating within safe parameters"
 
-            # Parse response
-            result = json.loads(response.choices[0].message.content)
+        return {
+            "status": "success",
+            "source": "rules",
+            "path": "rules",
+            "path_timings_ms": path_timings_ms,
+            "data_source": data_source,
+            "fallback_reason": fallback_reason,
+            "safety_status": verdict["safety_status"],
+            "issues": verdict["issues"],
+            "critical_issues": verdict["critical_issues"],
+            "high_issues": verdict["high_issues"],
+            "overall_assessment": overall_assessment,
+            "monitoring_recommendations": (
+                self.last_enrichment.get("monitoring_recommendations", [])
+                if self.last_enrichment
+                else []
+            ),
+            "evaluation_time_ms": verdict["evaluation_time_ms"],
+            "stale_sensor_count": len(data["stale_sensor_ids"]),
+            "enrichment": self.enrichment_status(),
+            "sensor_counts": {
+                "pressure": len(data["pressure_sensors"]),
+                "flow": len(data["flow_sensors"]),
+                "acoustic": len(data["acoustic_sensors"]),
+            },
+        }
 
-            # Categorize issues by severity
-            critical_issues = [
-                issue for issue in result.get("issues", [])
-                if issue.get("severity") == "CRITICAL"
-            ]
-            high_issues = [
-                issue for issue in result.get("issues", [])
-                if issue.get("severity") == "HIGH"
-            ]
+    def _start_enrichment(self, data: Dict[str, Any], rule_status: Optional[str] = None):
+        """Start LLM enrichment in the background unless one is already running"""
+        if self._enrichment_task and not self._enrichment_task.done():
+            return
+        self._enrichment_task = asyncio.create_task(self._enrich(data, rule_status))
+
+    def enrichment_status(self) -> Dict[str, Any]:
+        """Latest enrichment result plus whether a newer one is in flight"""
+        running = bool(self._enrichment_task and not self._enrichment_task.done())
+        if not self.last_enrichment:
+            if running:
+                return {"status": "pending"}
+            return {"status": "none" if self.llm_enrichment else "disabled"}
+        return {**self.last_enrichment, "refreshing": running}
+
+    def rule_status(self, data: Dict[str, Any]) -> str:
+        """The rule engine's safety_status for safety data"""
+        return self.rule_engine.evaluate(
+            data["pressure_sensors"] + data["flow_sensors"] + data["acoustic_sensors"],
+            stale_ids=data["stale_sensor_ids"],
+        )["safety_status"]
+
+    def escalation_reason(
+        self, result: Dict[str, Any], rule_status: Optional[str]
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Why a cheap-tier safety review needs the large model, or None to keep it
 
-            return {
-                "status": "success",
-                "safety_status": result.get("safety_status", "UNKNOWN"),
-                "issues": result.get("issues", []),
-                "critical_issues": critical_issues,
-                "high_issues": high_issues,
-                "overall_assessment": result.get("overall_assessment", ""),
-                "monitoring_recommendations": result.get("monitoring_recommendations", []),
-                "sensor_counts": {
-                    "pressure": len(data["pressure_sensors"]),
-                    "flow": len(data["flow_sensors"]),
-                    "acoustic": len(data["acoustic_sensors"]),
-                },
-            }
+        Escalates on CRITICAL/HIGH issues at or above the router's escalation
+        confidence, and when the overall status differs from the rule engine's.
+        """
+        threshold = model_router.escalation_confidence
+        serious = [
+            issue for issue in result.get("issues") or []
+            if isinstance(issue, dict)
+            and issue.get("severity") in ("CRITICAL", "HIGH")
+            and (issue.get("confidence") or 0) >= threshold
+        ]
+        if serious:
+            return "findings", f"{len(serious)} critical/high issue(s) at or above {threshold} confidence"
+        status = result.get("safety_status")
+        if rule_status and status != rule_status:
+            return "disagreement", f"cheap model says {status}, rules say {rule_status}"
+        return None
+
+    async def _enrich(self, data: Dict[str, Any], rule_status: Optional[str] = None):
+        """
+        Ask OpenAI for commentary on the current readings
+
+        Runs on the cheap model first and escalates to the large one on
+        serious issues or disagreement with the rules' status. Stores the
+        result in last_enrichment; never affects the verdict.
+        """
+        with phase("safety_enrichment", "prompt"):
+            prompt, assets, prompt_stats = self._build_prompt(data)
+
+        async def call(model: str, tier: str) -> Dict[str, Any]:
+            with phase("safety_enrichment", "llm"):
+                response = await llm_gateway.chat(
+                    "safety",
+                    model=model,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a safety monitoring expert AI with zero tolerance for safety violations. Always respond with valid JSON only."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.0,  # Zero temperature - we want deterministic safety checks
+                    response_format={"type": "json_object"}
+                )
+
+            # Parse response
+            with phase("safety_enrichment", "parse"):
+                return self.resolve_issues(json.loads(response.choices[0].message.content), assets)
+
+        try:
+            # Bounded so a slow call cannot block later enrichments
+            result, routing = await asyncio.wait_for(
+                model_router.route("safety", call, lambda result: self.escalation_reason(result, rule_status)),
+                self.llm_budget_seconds,
+            )
+            self.apply_enrichment(result, prompt_stats=prompt_stats, routing=routing)
 
         except Exception as e:
-            return {
+            print(f"Error enriching safety assessment: {e}")
+            self.last_enrichment = {
                 "status": "error",
-                "safety_status": "UNKNOWN",
+                "generated_at": datetime.now().isoformat(),
                 "error": str(e),
-                "issues": [],
             }
 
-    async def create_decision_record(self, monitoring_result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def apply_enrichment(
+        self,
+        result: Dict[str, Any],
+        source: str = "safety_prompt",
+        prompt_stats: Optional[Dict[str, Any]] = None,
+        routing: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """
-        Create an agent_decision record in Supabase for safety issues
+        Record LLM commentary on the readings as the latest enrichment
 
         Args:
-            monitoring_result: Output from monitor()
+            result: Parsed completion in the safety prompt's output schema,
+                with asset aliases already resolved
+            source: Which prompt produced it ("safety_prompt" or "fused")
+            prompt_stats: Size of the prompt that produced it (PromptBuilder.stats)
+            routing: Model routing decision for the call
 
         Returns:
-            Created decision records or None if error
+            The enrichment record
         """
-        try:
-            agent_id = await self._get_agent_id()
-            if not agent_id:
-                return None
-
-            # Create decision records for critical and high severity issues
-            decisions = []
-            for issue in monitoring_result.get("critical_issues", []) + monitoring_result.get("high_issues", []):
-                decision_data = {
-                    "agent_id": agent_id,
-                    "decision_type": "safety_violation",
-                    "input_data": {
-                        "affected_assets": issue.get("affected_assets", []),
-                        "category": issue.get("category", ""),
-                        "severity": issue.get("severity", ""),
-                        "sensor_counts": monitoring_result.get("sensor_counts", {}),
-                    },
-                    "reasoning": issue.get("reasoning", ""),
-                    "recommendation": {
-                        "immediate_actions": issue.get("immediate_actions", []),
-                        "estimated_time_to_failure": issue.get("estimated_time_to_failure", ""),
-                    },
-                    "confidence": issue.get("confidence", 1.0),
-                    "status": "pending",
-                }
-                decisions.append(decision_data)
-
-            if decisions:
-                # Note: This will fail until agent_decisions table is created
-                # result = await supabase_client.insert("agent_decisions", decisions)
-                # return result
-                return {"decisions": decisions, "note": "Table agent_decisions needs to be created"}
-
-            return None
+        self.last_enrichment = {
+            "status": "success",
+            "source": source,
+            "prompt_stats": prompt_stats,
+            "routing": routing,
+            "generated_at": datetime.now().isoformat(),
+            "safety_status": result.get("safety_status", "UNKNOWN"),
+            "issues": result.get("issues", []),
+            "overall_assessment": result.get("overall_assessment", ""),
+            "monitoring_recommendations": result.get("monitoring_recommendations", []),
+        }
+        return self.last_enrichment
 
-        except Exception as e:
-            print(f"Error creating decision record: {e}")
-            return None
+    def create_decision_record(self, monitoring_result: Dict[str, Any]) -> int:
+        """
+        Queue agent_decision records for critical and high severity issues
+
+        Written in the background by the decision writer; never waits on Supabase.
+
+        Args:
+            monitoring_result: Output from monitor()
+
+        Returns:
+            Number of decision records queued
+        """
+        decisions = []
+        for issue in monitoring_result.get("critical_issues", []) + monitoring_result.get("high_issues", []):
+            decisions.append({
+                "decision_type": "safety_violation",
+                "input_data": {
+                    "affected_assets": issue.get("affected_assets", []),
+                    "category": issue.get("category", ""),
+                    "severity": issue.get("severity", ""),
+                    "sensor_counts": monitoring_result.get("sensor_counts", {}),
+                },
+                "reasoning": issue.get("reasoning", "") or issue.get("description", ""),
+                "recommendation": {
+                    "immediate_actions": issue.get("immediate_actions", []),
+                    "estimated_time_to_failure": issue.get("estimated_time_to_failure", ""),
+                },
+                "confidence": issue.get("confidence", 1.0),
+                "status": "pending",
+            })
+        return decision_writer.enqueue(self.agent_name, decisions)
@@ -0,0 +1,258 @@
+"""
+Safety Rule Engine
+
+Compiles safety thresholds and operator-defined rules into threshold checks
+that run over sorted per-sensor-type value columns. A full evaluation over
+every pressure, flow and acoustic sensor is a sort per sensor type plus a
+binary search per rule, so safety verdicts never wait on an external model.
+"""
+import os
+import json
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Any, Optional, Set
+
+SEVERITY_RANK = {"LOW": 1, "MEDIUM": 2, "HIGH": 3, "CRITICAL": 4}
+
+SUPPORTED_OPS = ("<", "<=", ">", ">=")
+
+
+def load_operator_rules(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Load operator-defined rules from a JSON file
+
+    Args:
+        path: Path to a JSON list of rules (default: SAFETY_RULES_PATH env var)
+
+    Returns:
+        List of rule definitions, empty if no file is configured
+    """
+    path = path or os.getenv("SAFETY_RULES_PATH")
+    if not path:
+        return []
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules, list):
+        raise ValueError(f"Safety rules file {path} must contain a JSON list")
+    return rules
+
+
+class SafetyRuleEngine:
+    """
+    Deterministic safety checks over sensor readings
+
+    A rule looks like:
+        {
+            "name": "acoustic_spike",
+            "sensor_type": "acoustic",
+            "op": ">",
+            "threshold": 8.0,
+            "severity": "HIGH",
+            "description": "Acoustic level above 8 dB",
+            "immediate_actions": ["Dispatch crew to inspect pipe"]
+        }
+
+    Rules sharing a "group" are mutually exclusive per sensor: only the most
+    severe matching rule in the group reports that sensor (e.g. a reading
+    below the critical floor is not also reported as merely low).
+    """
+
+    def __init__(
+        self,
+        critical_low_pressure: float,
+        min_safe_pressure: float,
+        max_safe_pressure: float,
+        rules: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.rules = self._compile(
+            self._threshold_rules(critical_low_pressure, min_safe_pressure, max_safe_pressure)
+            + list(rules or [])
+        )
+
+    def _threshold_rules(
+        self, critical_low: float, min_safe: float, max_safe: float
+    ) -> List[Dict[str, Any]]:
+        """Built-in pressure band rules from the agent's safety thresholds"""
+        return [
+            {
+                "name": "critical_low_pressure",
+                "group": "pressure_band",
+                "sensor_type": "pressure",
+                "op": "<",
+                "threshold": critical_low,
+                "severity": "CRITICAL",
+                "description": f"Pressure below {critical_low} psi emergency level",
+                "reasoning": "Pressure this low risks backflow, contamination and loss of fire flow",
+                "immediate_actions": [
+                    "Dispatch crew to affected assets",
+                    "Check upstream pumps and valves",
+                    "Prepare boil-water notice if pressure is not restored",
+                ],
+                "estimated_time_to_failure": "immediate",
+            },
+            {
+                "name": "low_pressure",
+                "group": "pressure_band",
+                "sensor_type": "pressure",
+                "op": "<",
+                "threshold": min_safe,
+                "severity": "HIGH",
+                "description": f"Pressure below {min_safe} psi minimum safe level",
+                "reasoning": "Pressure below the safe operating floor degrades service and can precede a main break",
+                "immediate_actions": ["Investigate pressure loss", "Verify pump operation"],
+                "estimated_time_to_failure": "hours",
+            },
+            {
+                "name": "high_pressure",
+                "group": "pressure_band",
+                "sensor_type": "pressure",
+                "op": ">",
+                "threshold": max_safe,
+                "severity": "HIGH",
+                "description": f"Pressure above {max_safe} psi maximum safe level",
+                "reasoning": "Excess pressure stresses pipes and joints and risks bursts",
+                "immediate_actions": ["Reduce pump setpoints", "Check pressure reducing valves"],
+                "estimated_time_to_failure": "hours",
+            },
+        ]
+
+    def _compile(self, rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Validate rules and normalize severity and threshold"""
+        compiled = []
+        for rule in rules:
+            name = rule.get("name")
+            op = rule.get("op")
+            severity = str(rule.get("severity", "")).upper()
+            if not name or not rule.get("sensor_type"):
+                raise ValueError(f"Safety rule needs a name and sensor_type: {rule}")
+            if op not in SUPPORTED_OPS:
+                raise ValueError(f"Safety rule {name} has unsupported op {op!r}")
+            if severity not in SEVERITY_RANK:
+                raise ValueError(f"Safety rule {name} has unsupported severity {severity!r}")
+            compiled.append({
+                **rule,
+                "group": rule.get("group", name),
+                "severity": severity,
+                "threshold": float(rule["threshold"]),
+                "category": rule.get("category", rule["sensor_type"]),
+            })
+        # Most severe first so group exclusion keeps the worst match
+        compiled.sort(key=lambda r: -SEVERITY_RANK[r["severity"]])
+        return compiled
+
+    def _columns(self, sensors: List[Dict[str, Any]], stale_ids: Set[str]) -> Dict[str, Dict[str, list]]:
+        """Per sensor type, readings sorted by value with a parallel value list"""
+        by_type: Dict[str, list] = {}
+        for sensor in sensors:
+            if sensor.get("value") is None or sensor.get("id") in stale_ids:
+                continue
+            by_type.setdefault(sensor["type"], []).append(sensor)
+
+        columns = {}
+        for sensor_type, rows in by_type.items():
+            rows.sort(key=lambda s: s["value"])
+            columns[sensor_type] = {"rows": rows, "values": [s["value"] for s in rows]}
+        return columns
+
+    def _match(self, rule: Dict[str, Any], column: Dict[str, list]) -> list:
+        """Readings matching a rule, found by binary search on the sorted column"""
+        values = column["values"]
+        threshold = rule["threshold"]
+        op = rule["op"]
+        if op == "<":
+            return column["rows"][:bisect_left(values, threshold)]
+        if op == "<=":
+            return column["rows"][:bisect_right(values, threshold)]
+        if op == ">":
+            return column["rows"][bisect_right(values, threshold):]
+        return column["rows"][bisect_left(values, threshold):]
+
+    def evaluate(
+        self, sensors: List[Dict[str, Any]], stale_ids: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Evaluate all rules against the current sensor readings
+
+        Args:
+            sensors: Sensor rows (type, value, unit, asset_id, id)
+            stale_ids: Sensors that stopped reporting; their values are not
+                trusted and they are reported as a sensor health issue instead
+
+        Returns:
+            Dictionary with safety_status, issues, critical_issues and high_issues
+            in the same shape as the LLM safety assessment
+        """
+        started = time.perf_counter()
+        stale_ids = stale_ids or set()
+        columns = self._columns(sensors, stale_ids)
+
+        issues = []
+        claimed = set()  # (group, sensor id) already reported by a more severe rule
+        for rule in self.rules:
+            column = columns.get(rule["sensor_type"])
+            if not column:
+                continue
+            readings = []
+            for sensor in self._match(rule, column):
+                key = (rule["group"], sensor.get("id") or sensor["asset_id"])
+                if key in claimed:
+                    continue
+                claimed.add(key)
+                readings.append(sensor)
+            if not readings:
+                continue
+
+            issues.append({
+                "severity": rule["severity"],
+                "category": rule["category"],
+                "rule": rule["name"],
+                "affected_assets": sorted({s["asset_id"] for s in readings}),
+                "readings": [
+                    {"sensor_id": s.get("id"), "asset_id": s["asset_id"], "value": s["value"], "unit": s.get("unit")}
+                    for s in readings
+                ],
+                "description": f"{rule.get('description', rule['name'])} at {len(readings)} sensor(s)",
+                "reasoning": rule.get(
+                    "reasoning",
+                    f"{rule['sensor_type']} {rule['op']} {rule['threshold']:g}",
+                ),
+                "immediate_actions": rule.get("immediate_actions", []),
+                "estimated_time_to_failure": rule.get("estimated_time_to_failure", "N/A"),
+                "confidence": 1.0,
+            })
+
+        stale = [s for s in sensors if s.get("id") in stale_ids]
+        if stale:
+            issues.append({
+                "severity": "MEDIUM",
+                "category": "sensor_health",
+                "rule": "stale_sensors",
+                "affected_assets": sorted({s["asset_id"] for s in stale}),
+                "readings": [
+                    {"sensor_id": s.get("id"), "asset_id": s["asset_id"], "type": s["type"], "last_seen": s.get("last_seen")}
+                    for s in stale
+                ],
+                "description": f"{len(stale)} sensor(s) stopped reporting; their last values are ignored",
+                "reasoning": "A silent sensor can hide a real violation behind an old reading",
+                "immediate_actions": ["Check sensor power and telemetry links"],
+                "estimated_time_to_failure": "N/A",
+                "confidence": 1.0,
+            })
+
+        critical_issues = [issue for issue in issues if issue["severity"] == "CRITICAL"]
+        high_issues = [issue for issue in issues if issue["severity"] == "HIGH"]
+
+        if critical_issues:
+            safety_status = "CRITICAL"
+        elif any(SEVERITY_RANK[issue["severity"]] >= SEVERITY_RANK["MEDIUM"] for issue in issues):
+            safety_status = "WARNING"
+        else:
+            safety_status = "SAFE"
+
+        return {
+            "safety_status": safety_status,
+            "issues": issues,
+            "critical_issues": critical_issues,
+            "high_issues": high_issues,
+            "evaluation_time_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
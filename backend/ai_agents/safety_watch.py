@@ -0,0 +1,119 @@
+"""
+Background Safety Watcher
+
+Evaluates safety continuously at a fixed cadence over the in-memory sensor
+state and pushes SAFE/WARNING/CRITICAL transitions to subscribers, so alert
+latency is bounded by the evaluation interval instead of by someone calling
+/ai/safety-monitoring.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+from .broadcast import Broadcaster
+from .safety_rules import SafetyRuleEngine
+from .sensor_state import SensorStateStore
+
+
+class SafetyWatcher:
+    """
+    Periodic rule-engine safety evaluation with push notifications
+
+    Runs are serialized: a run that overruns the interval delays the next
+    one instead of overlapping it.
+    """
+
+    def __init__(
+        self,
+        rule_engine: SafetyRuleEngine,
+        state: SensorStateStore,
+        broadcaster: Broadcaster,
+        interval_seconds: float = 10.0,
+    ):
+        self.rule_engine = rule_engine
+        self.state = state
+        self.broadcaster = broadcaster
+        self.interval_seconds = interval_seconds
+
+        self.safety_status = "UNKNOWN"
+        self.latest: Optional[Dict[str, Any]] = None
+        self.runs = 0
+        self.errors = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background loop (no-op if already running)"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background loop and wait for it to exit"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._task and not self._task.done())
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_once()
+            except Exception as e:
+                # A bad reading or rule error must not end continuous monitoring
+                self.errors += 1
+                print(f"Could not evaluate safety: {e}")
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0.0, self.interval_seconds - elapsed))
+
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Refresh sensor state, evaluate the rules and publish any transition
+
+        Returns:
+            Latest safety evaluation
+        """
+        async with self._lock:
+            try:
+                await self.state.refresh()
+            except Exception as e:
+                # Keep evaluating the last known state; report the failure
+                self.errors += 1
+                print(f"Safety watcher could not refresh sensors: {e}")
+
+            sensors = self.state.sensors()
+            if not sensors:
+                return self.latest or {"safety_status": "UNKNOWN"}
+
+            verdict = self.rule_engine.evaluate(sensors, stale_ids=self.state.stale_ids())
+            self.runs += 1
+            self.latest = {
+                **verdict,
+                "evaluated_at": datetime.now().isoformat(),
+                "sensor_count": len(sensors),
+                "state_version": self.state.version,
+            }
+
+            previous = self.safety_status
+            self.safety_status = verdict["safety_status"]
+            if previous != self.safety_status:
+                self.broadcaster.publish({
+                    "type": "safety_transition",
+                    "from": previous,
+                    "to": self.safety_status,
+                    "evaluated_at": self.latest["evaluated_at"],
+                    "critical_issues": verdict["critical_issues"],
+                    "high_issues": verdict["high_issues"],
+                })
+                print(f"Safety status changed: {previous} -> {self.safety_status}")
+
+            return self.latest
@@ -0,0 +1,91 @@
+"""
+In-memory sensor state
+
+Holds the latest row for every sensor so background monitors can evaluate
+the network without each of them re-reading the sensors table.
+"""
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set
+from .supabase_client import supabase_client
+from .staleness import StalenessIndex, STALE_AFTER_SECONDS
+
+
+class SensorStateStore:
+    """
+    Latest reading per sensor, keyed by sensor id
+
+    version increases whenever a refresh changes, adds or removes a sensor,
+    so consumers can skip work when nothing moved. last_seen is tracked in a
+    StalenessIndex updated only for rows that changed.
+    """
+
+    def __init__(self):
+        self._sensors: Dict[str, Dict[str, Any]] = {}
+        self.staleness = StalenessIndex()
+        self.version = 0
+        self.refreshed_at: Optional[datetime] = None
+
+    def apply(self, rows: List[Dict[str, Any]], complete: bool = True) -> List[str]:
+        """
+        Merge sensor rows into the store
+
+        Args:
+            rows: Sensor rows from the sensors table
+            complete: rows is the full table, so sensors missing from it are removed
+
+        Returns:
+            IDs of sensors that were added, changed or removed
+        """
+        changed = []
+        for row in rows:
+            if self._sensors.get(row["id"]) != row:
+                self._sensors[row["id"]] = row
+                self.staleness.update(row["id"], row.get("last_seen"))
+                changed.append(row["id"])
+
+        if complete:
+            current = {row["id"] for row in rows}
+            for sensor_id in [sid for sid in self._sensors if sid not in current]:
+                del self._sensors[sensor_id]
+                self.staleness.remove(sensor_id)
+                changed.append(sensor_id)
+
+        if changed:
+            self.version += 1
+        return changed
+
+    async def refresh(self) -> List[str]:
+        """Reload all sensors from Supabase and return the changed IDs"""
+        rows = await supabase_client.get_sensors_with_assets()
+        changed = self.apply(rows)
+        self.refreshed_at = datetime.now()
+        return changed
+
+    def sensors(self) -> List[Dict[str, Any]]:
+        """All sensor rows currently held"""
+        return list(self._sensors.values())
+
+    def get(self, sensor_id: str) -> Optional[Dict[str, Any]]:
+        return self._sensors.get(sensor_id)
+
+    def stale_ids(self, older_than_seconds: float = STALE_AFTER_SECONDS) -> Set[str]:
+        """IDs of sensors that have not reported for older_than_seconds"""
+        return set(self.staleness.stale(older_than_seconds))
+
+    def stale_sensors(self, older_than_seconds: float = STALE_AFTER_SECONDS) -> List[Dict[str, Any]]:
+        """Stale sensor rows with how long each has been silent"""
+        return [
+            {
+                "sensor_id": sensor_id,
+                "asset_id": self._sensors[sensor_id]["asset_id"],
+                "type": self._sensors[sensor_id]["type"],
+                "last_seen": self._sensors[sensor_id].get("last_seen"),
+                "age_seconds": round(self.staleness.age_seconds(sensor_id) or 0),
+            }
+            for sensor_id in self.staleness.stale(older_than_seconds)
+            if sensor_id in self._sensors
+        ]
+
+
+# Singleton instance
+sensor_state = SensorStateStore()
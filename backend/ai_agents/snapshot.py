@@ -0,0 +1,57 @@
+"""
+Network snapshot
+
+One read of everything the operational agents look at (sensors, valves and
+pumps, pipes, energy prices), taken once per coordinated run and passed to
+every agent so they all reason about the same state.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any
+from .supabase_client import supabase_client
+from .sensor_state import sensor_state
+from .timestamps import truncate_to_hour
+
+
+async def take_snapshot(price_hours: int = 48) -> Dict[str, Any]:
+    """
+    Read the network state for one coordinated agent run
+
+    All tables are requested together so the reads land as close in time as
+    PostgREST allows.
+
+    Args:
+        price_hours: Hours of energy prices from the current hour (covers
+            both the day-ahead and the receding-horizon energy plans)
+
+    Returns:
+        Dictionary with sensors, valves_pumps, edges, energy_prices (ascending
+        by timestamp), stale_sensor_ids and taken_at
+    """
+    start = truncate_to_hour(datetime.now(timezone.utc))
+    sensors, valves_pumps, edges, energy_prices = await asyncio.gather(
+        supabase_client.get_sensors_with_assets(),
+        supabase_client.get_valves_pumps(),
+        supabase_client.query("edges", select="*"),
+        supabase_client.get_energy_prices(
+            limit=price_hours, start=start, end=start + timedelta(hours=price_hours)
+        ),
+    )
+    taken_at = datetime.now(timezone.utc)
+
+    if not energy_prices:
+        # Tariffs repeat daily; use the latest day when the window is empty
+        latest = await supabase_client.get_energy_prices(limit=24, descending=True)
+        energy_prices = list(reversed(latest))
+
+    sensor_state.apply(sensors)
+
+    return {
+        "taken_at": taken_at.isoformat(),
+        "price_window_start": start.isoformat(),
+        "sensors": sensors,
+        "valves_pumps": valves_pumps,
+        "edges": edges,
+        "energy_prices": energy_prices,
+        "stale_sensor_ids": sensor_state.stale_ids(),
+    }
@@ -0,0 +1,128 @@
+"""
+Sensor staleness index
+
+Tracks when each sensor last reported so that a dead transducer holding an
+old value is not mistaken for a healthy one. The index is a min-heap over
+last_seen, updated in place as sensor rows arrive.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from .timestamps import parse_timestamp
+
+# Sensors that have not reported for this long are treated as stale
+STALE_AFTER_SECONDS = float(os.getenv("SENSOR_STALE_AFTER_SECONDS", "900"))
+
+
+class StalenessIndex:
+    """
+    Indexed min-heap of (last_seen, sensor_id), one entry per sensor
+
+    Each sensor's heap position is tracked, so an update moves its entry up
+    or down in place and a removal takes it out; no superseded entries are
+    left behind for stale() to walk over.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._pos: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def update(self, sensor_id: str, last_seen) -> None:
+        """
+        Record a sensor's last_seen time
+
+        Args:
+            sensor_id: Sensor ID
+            last_seen: datetime or Supabase timestamp string
+        """
+        ts = parse_timestamp(last_seen)
+        if ts is None:
+            # Never reported: oldest possible
+            seen = 0.0
+        else:
+            seen = ts.timestamp()
+        i = self._pos.get(sensor_id)
+        if i is None:
+            self._heap.append((seen, sensor_id))
+            self._pos[sensor_id] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+            return
+        if self._heap[i][0] == seen:
+            return
+        self._heap[i] = (seen, sensor_id)
+        self._sift_up(i)
+        self._sift_down(self._pos[sensor_id])
+
+    def remove(self, sensor_id: str) -> None:
+        """Stop tracking a sensor"""
+        i = self._pos.pop(sensor_id, None)
+        if i is None:
+            return
+        last = self._heap.pop()
+        if i < len(self._heap):
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self._pos[last[1]])
+
+    def _swap(self, i: int, j: int):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._pos[heap[i][1]] = i
+        self._pos[heap[j][1]] = j
+
+    def _sift_up(self, i: int):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self._heap[i] >= self._heap[parent]:
+                return
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int):
+        heap = self._heap
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap) and heap[child] < heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def stale(self, older_than_seconds: float = STALE_AFTER_SECONDS, now: Optional[datetime] = None) -> List[str]:
+        """
+        Sensors whose last report is older than older_than_seconds
+
+        Walks only the part of the heap below the cutoff: a node at or above
+        the cutoff cannot have older children, and every entry is a live
+        sensor, so the cost is proportional to the number of stale sensors
+        rather than to the number of sensors.
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = now.timestamp() - older_than_seconds
+        heap = self._heap
+        found = []
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            seen, sensor_id = heap[i]
+            if seen >= cutoff:
+                continue
+            found.append(sensor_id)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    stack.append(child)
+        return found
+
+    def age_seconds(self, sensor_id: str, now: Optional[datetime] = None) -> Optional[float]:
+        """Seconds since the sensor last reported, or None if unknown"""
+        i = self._pos.get(sensor_id)
+        if i is None:
+            return None
+        now = now or datetime.now(timezone.utc)
+        return now.timestamp() - self._heap[i][0]
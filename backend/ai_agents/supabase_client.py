@@ -2,10 +2,13 @@
 Supabase client helper for AI agents
 """
 import os
+import time
 from pathlib import Path
 import httpx
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
+from .metrics import SUPABASE_REQUEST_SECONDS, SUPABASE_ROWS, SUPABASE_BYTES, SUPABASE_ERRORS
 
 # Load .env from project root (two levels up from this file)
 ROOT_DIR = Path(__file__).parent.parent.parent
@@ -30,6 +33,32 @@ class SupabaseClient:
             "Prefer": "return=representation",
         }
 
+    async def _request(self, table: str, verb: str, method: str, **kwargs) -> Any:
+        """
+        Send one REST request and record its latency, rows and bytes
+
+        Args:
+            table: Table name
+            verb: Operation label for metrics (select, insert, upsert, ...)
+            method: HTTP method
+            **kwargs: Passed to httpx (headers, params, json)
+        """
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.request(method, f"{self.url}/rest/v1/{table}", **kwargs)
+                response.raise_for_status()
+        except Exception:
+            SUPABASE_ERRORS.inc(table, verb)
+            raise
+        finally:
+            SUPABASE_REQUEST_SECONDS.observe(time.perf_counter() - started, table, verb)
+
+        data = response.json()
+        SUPABASE_ROWS.inc(table, verb, amount=len(data) if isinstance(data, list) else 1)
+        SUPABASE_BYTES.inc(table, verb, amount=len(response.content))
+        return data
+
     async def query(self, table: str, select: str = "*", **filters) -> List[Dict[str, Any]]:
         """
         Query a Supabase table
@@ -39,13 +68,8 @@ class SupabaseClient:
             select: Columns to select (default: "*")
             **filters: Query filters (e.g., status="eq.active")
         """
-        url = f"{self.url}/rest/v1/{table}"
         params = {"select": select, **filters}
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        return await self._request(table, "select", "GET", headers=self.headers, params=params)
 
     async def insert(
         self, table: str, data: Dict[str, Any] | List[Dict[str, Any]]
@@ -57,12 +81,26 @@ class SupabaseClient:
             table: Table name
             data: Data to insert (single dict or list of dicts)
         """
-        url = f"{self.url}/rest/v1/{table}"
+        return await self._request(table, "insert", "POST", headers=self.headers, json=data)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, headers=self.headers, json=data)
-            response.raise_for_status()
-            return response.json()
+    async def upsert(
+        self, table: str, data: Dict[str, Any] | List[Dict[str, Any]], on_conflict: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert rows, updating existing rows that collide on a unique key
+
+        Args:
+            table: Table name
+            data: Data to upsert (single dict or list of dicts)
+            on_conflict: Comma-separated columns of the unique constraint
+        """
+        headers = {
+            **self.headers,
+            "Prefer": "return=representation,resolution=merge-duplicates",
+        }
+        return await self._request(
+            table, "upsert", "POST", headers=headers, json=data, params={"on_conflict": on_conflict}
+        )
 
     async def update(
         self, table: str, data: Dict[str, Any], **filters
@@ -75,14 +113,7 @@ class SupabaseClient:
             data: Data to update
             **filters: Query filters
         """
-        url = f"{self.url}/rest/v1/{table}"
-
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(
-                url, headers=self.headers, json=data, params=filters
-            )
-            response.raise_for_status()
-            return response.json()
+        return await self._request(table, "update", "PATCH", headers=self.headers, json=data, params=filters)
 
     async def delete(self, table: str, **filters) -> List[Dict[str, Any]]:
         """
@@ -92,14 +123,44 @@ class SupabaseClient:
             table: Table name
             **filters: Query filters (e.g., id="eq.123")
         """
-        url = f"{self.url}/rest/v1/{table}"
+        return await self._request(table, "delete", "DELETE", headers=self.headers, params=filters)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                url, headers=self.headers, params=filters
-            )
-            response.raise_for_status()
-            return response.json()
+    async def table_version(self, table: str, **filters) -> Dict[str, Any]:
+        """
+        Cheap change marker for a table: newest updated_at and row count
+
+        One indexed single-row read; the count comes back in the
+        Content-Range header (Prefer: count=exact). Updates move
+        updated_at (triggers keep it current), inserts and deletes move
+        the count.
+
+        Args:
+            table: Table name (must have an updated_at column)
+            **filters: Query filters (e.g., asset_type="eq.edge")
+        """
+        started = time.perf_counter()
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(
+                    f"{self.url}/rest/v1/{table}",
+                    headers={**self.headers, "Prefer": "count=exact"},
+                    params={"select": "updated_at", "order": "updated_at.desc", "limit": "1", **filters},
+                )
+                response.raise_for_status()
+        except Exception:
+            SUPABASE_ERRORS.inc(table, "version")
+            raise
+        finally:
+            SUPABASE_REQUEST_SECONDS.observe(time.perf_counter() - started, table, "version")
+
+        rows = response.json()
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        SUPABASE_ROWS.inc(table, "version", amount=len(rows))
+        SUPABASE_BYTES.inc(table, "version", amount=len(response.content))
+        return {
+            "updated_at": rows[0]["updated_at"] if rows else None,
+            "count": int(total) if total.isdigit() else len(rows),
+        }
 
     async def get_sensors_with_assets(self) -> List[Dict[str, Any]]:
         """Get all sensors with their associated asset information"""
@@ -109,20 +170,79 @@ class SupabaseClient:
         )
         return sensors
 
-    async def get_energy_prices(self, limit: int = 24) -> List[Dict[str, Any]]:
-        """Get energy prices (for the next 24 hours by default)"""
+    async def get_energy_prices(
+        self,
+        limit: int = 24,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        descending: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get energy prices ordered by timestamp
+
+        Ordering, the time window and the limit are applied by PostgREST
+        (backed by idx_energy_prices_timestamp), so only the requested rows
+        leave the database.
+
+        Args:
+            limit: Maximum number of rows (default: 24 hours)
+            start: Only prices at or after this time
+            end: Only prices before this time
+            descending: Newest first instead of oldest first
+        """
+        filters = {
+            "order": f"timestamp.{'desc' if descending else 'asc'}",
+            "limit": str(limit),
+        }
+        if start and end:
+            filters["and"] = (
+                f'(timestamp.gte."{start.isoformat()}",timestamp.lt."{end.isoformat()}")'
+            )
+        elif start:
+            filters["timestamp"] = f"gte.{start.isoformat()}"
+        elif end:
+            filters["timestamp"] = f"lt.{end.isoformat()}"
+
         try:
-            # Simple query without ordering to avoid Supabase issues
-            prices = await self.query("energy_prices", select="*")
-            # Sort in Python instead by timestamp column
-            if prices:
-                prices = sorted(prices, key=lambda x: x.get('timestamp', ''))[:limit]
-            return prices
+            return await self.query("energy_prices", select="*", **filters)
         except Exception as e:
             print(f"Error fetching energy prices: {e}")
             # Return empty list if table doesn't exist or is empty
             return []
 
+    async def get_hourly_rollups(
+        self, sensor_ids: List[str], start: datetime, end: datetime, page_size: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """
+        Get hourly sensor rollups for [start, end)
+
+        Long windows exceed PostgREST's row cap, so rows are read in pages
+        until one comes back empty. A short page is not taken as the end:
+        the server's max-rows setting may cap pages below page_size.
+
+        Args:
+            sensor_ids: Sensors to include
+            start: First hour (inclusive)
+            end: Last hour (exclusive)
+            page_size: Rows per request
+        """
+        if not sensor_ids:
+            return []
+        rows: List[Dict[str, Any]] = []
+        while True:
+            page = await self.query(
+                "sensor_readings_hourly",
+                select="sensor_id,hour,avg_value,sample_count",
+                sensor_id=f"in.({','.join(sensor_ids)})",
+                order="hour.asc,sensor_id.asc",
+                limit=str(page_size),
+                offset=str(len(rows)),
+                **{"and": f'(hour.gte."{start.isoformat()}",hour.lt."{end.isoformat()}")'},
+            )
+            if not page:
+                return rows
+            rows.extend(page)
+
     async def get_valves_pumps(self) -> List[Dict[str, Any]]:
         """Get all valves and pumps"""
         return await self.query("valves_pumps", select="*")
@@ -0,0 +1,26 @@
+"""
+Timestamp helpers for Supabase rows
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Supabase timestamp (e.g. "2025-11-12 21:00:00+00") as UTC"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        try:
+            ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
+def truncate_to_hour(ts: datetime) -> datetime:
+    """Drop minutes, seconds and microseconds"""
+    return ts.replace(minute=0, second=0, microsecond=0)
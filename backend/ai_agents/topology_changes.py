@@ -0,0 +1,139 @@
+"""
+Change log for delta topology polls
+
+Every time the topology view is updated, the nodes and edges whose payload
+changed (status, sensor_data, incident counts, ...), appeared or
+disappeared are appended to a bounded log under an increasing sequence
+number.
+
+Clients poll with the cursor from their last response and receive only the
+entities that changed since then. A cursor is "<epoch>:<seq>", where the
+epoch is fixed per process. A cursor from before a restart, or one older
+than the retained log, cannot be answered from the log, and the caller
+falls back to a full snapshot.
+"""
+import secrets
+from collections import deque
+from typing import Dict, List, Any, Optional, Iterable
+
+KINDS = ("nodes", "edges")
+
+
+class TopologyChangeLog:
+    """
+    Sequence-numbered record of which nodes and edges changed
+
+    Args:
+        retention: Number of change entries kept; older cursors get a full snapshot
+    """
+
+    def __init__(self, retention: int = 5000):
+        self.retention = retention
+        self.epoch = secrets.token_hex(4)
+        self.seq = 0
+        # (seq, kind, entity id), oldest first
+        self._entries: deque = deque(maxlen=retention)
+        self._current: Dict[str, Dict[str, Dict[str, Any]]] = {kind: {} for kind in KINDS}
+        self.summary: Dict[str, Any] = {}
+        self.recorded = False
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}:{self.seq}"
+
+    def record(
+        self,
+        changed: Dict[str, Iterable[str]],
+        current: Dict[str, Dict[str, Dict[str, Any]]],
+        summary: Dict[str, Any],
+    ) -> int:
+        """
+        Log the entities changed by an update of the topology view
+
+        Args:
+            changed: Kind ("nodes"/"edges") -> ids changed, added or removed
+            current: Kind -> id -> current payload (the view's own mappings)
+            summary: Current incident summary
+
+        Returns:
+            Number of entries appended
+        """
+        first_seq = self.seq
+        for kind in KINDS:
+            for entity_id in changed.get(kind, ()):
+                self._append(kind, entity_id)
+            self._current[kind] = current[kind]
+        self.summary = summary
+        self.recorded = True
+        return self.seq - first_seq
+
+    def _append(self, kind: str, entity_id: str):
+        self.seq += 1
+        self._entries.append((self.seq, kind, entity_id))
+
+    def _parse(self, cursor: Optional[str]) -> Optional[int]:
+        """Sequence number of a cursor this log can answer, or None"""
+        if not cursor:
+            return None
+        epoch, _, seq = cursor.partition(":")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self.seq:
+            return None
+        # Entries after seq must all still be retained
+        oldest = self._entries[0][0] if self._entries else self.seq + 1
+        if seq + 1 < oldest and seq != self.seq:
+            return None
+        return seq
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every node and edge as last recorded"""
+        return {
+            "full": True,
+            "cursor": self.cursor,
+            "nodes": list(self._current["nodes"].values()),
+            "edges": list(self._current["edges"].values()),
+            "incident_summary": self.summary,
+        }
+
+    def changes_since(self, cursor: Optional[str]) -> Dict[str, Any]:
+        """
+        Entities changed after cursor, or a full snapshot if the cursor is unusable
+
+        Returns:
+            {"full": False, "cursor", "nodes", "edges", "removed", "incident_summary"}
+            with the current payload of each changed entity, listed once
+        """
+        seq = self._parse(cursor)
+        if seq is None:
+            return self.snapshot()
+
+        changed: Dict[str, List[str]] = {kind: [] for kind in KINDS}
+        seen = set()
+        for entry_seq, kind, entity_id in reversed(self._entries):
+            if entry_seq <= seq:
+                break
+            if (kind, entity_id) not in seen:
+                seen.add((kind, entity_id))
+                changed[kind].append(entity_id)
+
+        delta: Dict[str, Any] = {"full": False, "cursor": self.cursor}
+        removed: Dict[str, List[str]] = {}
+        for kind in KINDS:
+            current = self._current[kind]
+            # Oldest change first, as the log recorded them
+            ids = list(reversed(changed[kind]))
+            delta[kind] = [current[entity_id] for entity_id in ids if entity_id in current]
+            removed[kind] = [entity_id for entity_id in ids if entity_id not in current]
+        delta["removed"] = removed
+        delta["incident_summary"] = self.summary
+        return delta
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "cursor": self.cursor,
+            "entries": len(self._entries),
+            "retention": self.retention,
+            "oldest_seq": self._entries[0][0] if self._entries else None,
+        }
@@ -0,0 +1,273 @@
+"""
+Materialized network topology view
+
+Keeps the /network/topology payload in memory and updates it from changed
+rows instead of rebuilding it per request. Sensors and incidents are
+indexed by edge, so a changed sensor or event re-derives only the edges it
+belongs to (old and new edge, if it moved). The incident summary is a set of
+counters adjusted by each re-derived edge's old and new contribution.
+Serving the topology is serialization of the current state.
+"""
+from typing import Dict, List, Any, Iterable, Set
+from .metrics import TOPOLOGY_EDGES_REDERIVED
+
+# Incident columns included in the map payload
+INCIDENT_SELECT = "id,title,asset_ref,asset_type,state,severity,priority,confidence,detected_by,created_at"
+
+SUMMARY_COUNTERS = (
+    "edges_with_leak_indicators",
+    "edges_with_active_incidents",
+    "total_active_incidents",
+    "critical_edges",
+    "high_severity_edges",
+    "edges_with_stale_sensors",
+)
+
+
+def derive_edge(
+    edge: Dict[str, Any],
+    sensors: Iterable[Dict[str, Any]],
+    incidents: Iterable[Dict[str, Any]],
+    stale_ids: Set[str],
+) -> Dict[str, Any]:
+    """
+    Map payload for one edge: status from its sensor readings, incidents for reference
+
+    Args:
+        edge: Row from the edges table
+        sensors: The edge's sensor rows
+        incidents: The edge's incidents
+        stale_ids: Sensors whose readings are ignored as stale
+    """
+    # Analyze sensors to determine status (stale readings are ignored)
+    pressure = None
+    acoustic = None
+    flow = None
+    stale_sensors = []
+    for sensor in sensors:
+        if sensor["id"] in stale_ids:
+            stale_sensors.append(sensor["type"])
+        elif sensor["type"] == "pressure":
+            pressure = sensor["value"]
+        elif sensor["type"] == "acoustic":
+            acoustic = sensor["value"]
+        elif sensor["type"] == "flow":
+            flow = sensor["value"]
+
+    # Determine leak indicators from sensor data
+    leak_indicators = []
+    if pressure is not None and pressure < 55:
+        leak_indicators.append("LOW_PRESSURE")
+    if acoustic is not None and acoustic > 5:
+        leak_indicators.append("HIGH_ACOUSTIC")
+    if flow is not None and flow > 110:
+        leak_indicators.append("HIGH_FLOW")
+
+    # Determine edge status based on sensor data
+    if len(leak_indicators) >= 3:
+        edge_status = "critical"  # All 3 indicators
+    elif len(leak_indicators) >= 2:
+        edge_status = "high"  # 2 indicators
+    elif len(leak_indicators) >= 1:
+        edge_status = "medium"  # 1 indicator
+    else:
+        edge_status = "normal"
+
+    # Incident counts by state in one pass; the highest priority active
+    # incident is kept for reference
+    incidents = list(incidents)
+    active = 0
+    has_open = False
+    has_acknowledged = False
+    highest_priority_incident = None
+    for incident in incidents:
+        if incident["state"] == "resolved":
+            continue
+        active += 1
+        has_open = has_open or incident["state"] == "open"
+        has_acknowledged = has_acknowledged or incident["state"] == "acknowledged"
+        if highest_priority_incident is None or incident.get("priority", 0) > highest_priority_incident.get("priority", 0):
+            highest_priority_incident = incident
+
+    return {
+        **edge,
+        "status": edge_status,  # Based on SENSOR DATA
+        "leak_indicators": leak_indicators,
+        "sensor_data": {
+            "pressure": pressure,
+            "acoustic": acoustic,
+            "flow": flow
+        },
+        "stale_sensors": stale_sensors,
+        "active_incident_count": active,
+        "total_incident_count": len(incidents),
+        "has_open_incidents": has_open,
+        "has_acknowledged_incidents": has_acknowledged,
+        "highest_priority_incident": highest_priority_incident,
+        "all_incidents": incidents
+    }
+
+
+def _contribution(edge: Dict[str, Any]) -> Dict[str, int]:
+    """What one derived edge adds to each summary counter"""
+    return {
+        "edges_with_leak_indicators": 1 if edge["leak_indicators"] else 0,
+        "edges_with_active_incidents": 1 if edge["active_incident_count"] > 0 else 0,
+        "total_active_incidents": edge["active_incident_count"],
+        "critical_edges": 1 if edge["status"] == "critical" else 0,
+        "high_severity_edges": 1 if edge["status"] == "high" else 0,
+        "edges_with_stale_sensors": 1 if edge["stale_sensors"] else 0,
+    }
+
+
+class TopologyView:
+    """
+    In-memory nodes, derived edges and incident summary
+
+    The apply_* methods take rows read from Supabase (a whole table each)
+    and return the ids of the nodes or edges whose payload changed. Derived
+    edge payloads are replaced, never mutated, so earlier references keep
+    their old values.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.edges: Dict[str, Dict[str, Any]] = {}
+        self._edge_rows: Dict[str, Dict[str, Any]] = {}
+        self._sensors: Dict[str, Dict[str, Any]] = {}
+        self._edge_sensors: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._incidents: Dict[str, Dict[str, Any]] = {}
+        self._edge_incidents: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._stale_ids: Set[str] = set()
+        # Row position in the last read of each table; an edge's sensors and
+        # incidents are derived in table order, as a full rebuild would
+        self._sensor_positions: Dict[str, int] = {}
+        self._incident_positions: Dict[str, int] = {}
+        self._counters: Dict[str, int] = {name: 0 for name in SUMMARY_COUNTERS}
+
+    def apply_nodes(self, rows: List[Dict[str, Any]]) -> Set[str]:
+        """Replace the nodes; returns ids of changed, added or removed nodes"""
+        nodes = {row["id"]: row for row in rows}
+        changed = {node_id for node_id, row in nodes.items() if self.nodes.get(node_id) != row}
+        changed |= self.nodes.keys() - nodes.keys()
+        self.nodes = nodes
+        return changed
+
+    def apply_edges(self, rows: List[Dict[str, Any]]) -> Set[str]:
+        """Replace the edge rows; returns ids of edges whose payload changed"""
+        rows_by_id = {row["id"]: row for row in rows}
+        affected = {edge_id for edge_id, row in rows_by_id.items() if self._edge_rows.get(edge_id) != row}
+        removed = self._edge_rows.keys() - rows_by_id.keys()
+        for edge_id in removed:
+            if edge_id in self.edges:
+                self._count(self.edges.pop(edge_id), -1)
+        self._edge_rows = rows_by_id
+        changed = self.rederive(affected) | removed
+        # Keep the edges table's order
+        self.edges = {edge_id: self.edges[edge_id] for edge_id in rows_by_id}
+        return changed
+
+    def apply_sensors(self, rows: List[Dict[str, Any]]) -> Set[str]:
+        """Replace the sensors; re-derives only edges with a changed, added or removed sensor"""
+        sensors = {row["id"]: row for row in rows}
+        affected = set()
+        for sensor_id, row in sensors.items():
+            previous = self._sensors.get(sensor_id)
+            if previous != row:
+                affected |= self._move(self._edge_sensors, sensor_id, previous, row, "asset_id")
+        for sensor_id in self._sensors.keys() - sensors.keys():
+            affected |= self._move(self._edge_sensors, sensor_id, self._sensors[sensor_id], None, "asset_id")
+        self._sensors = sensors
+        self._sensor_positions = {row["id"]: position for position, row in enumerate(rows)}
+        return self.rederive(affected)
+
+    def apply_incidents(self, rows: List[Dict[str, Any]]) -> Set[str]:
+        """Replace the edge incidents; re-derives only edges whose incidents changed"""
+        incidents = {row["id"]: row for row in rows}
+        affected = set()
+        for incident_id, row in incidents.items():
+            previous = self._incidents.get(incident_id)
+            if previous != row:
+                affected |= self._move(self._edge_incidents, incident_id, previous, row, "asset_ref")
+        for incident_id in self._incidents.keys() - incidents.keys():
+            affected |= self._move(self._edge_incidents, incident_id, self._incidents[incident_id], None, "asset_ref")
+        self._incidents = incidents
+        self._incident_positions = {row["id"]: position for position, row in enumerate(rows)}
+        return self.rederive(affected)
+
+    def apply_stale(self, stale_ids: Set[str]) -> Set[str]:
+        """Update the stale sensor set; re-derives edges whose sensors went stale or came back"""
+        flipped = stale_ids ^ self._stale_ids
+        self._stale_ids = set(stale_ids)
+        affected = set()
+        for sensor_id in flipped:
+            sensor = self._sensors.get(sensor_id)
+            if sensor is not None and sensor["asset_type"] == "edge":
+                affected.add(sensor["asset_id"])
+        return self.rederive(affected)
+
+    @staticmethod
+    def _move(index, row_id: str, previous, row, key: str) -> Set[str]:
+        """Re-file a row under its edge in index; returns the edges it left or joined"""
+        def edge_of(item):
+            if item is None or (key == "asset_id" and item.get("asset_type") != "edge"):
+                return None
+            return item.get(key)
+
+        old_edge, new_edge = edge_of(previous), edge_of(row)
+        if old_edge and old_edge != new_edge:
+            index.get(old_edge, {}).pop(row_id, None)
+        if new_edge:
+            # Updated in place when it stays on the same edge, keeping its order
+            index.setdefault(new_edge, {})[row_id] = row
+        return {edge_id for edge_id in (old_edge, new_edge) if edge_id}
+
+    def rederive(self, edge_ids: Iterable[str]) -> Set[str]:
+        """
+        Recompute the payload of the given edges and adjust the summary counters
+
+        Returns:
+            Ids of edges whose payload actually changed
+        """
+        changed = set()
+        for edge_id in edge_ids:
+            row = self._edge_rows.get(edge_id)
+            if row is None:
+                # Sensor or incident for an edge that is not in the edges table
+                continue
+            edge = derive_edge(
+                row,
+                self._in_table_order(self._edge_sensors.get(edge_id, {}), self._sensor_positions),
+                self._in_table_order(self._edge_incidents.get(edge_id, {}), self._incident_positions),
+                self._stale_ids,
+            )
+            TOPOLOGY_EDGES_REDERIVED.inc()
+            previous = self.edges.get(edge_id)
+            if previous == edge:
+                continue
+            if previous is not None:
+                self._count(previous, -1)
+            self._count(edge, 1)
+            self.edges[edge_id] = edge
+            changed.add(edge_id)
+        return changed
+
+    @staticmethod
+    def _in_table_order(rows: Dict[str, Dict[str, Any]], positions: Dict[str, int]) -> List[Dict[str, Any]]:
+        return sorted(rows.values(), key=lambda row: positions.get(row["id"], 0))
+
+    def _count(self, edge: Dict[str, Any], sign: int):
+        for name, value in _contribution(edge).items():
+            self._counters[name] += sign * value
+
+    @property
+    def summary(self) -> Dict[str, int]:
+        return {"total_edges": len(self.edges), **self._counters}
+
+    def payload(self) -> Dict[str, Any]:
+        """The /network/topology response body"""
+        return {
+            "nodes": list(self.nodes.values()),
+            "edges": list(self.edges.values()),
+            "incident_summary": self.summary,
+        }
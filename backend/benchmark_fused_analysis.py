@@ -0,0 +1,133 @@
+"""
+Benchmark the fused safety+leak LLM call against the split prompts
+
+Takes one network snapshot, then alternates between:
+- split: the leak prompt and the safety enrichment prompt, sent concurrently
+- fused: one combined prompt (FusedSafetyLeakAnalysis)
+
+and reports wall time, tokens and LLM calls (including escalations to
+the large model) for each mode. Nothing is written to
+Supabase; only the LLM steps run.
+
+Usage:
+    python benchmark_fused_analysis.py [--runs 3]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from ai_agents import AgentCoordinator
+from ai_agents.snapshot import take_snapshot
+from ai_agents.metrics import LLM_TOKENS, LLM_REQUESTS, LLM_ESCALATIONS
+
+
+def token_totals():
+    """Prompt and completion tokens counted by the gateway so far"""
+    totals = {"prompt": 0.0, "completion": 0.0}
+    for (agent, kind), value in LLM_TOKENS.values().items():
+        totals[kind] = totals.get(kind, 0.0) + value
+    return totals
+
+
+def call_totals():
+    """LLM calls completed (ok or failed; 429 retries excluded) and escalations so far"""
+    calls = sum(value for (agent, outcome), value in LLM_REQUESTS.values().items() if outcome != "rate_limited")
+    return {"calls": calls, "escalations": sum(LLM_ESCALATIONS.values().values())}
+
+
+async def measure(run):
+    before = token_totals()
+    calls_before = call_totals()
+    started = time.perf_counter()
+    await run()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    after = token_totals()
+    calls_after = call_totals()
+    return {
+        "ms": elapsed_ms,
+        "prompt_tokens": after["prompt"] - before["prompt"],
+        "completion_tokens": after["completion"] - before["completion"],
+        "calls": calls_after["calls"] - calls_before["calls"],
+        "escalations": calls_after["escalations"] - calls_before["escalations"],
+    }
+
+
+async def main(runs: int):
+    coordinator = AgentCoordinator()
+    leak_agent = coordinator.leak_agent
+    safety_agent = coordinator.safety_agent
+
+    print("=" * 80)
+    print("📸 Taking network snapshot...")
+    snapshot = await take_snapshot()
+    edge_data = await leak_agent._fetch_sensor_data(snapshot)
+    safety_data = await safety_agent.fetch_safety_data(snapshot)
+    edge_names = {e["id"]: e["name"] for e in snapshot["edges"]}
+    print(f"Pipes: {len(edge_data)}, sensors: {len(snapshot['sensors'])}")
+
+    split_tokens = leak_agent._build_prompt(edge_data)[2]["prompt_tokens"] + safety_agent._build_prompt(safety_data)[2]["prompt_tokens"]
+    fused_tokens = coordinator.fused.build_prompt(edge_data, safety_data)[3]["prompt_tokens"]
+    print(f"Prompt size (counted locally): split {split_tokens:,} tokens, fused {fused_tokens:,} tokens")
+
+    async def split():
+        await asyncio.gather(
+            leak_agent._detect_with_llm(edge_data, edge_names, None),
+            safety_agent._enrich(safety_data),
+        )
+
+    async def fused():
+        await coordinator.fused.detect(edge_data, edge_names, None, safety_data)
+
+    samples = {"split": [], "fused": []}
+    for run in range(runs):
+        # Alternate the order so neither mode always runs on a warm connection
+        order = [("split", split), ("fused", fused)] if run % 2 == 0 else [("fused", fused), ("split", split)]
+        for mode, call in order:
+            sample = await measure(call)
+            samples[mode].append(sample)
+            print(
+                f"  run {run + 1} {mode:5s}: {sample['ms']:8.0f} ms, "
+                f"{sample['prompt_tokens']:6.0f} prompt + {sample['completion_tokens']:5.0f} completion tokens, "
+                f"{sample['calls']:.0f} LLM calls ({sample['escalations']:.0f} escalated)"
+            )
+
+    print("\n" + "=" * 80)
+    print(
+        f"{'mode':6s} {'median ms':>10s} {'mean ms':>10s} {'prompt tok':>11s} {'compl tok':>10s} "
+        f"{'total tok':>10s} {'calls':>6s} {'escal':>6s}"
+    )
+    summary = {}
+    for mode, rows in samples.items():
+        summary[mode] = {
+            "median_ms": statistics.median(r["ms"] for r in rows),
+            "mean_ms": statistics.mean(r["ms"] for r in rows),
+            "prompt": statistics.mean(r["prompt_tokens"] for r in rows),
+            "completion": statistics.mean(r["completion_tokens"] for r in rows),
+            "calls": statistics.mean(r["calls"] for r in rows),
+            "escalations": statistics.mean(r["escalations"] for r in rows),
+        }
+        s = summary[mode]
+        print(
+            f"{mode:6s} {s['median_ms']:10.0f} {s['mean_ms']:10.0f} {s['prompt']:11.0f} "
+            f"{s['completion']:10.0f} {s['prompt'] + s['completion']:10.0f} "
+            f"{s['calls']:6.1f} {s['escalations']:6.1f}"
+        )
+
+    split_total = summary["split"]["prompt"] + summary["split"]["completion"]
+    fused_total = summary["fused"]["prompt"] + summary["fused"]["completion"]
+    if split_total and summary["split"]["median_ms"]:
+        print(
+            f"\nFused vs split: {100 * (1 - fused_total / split_total):.0f}% fewer tokens, "
+            f"{100 * (1 - summary['fused']['median_ms'] / summary['split']['median_ms']):.0f}% lower median latency"
+        )
+    print(
+        f"LLM calls per run (mean, escalations included): "
+        f"split {summary['split']['calls']:.1f}, fused {summary['fused']['calls']:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode")
+    args = parser.parse_args()
+    asyncio.run(main(args.runs))
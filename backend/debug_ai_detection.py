@@ -30,7 +30,7 @@ async def main():
     print("\n" + "=" * 80)
     print("📝 Prompt that will be sent to OpenAI:")
     print("=" * 80)
-    prompt = agent._prepare_prompt(edge_data)
+    prompt, _, _ = agent._build_prompt(edge_data)
     print(prompt)
 
 
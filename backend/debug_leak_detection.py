@@ -25,7 +25,7 @@ async def main():
     print("PREPARING PROMPT FOR AI...")
     print("=" * 60)
 
-    prompt = agent._prepare_prompt(edge_data)
+    prompt, _, _ = agent._build_prompt(edge_data)
     print(prompt)
 
     print("\n" + "=" * 60)
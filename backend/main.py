@@ -1,9 +1,52 @@
+import asyncio
+import json
+import time
+import contextlib
+import hashlib
+from typing import Optional
+from datetime import datetime, timedelta, timezone
 import fastapi
 import fastapi.middleware.cors
+import fastapi.responses
 from ai_agents import AgentCoordinator, AnalyticsAgent
 from ai_agents.supabase_client import supabase_client
-
-app = fastapi.FastAPI(title="AWARE Water Management System API")
+from ai_agents.sensor_state import sensor_state
+from ai_agents.broadcast import Broadcaster
+from ai_agents.safety_watch import SafetyWatcher
+from ai_agents.analytics_cache import AnalyticsCache
+from ai_agents.analytics_agent import METRIC_TTLS
+from ai_agents.jobs import JobQueue
+from ai_agents.metrics import registry, HTTP_REQUEST_SECONDS, TOPOLOGY_REQUESTS, TOPOLOGY_CHANGE_RESPONSES
+from ai_agents.model_routing import model_router
+from ai_agents.decision_log import decision_writer
+from ai_agents.data_versions import DataVersions, etag_matches
+from ai_agents.topology_changes import TopologyChangeLog
+from ai_agents.topology_view import TopologyView, INCIDENT_SELECT
+from ai_agents.network_feed import NetworkFeed
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: fastapi.FastAPI):
+    """Start and stop background monitors with the app"""
+    if SAFETY_MONITOR_INTERVAL_SECONDS > 0:
+        safety_watcher.start()
+    jobs.start()
+    # Receding-horizon pump re-planning (ENERGY_REPLAN_INTERVAL_SECONDS=0 disables it)
+    coordinator.energy_agent.start_replanning()
+    decision_writer.start()
+    topology_versions.start()
+    network_feed.start()
+    yield
+    await network_feed.stop()
+    await jobs.stop()
+    await coordinator.energy_agent.stop_replanning()
+    await safety_watcher.stop()
+    await topology_versions.stop()
+    # Write out decisions still queued for the audit trail
+    await decision_writer.stop()
+
+
+app = fastapi.FastAPI(title="AWARE Water Management System API", lifespan=lifespan)
 
 # Middleware Configuration
 import os
@@ -22,9 +65,196 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_latency(request: fastapi.Request, call_next):
+    """Route latency histogram, labelled by route template rather than raw path"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            route.path if route is not None else "unmatched",
+            str(status),
+        )
+
 # Initialize agent coordinator and analytics agent
 coordinator = AgentCoordinator()
 analytics_agent = AnalyticsAgent()
+analytics_cache = AnalyticsCache(analytics_agent.get_latest_metric, analytics_agent.regenerate_metric)
+
+# Continuous safety evaluation (0 disables the background loop)
+SAFETY_MONITOR_INTERVAL_SECONDS = float(os.getenv("SAFETY_MONITOR_INTERVAL_SECONDS", "10"))
+safety_alerts = Broadcaster()
+safety_watcher = SafetyWatcher(
+    rule_engine=coordinator.safety_agent.rule_engine,
+    state=sensor_state,
+    broadcaster=safety_alerts,
+    interval_seconds=SAFETY_MONITOR_INTERVAL_SECONDS,
+)
+
+
+# Change markers for the tables /network/topology is built from; its ETag
+# is derived from them so unchanged polls are answered without Supabase
+topology_versions = DataVersions(
+    {"nodes": {}, "edges": {}, "sensors": {}, "events": {"asset_type": "eq.edge"}},
+    interval_seconds=float(os.getenv("TOPOLOGY_VERSION_POLL_SECONDS", "5")),
+)
+# Materialized topology, updated from the tables that changed; the
+# markers record which version of each table it was last loaded from
+topology_view = TopologyView()
+_topology_loaded = {}
+# Serialized payload of the view under a known ETag
+_topology_cache = {"etag": None, "body": None}
+# One view update at a time; concurrent requests for the same ETag share it
+_topology_lock = asyncio.Lock()
+# Which nodes and edges changed between view updates, for /network/topology/changes
+topology_changes = TopologyChangeLog(
+    retention=int(os.getenv("TOPOLOGY_CHANGE_LOG_SIZE", "5000")),
+)
+
+
+def _topology_hit_ratio() -> dict:
+    counts = {labels[0]: value for labels, value in TOPOLOGY_REQUESTS.values().items()}
+    total = sum(counts.values())
+    hits = counts.get("not_modified", 0) + counts.get("cached", 0)
+    return {(): hits / total} if total else {}
+
+
+registry.gauge(
+    "aware_topology_cache_hit_ratio",
+    "Share of /network/topology requests answered with 304 or a cached body",
+    callback=_topology_hit_ratio,
+)
+
+
+async def _refresh_topology_if_changed():
+    """Update (and log) the topology view only when its ETag has moved"""
+    etag = _topology_etag()
+    if etag is None or _topology_cache["etag"] != etag or not topology_changes.recorded:
+        body = await _refresh_topology(etag)
+        if isinstance(body, dict):
+            raise RuntimeError(body["error"])
+
+
+# Pushes map changes to /network/stream subscribers as soon as the table
+# versions move, instead of clients re-polling the whole topology
+network_feed = NetworkFeed(
+    refresh=_refresh_topology_if_changed,
+    changes=topology_changes,
+    interval_seconds=float(os.getenv("TOPOLOGY_VERSION_POLL_SECONDS", "5")),
+    coalesce_seconds=float(os.getenv("NETWORK_STREAM_COALESCE_SECONDS", "0.25")),
+)
+topology_versions.on_change(network_feed.notify)
+registry.gauge(
+    "aware_network_stream_subscribers", "Clients connected to /network/stream",
+    callback=lambda: {(): network_feed.subscriber_count},
+)
+registry.gauge(
+    "aware_network_stream_pending_updates", "Coalesced map updates waiting for slow /network/stream clients",
+    callback=lambda: {(): network_feed.metrics()["pending"]},
+)
+registry.gauge(
+    "aware_topology_change_log_entries", "Node/edge changes retained for /network/topology/changes",
+    callback=lambda: {(): topology_changes.metrics()["entries"]},
+)
+
+# Long agent runs can be queued as jobs (?background=true)
+jobs = JobQueue(
+    max_workers=int(os.getenv("JOB_WORKERS", "2")),
+    ttl_seconds=float(os.getenv("JOB_TTL_SECONDS", "3600")),
+)
+registry.gauge(
+    "aware_job_queue_depth", "Jobs waiting for a worker",
+    callback=lambda: {(): jobs.metrics()["queue_depth"]},
+)
+registry.gauge(
+    "aware_jobs_running", "Jobs currently running",
+    callback=lambda: {(): jobs.metrics()["running"]},
+)
+
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _submit_job(kind: str, params: dict, run) -> fastapi.responses.JSONResponse:
+    """Queue a job and answer 202 with where to follow it"""
+    job = jobs.submit(kind, params, run)
+    return fastapi.responses.JSONResponse(
+        status_code=202,
+        content={
+            **job,
+            "status_url": f"/jobs/{job['id']}",
+            "stream_url": f"/jobs/{job['id']}/stream",
+        },
+    )
+
+
+# Runs started by /stream endpoints; kept referenced until they finish
+_stream_runs = set()
+
+
+def _stream_run(request: fastapi.Request, run) -> fastapi.responses.StreamingResponse:
+    """
+    Run an agent and stream its progress as Server-Sent Events
+
+    run is called with a progress callback; each (event, data) it reports is
+    sent as it happens, stamped with elapsed_ms, and the stream ends with a
+    "result" event carrying what the plain endpoint would have returned.
+    The run finishes even if the client disconnects, so its incidents and
+    schedules are stored consistently.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+
+    def progress(event: str, data: dict):
+        queue.put_nowait((event, {**data, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}))
+
+    async def events():
+        task = asyncio.create_task(run(progress))
+        _stream_runs.add(task)
+        task.add_done_callback(_stream_runs.discard)
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+
+        yield _sse("progress", {"stage": "started", "elapsed_ms": 0.0})
+        while not await request.is_disconnected():
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is None:
+                break
+            yield _sse(*item)
+        else:
+            return
+
+        try:
+            result = task.result()
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        yield _sse("result", result)
+
+    return fastapi.responses.StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus metrics: Supabase call latency/rows/bytes, agent phase
+    timings, route latency and job queue state.
+    """
+    return fastapi.responses.PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 # Root Endpoint
@@ -88,198 +318,498 @@ async def get_leaks():
 # ========== AI AGENT ENDPOINTS ==========
 
 @app.post("/ai/analyze")
-async def run_all_agents():
+async def run_all_agents(
+    background: bool = False, budget_seconds: Optional[float] = None, fused: Optional[bool] = None
+):
     """
     Run all AI agents (Leak Preemption, Energy Optimizer, Safety Monitor)
     and return coordinated recommendations.
+    budget_seconds overrides AGENT_RUN_BUDGET_SECONDS; agents whose LLM call
+    would overrun it answer from their rule-based path instead.
+    fused=true sends one combined safety+leak prompt (default AGENT_FUSED_ANALYSIS).
+    With background=true, returns a job id immediately (see /jobs).
     """
+    if background:
+        return _submit_job(
+            "analyze", {"budget_seconds": budget_seconds, "fused": fused},
+            lambda: coordinator.run_all_agents(budget_seconds=budget_seconds, fused=fused),
+        )
     try:
-        result = await coordinator.run_all_agents()
+        result = await coordinator.run_all_agents(budget_seconds=budget_seconds, fused=fused)
         return result
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
+@app.api_route("/ai/analyze/stream", methods=["GET", "POST"])
+async def stream_all_agents(request: fastapi.Request):
+    """
+    Server-Sent Events variant of /ai/analyze: progress events (snapshot
+    taken, agent steps started/finished/cancelled), safety and leak
+    findings as they are found, then the coordinated "result".
+    """
+    return _stream_run(request, coordinator.run_all_agents)
+
+
 @app.post("/ai/leak-detection")
-async def run_leak_detection():
+async def run_leak_detection(background: bool = False, budget_seconds: Optional[float] = None):
     """
     Run AI-powered leak detection agent.
-    Uses sensor fusion (acoustic + pressure + flow) with OpenAI analysis.
+    Uses sensor fusion (acoustic + pressure + flow) with OpenAI analysis,
+    falling back to the threshold rules if OpenAI overruns budget_seconds.
+    With background=true, returns a job id immediately (see /jobs).
     """
+    if background:
+        return _submit_job(
+            "leak-detection", {"budget_seconds": budget_seconds},
+            lambda: coordinator.run_leak_detection(budget_seconds=budget_seconds),
+        )
     try:
-        result = await coordinator.run_leak_detection()
+        result = await coordinator.run_leak_detection(budget_seconds=budget_seconds)
         return result
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
+@app.api_route("/ai/leak-detection/stream", methods=["GET", "POST"])
+async def stream_leak_detection(request: fastapi.Request):
+    """
+    Server-Sent Events variant of /ai/leak-detection: each leak is sent as
+    a "finding" as soon as it is complete in the streamed completion.
+    """
+    return _stream_run(request, coordinator.run_leak_detection)
+
+
 @app.post("/ai/energy-optimization")
-async def run_energy_optimization():
+async def run_energy_optimization(
+    mode: str = "llm", background: bool = False, budget_seconds: Optional[float] = None
+):
     """
     Run energy optimization agent.
     Creates optimal pump/tank schedules based on energy prices.
+    Use mode=mpc for the tank-aware 48-hour receding-horizon schedule; the
+    LLM plan falls back to it if OpenAI overruns budget_seconds.
+    With background=true, returns a job id immediately (see /jobs).
     """
+    if background:
+        return _submit_job(
+            "energy-optimization", {"mode": mode, "budget_seconds": budget_seconds},
+            lambda: coordinator.run_energy_optimization(mode=mode, budget_seconds=budget_seconds),
+        )
     try:
-        result = await coordinator.run_energy_optimization()
+        result = await coordinator.run_energy_optimization(mode=mode, budget_seconds=budget_seconds)
         return result
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
+@app.api_route("/ai/energy-optimization/stream", methods=["GET", "POST"])
+async def stream_energy_optimization(request: fastapi.Request, mode: str = "llm"):
+    """
+    Server-Sent Events variant of /ai/energy-optimization.
+    """
+    return _stream_run(request, lambda progress: coordinator.run_energy_optimization(mode=mode))
+
+
 @app.post("/ai/safety-monitoring")
-async def run_safety_monitoring():
+async def run_safety_monitoring(budget_seconds: Optional[float] = None):
     """
     Run safety monitoring agent.
-    Checks for pressure violations and system safety issues.
+    Checks for pressure violations and system safety issues. If the sensor
+    read would overrun budget_seconds, the rules run on the sensor state
+    already held in memory.
     """
     try:
-        result = await coordinator.run_safety_monitoring()
+        result = await coordinator.run_safety_monitoring(budget_seconds=budget_seconds)
         return result
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
+@app.api_route("/ai/safety-monitoring/stream", methods=["GET", "POST"])
+async def stream_safety_monitoring(request: fastapi.Request):
+    """
+    Server-Sent Events variant of /ai/safety-monitoring: one "finding" per
+    safety issue, then the "result".
+    """
+    return _stream_run(request, coordinator.run_safety_monitoring)
+
+
+@app.get("/ai/safety-status")
+async def get_safety_status():
+    """
+    Latest result of the background safety monitor.
+    """
+    return {
+        "safety_status": safety_watcher.safety_status,
+        "monitor_running": safety_watcher.running,
+        "interval_seconds": safety_watcher.interval_seconds,
+        "latest": safety_watcher.latest,
+    }
+
+
+@app.get("/ai/energy-plan")
+async def get_energy_plan():
+    """
+    Latest plan of the background receding-horizon re-planner.
+    """
+    energy_agent = coordinator.energy_agent
+    return {
+        "replanning": energy_agent.replanning,
+        "interval_seconds": energy_agent.replan_interval_seconds,
+        "plan": energy_agent.current_plan,
+    }
+
+
+@app.get("/ai/routing")
+async def get_model_routing():
+    """
+    Tiered model routing: cheap/large models, escalation rate per agent
+    and the most recent routing decisions.
+    """
+    return model_router.status()
+
+
+@app.get("/ai/safety-stream")
+async def stream_safety_alerts(request: fastapi.Request):
+    """
+    Server-Sent Events stream of safety status transitions
+    (SAFE -> WARNING -> CRITICAL and back) from the background monitor.
+    Sends the current status first, then one event per transition.
+    """
+    queue = safety_alerts.subscribe()
+
+    async def events():
+        try:
+            yield _sse("safety_status", {
+                "safety_status": safety_watcher.safety_status,
+                "latest": safety_watcher.latest,
+            })
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event["type"], event)
+        finally:
+            safety_alerts.unsubscribe(queue)
+
+    return fastapi.responses.StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _generate_all_analytics():
+    result = await analytics_agent.generate_all_analytics()
+    analytics_cache.invalidate()
+    return result
+
+
 @app.post("/ai/generate-analytics")
-async def generate_analytics():
+async def generate_analytics(background: bool = False):
     """
     Generate all AI analytics: NRW, uptime, demand forecast, and energy metrics.
     This populates the dashboard with fresh AI-generated data.
+    With background=true, returns a job id immediately (see /jobs).
     """
+    if background:
+        return _submit_job("generate-analytics", {}, _generate_all_analytics)
     try:
-        result = await analytics_agent.generate_all_analytics()
-        return result
+        return await _generate_all_analytics()
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@app.api_route("/ai/generate-analytics/stream", methods=["GET", "POST"])
+async def stream_generate_analytics(request: fastapi.Request):
+    """
+    Server-Sent Events variant of /ai/generate-analytics.
+    """
+    return _stream_run(request, lambda progress: _generate_all_analytics())
+
+
+# ========== JOB ENDPOINTS ==========
+
+@app.get("/jobs")
+async def list_jobs():
+    """
+    Retained jobs (without results) and queue metrics.
+    """
+    return {"jobs": jobs.list(), "metrics": jobs.metrics()}
+
+
+@app.get("/jobs/metrics")
+async def get_job_metrics():
+    """
+    Queue depth, running jobs, deduplicated submissions and average
+    queue wait / run time.
+    """
+    return jobs.metrics()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status of a job, with its result once it has finished.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise fastapi.HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str, request: fastapi.Request):
+    """
+    Server-Sent Events stream of a job's status changes, ending with a
+    "result" event that carries the finished job.
+    """
+    if jobs.get(job_id) is None:
+        raise fastapi.HTTPException(status_code=404, detail="Job not found or expired")
+    queue = jobs.events.subscribe()
+
+    async def events():
+        try:
+            job = jobs.get(job_id)
+            while job is not None and job["status"] in ("queued", "running"):
+                yield _sse("status", {"job_id": job_id, "status": job["status"]})
+                while not await request.is_disconnected():
+                    try:
+                        event = await asyncio.wait_for(queue.get(), timeout=15)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                        continue
+                    if event["job_id"] == job_id:
+                        break
+                else:
+                    return
+                job = jobs.get(job_id)
+            if job is not None:
+                yield _sse("result", job)
+        finally:
+            jobs.events.unsubscribe(queue)
+
+    return fastapi.responses.StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/analytics")
+async def get_analytics():
+    """
+    Latest NRW, uptime and energy metrics from cache. Expired metrics are
+    served as-is while they regenerate in the background.
+    """
+    try:
+        results = await asyncio.gather(*(analytics_cache.get(name) for name in METRIC_TTLS))
+        return {
+            "metrics": {r["metric_name"]: r for r in results},
+            "cache": analytics_cache.status(),
+        }
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@app.get("/analytics/metrics/{metric_name}")
+async def get_analytics_metric(metric_name: str):
+    """Latest value of one ai_analytics metric, cache-through"""
+    if metric_name not in METRIC_TTLS:
+        raise fastapi.HTTPException(status_code=404, detail=f"Unknown metric: {metric_name}")
+    try:
+        return await analytics_cache.get(metric_name)
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@app.get("/analytics/nrw")
+async def get_nrw(hours: int = 24, zone: str | None = None):
+    """
+    Non-Revenue Water per district from the network flow balance
+    (system input vs authorized consumption) over the last `hours`.
+    """
+    try:
+        end = datetime.now(timezone.utc)
+        return await analytics_agent.nrw_engine.compute(end - timedelta(hours=hours), end, zone)
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@app.get("/analytics/uptime")
+async def get_uptime(hours: float = 720, asset: str | None = None):
+    """
+    Uptime, MTBF and MTTR over the last `hours` from merged incident
+    outage intervals, for the whole system or one asset.
+    """
+    try:
+        events = await supabase_client.query("events", select="*")
+        return await analytics_agent.calculate_uptime({"events": events}, window_hours=hours, asset=asset)
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
 
 # ========== NETWORK TOPOLOGY ENDPOINTS ==========
 
+def _topology_etag() -> Optional[str]:
+    """
+    ETag for the topology payload without reading Supabase
+
+    Combines the polled table versions with the stale sensor set, which
+    changes with the passage of time rather than with the tables.
+    """
+    stale = hashlib.sha1(",".join(sorted(sensor_state.stale_ids())).encode()).hexdigest()
+    return topology_versions.etag(stale)
+
+
 @app.get("/network/topology")
-async def get_network_topology():
+async def get_network_topology(request: fastapi.Request):
     """
     Get complete network topology with status based on SENSOR DATA for map visualization.
     Map colors are determined by sensor readings, not incidents.
     Incidents are included for reference but don't affect map colors.
-    """
-    try:
-        # Fetch nodes and edges
-        nodes = await supabase_client.query("nodes", select="*")
-        edges = await supabase_client.query("edges", select="*")
 
-        # Fetch all sensors
-        sensors = await supabase_client.get_sensors_with_assets()
+    Responses carry an ETag derived from the polled table versions. A
+    matching If-None-Match is answered with 304 without touching Supabase,
+    and an unchanged payload is served from its cached serialization.
+    """
+    etag = _topology_etag()
+    headers = {"Cache-Control": "no-cache"}
+    if etag is not None:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            TOPOLOGY_REQUESTS.inc("not_modified")
+            return fastapi.Response(status_code=304, headers=headers)
+        if _topology_cache["etag"] == etag:
+            TOPOLOGY_REQUESTS.inc("cached")
+            return fastapi.Response(_topology_cache["body"], media_type="application/json", headers=headers)
+
+    body = await _refresh_topology(etag)
+    if isinstance(body, dict):
+        return body
+    TOPOLOGY_REQUESTS.inc("rebuilt" if etag is not None else "unversioned")
+    return fastapi.Response(body, media_type="application/json", headers=headers)
+
+
+async def _refresh_topology(etag: Optional[str]):
+    """
+    Bring the topology view up to date unless the payload for etag is cached
 
-        # Group sensors by edge_id
-        edge_sensors = {}
-        for sensor in sensors:
-            if sensor["asset_type"] == "edge":
-                edge_id = sensor["asset_id"]
-                if edge_id not in edge_sensors:
-                    edge_sensors[edge_id] = []
-                edge_sensors[edge_id].append(sensor)
-
-        # Fetch all incidents linked to edges (for reference only)
-        incidents = await supabase_client.query(
-            "events",
-            select="id,title,asset_ref,asset_type,state,severity,priority,confidence,detected_by,created_at",
-            asset_type="eq.edge"
+    Every update is logged in the change log. Returns the serialized
+    payload, or an error dict if Supabase could not be read.
+    """
+    async with _topology_lock:
+        if etag is not None and _topology_cache["etag"] == etag:
+            return _topology_cache["body"]
+        try:
+            changed = await _update_topology_view()
+        except Exception as e:
+            return {"status": "error", "error": str(e), "nodes": [], "edges": []}
+        topology_changes.record(
+            changed,
+            {"nodes": topology_view.nodes, "edges": topology_view.edges},
+            topology_view.summary,
         )
+        body = json.dumps(topology_view.payload(), default=str).encode()
+        if etag is not None:
+            _topology_cache.update(etag=etag, body=body)
+        return body
 
-        # Create incident map by edge_id
-        incident_map = {}
-        for incident in incidents:
-            edge_id = incident.get("asset_ref")
-            if edge_id:
-                if edge_id not in incident_map:
-                    incident_map[edge_id] = []
-                incident_map[edge_id].append(incident)
-
-        # Enhance edges with sensor-based status
-        enhanced_edges = []
-        leak_indicator_count = 0
-
-        for edge in edges:
-            edge_id = edge["id"]
-            edge_incidents = incident_map.get(edge_id, [])
-            sensors_list = edge_sensors.get(edge_id, [])
-
-            # Analyze sensors to determine status
-            pressure = None
-            acoustic = None
-            flow = None
-
-            for sensor in sensors_list:
-                if sensor["type"] == "pressure":
-                    pressure = sensor["value"]
-                elif sensor["type"] == "acoustic":
-                    acoustic = sensor["value"]
-                elif sensor["type"] == "flow":
-                    flow = sensor["value"]
-
-            # Determine leak indicators from sensor data
-            leak_indicators = []
-            if pressure is not None and pressure < 55:
-                leak_indicators.append("LOW_PRESSURE")
-            if acoustic is not None and acoustic > 5:
-                leak_indicators.append("HIGH_ACOUSTIC")
-            if flow is not None and flow > 110:
-                leak_indicators.append("HIGH_FLOW")
-
-            # Determine edge status based on sensor data
-            if len(leak_indicators) >= 3:
-                edge_status = "critical"  # All 3 indicators
-            elif len(leak_indicators) >= 2:
-                edge_status = "high"  # 2 indicators
-            elif len(leak_indicators) >= 1:
-                edge_status = "medium"  # 1 indicator
-            else:
-                edge_status = "normal"
-
-            if len(leak_indicators) > 0:
-                leak_indicator_count += 1
-
-            # Filter incidents by state
-            active_incidents = [inc for inc in edge_incidents if inc["state"] != "resolved"]
-            open_incidents = [inc for inc in edge_incidents if inc["state"] == "open"]
-            acknowledged_incidents = [inc for inc in edge_incidents if inc["state"] == "acknowledged"]
-            resolved_incidents = [inc for inc in edge_incidents if inc["state"] == "resolved"]
-
-            # Get highest priority incident (for reference)
-            highest_priority_incident = None
-            if active_incidents:
-                highest_priority_incident = max(
-                    active_incidents,
-                    key=lambda x: x.get("priority", 0)
-                )
-
-            enhanced_edges.append({
-                **edge,
-                "status": edge_status,  # Based on SENSOR DATA
-                "leak_indicators": leak_indicators,
-                "sensor_data": {
-                    "pressure": pressure,
-                    "acoustic": acoustic,
-                    "flow": flow
-                },
-                "active_incident_count": len(active_incidents),
-                "total_incident_count": len(edge_incidents),
-                "has_open_incidents": len(open_incidents) > 0,
-                "has_acknowledged_incidents": len(acknowledged_incidents) > 0,
-                "highest_priority_incident": highest_priority_incident,
-                "all_incidents": edge_incidents
-            })
 
-        return {
-            "nodes": nodes,
-            "edges": enhanced_edges,
-            "incident_summary": {
-                "total_edges": len(edges),
-                "edges_with_leak_indicators": leak_indicator_count,
-                "edges_with_active_incidents": len([e for e in enhanced_edges if e["active_incident_count"] > 0]),
-                "total_active_incidents": sum(e["active_incident_count"] for e in enhanced_edges),
-                "critical_edges": len([e for e in enhanced_edges if e["status"] == "critical"]),
-                "high_severity_edges": len([e for e in enhanced_edges if e["status"] == "high"]),
-            }
-        }
+@app.get("/network/topology/changes")
+async def get_network_topology_changes(since: Optional[str] = None):
+    """
+    Nodes and edges that changed since a cursor
+
+    Pass the cursor from the previous response as ?since=. The response
+    holds the current payload of every node and edge whose status,
+    sensor_data, incidents or other fields changed in the meantime, the ids
+    of removed ones, the incident summary, and a new cursor. Without a
+    cursor, or with one from before a restart or older than the retained
+    change log, a full snapshot is returned instead ("full": true).
+    """
+    try:
+        await _refresh_topology_if_changed()
     except Exception as e:
         return {"status": "error", "error": str(e), "nodes": [], "edges": []}
+    delta = topology_changes.changes_since(since)
+    TOPOLOGY_CHANGE_RESPONSES.inc("full" if delta["full"] else "delta")
+    return delta
+
+
+@app.get("/network/stream")
+async def stream_network(request: fastapi.Request):
+    """
+    Server-Sent Events stream of live map changes
+
+    Sends a "snapshot" event with the full topology first, then:
+    - "edge": status transitions, leak_indicators changes and incident
+      count changes, with the edge's current map fields
+    - "node" and "removed": node changes and removed nodes or edges
+    - "summary": the new incident_summary
+
+    Updates to the same edge within NETWORK_STREAM_COALESCE_SECONDS, or
+    while a slow client is still reading, are merged into one event.
+    """
+    try:
+        subscription = await network_feed.subscribe()
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+    async def events():
+        try:
+            snapshot = topology_changes.snapshot()
+            del snapshot["full"]
+            yield _sse("snapshot", snapshot)
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(timeout=15)
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                for update in batch:
+                    yield _sse(update["type"], update["data"])
+        finally:
+            network_feed.unsubscribe(subscription)
+
+    return fastapi.responses.StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _update_topology_view() -> dict:
+    """
+    Read the tables that changed since the view last loaded them into it
+
+    Tables are re-read when their polled marker moved, or always while the
+    markers are not fresh. Only edges touched by changed rows, or whose
+    sensors went stale or came back, are re-derived.
+
+    Returns:
+        {"nodes": ids, "edges": ids} whose payload changed
+    """
+    fresh = topology_versions.fresh
+    versions = dict(topology_versions.versions)
+    tables = [
+        table for table in topology_versions.tables
+        if not fresh or table not in _topology_loaded or _topology_loaded[table] != versions.get(table)
+    ]
+    readers = {
+        "nodes": lambda: supabase_client.query("nodes", select="*"),
+        "edges": lambda: supabase_client.query("edges", select="*"),
+        "sensors": supabase_client.get_sensors_with_assets,
+        # Incidents linked to edges (for reference only)
+        "events": lambda: supabase_client.query("events", select=INCIDENT_SELECT, asset_type="eq.edge"),
+    }
+    rows = dict(zip(tables, await asyncio.gather(*(readers[table]() for table in tables))))
+
+    changed = {"nodes": set(), "edges": set()}
+    if "nodes" in rows:
+        changed["nodes"] |= topology_view.apply_nodes(rows["nodes"])
+    if "edges" in rows:
+        changed["edges"] |= topology_view.apply_edges(rows["edges"])
+    if "sensors" in rows:
+        sensor_state.apply(rows["sensors"])
+        changed["edges"] |= topology_view.apply_sensors(rows["sensors"])
+    if "events" in rows:
+        changed["edges"] |= topology_view.apply_incidents(rows["events"])
+    changed["edges"] |= topology_view.apply_stale(sensor_state.stale_ids())
+
+    for table in tables:
+        if fresh:
+            _topology_loaded[table] = versions.get(table)
+        else:
+            _topology_loaded.pop(table, None)
+    return changed
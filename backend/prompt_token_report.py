@@ -0,0 +1,403 @@
+"""
+Report prompt tokens per agent before and after compact encoding
+
+Takes one network snapshot and builds every LLM prompt twice: in the
+original verbose form (one line per reading, full UUIDs, instructions
+around the data; the builders for it live only in this script) and in the
+compact form the agents now send (fixed prefix, aliased CSV tables, token
+budgets). Tokens are counted locally;
+no LLM calls are made and nothing is written to Supabase.
+
+Usage:
+    python prompt_token_report.py
+"""
+import asyncio
+from typing import Dict, List, Any
+from ai_agents import AgentCoordinator
+from ai_agents.snapshot import take_snapshot
+from ai_agents.prompting import count_tokens, tiktoken
+
+
+def verbose_leak_prompt(edge_data: Dict[str, List[Dict[str, Any]]]) -> str:
+    """Leak detection prompt as first sent: one line per reading, full UUIDs"""
+    prompt = """You are an expert leak detection AI agent for water distribution systems.
+
+Your task is to analyze sensor data from water pipes and predict leak likelihood using sensor fusion.
+
+IMPORTANT BASELINE RANGES (for reference):
+- Pressure: NORMAL = 60-70 psi | LEAK INDICATOR = < 55 psi (sudden drop)
+- Acoustic: NORMAL = 2-3 dB   | LEAK INDICATOR = > 5 dB (spike in vibration/noise)
+- Flow:     NORMAL = 80-100 L/s | LEAK INDICATOR = > 110 L/s (unexpected increase)
+
+A leak is highly likely when you see:
+- Pressure DROP (below 55 psi) + Acoustic SPIKE (above 5 dB) = High confidence leak
+- Any TWO of these factors together = Moderate confidence leak
+- One factor alone = Low confidence, monitor
+
+Sensor Data by Pipe:
+"""
+    for edge_id, sensors in edge_data.items():
+        prompt += f"\n--- Pipe {edge_id} ---\n"
+        for sensor in sensors:
+            if sensor.get("stale"):
+                prompt += f"  - {sensor['type']}: STALE, no report since {sensor['last_seen']} - do not use this value\n"
+                continue
+            prompt += f"  - {sensor['type']}: {sensor['value']} {sensor['unit']} (last seen: {sensor['last_seen']})\n"
+
+    prompt += """
+Analyze this data and identify ANY pipes that show leak indicators. For each pipe with potential leak risk:
+
+1. Calculate a confidence score (0.0 to 1.0) based on:
+   - High acoustic readings (unusual vibrations/noise)
+   - Low pressure readings (indicating pressure loss)
+   - High flow readings (unexpected water movement)
+   - Combinations of these factors
+
+2. Provide reasoning explaining:
+   - What patterns you observed in the sensor data
+   - Why these patterns suggest a leak
+   - Which sensor readings are most concerning
+   - The urgency level (immediate, soon, monitor)
+
+3. Recommend specific actions:
+   - Which valves to isolate (if confidence > 0.84)
+   - Whether to dispatch maintenance crew
+   - Additional sensors to monitor
+
+Respond ONLY with a JSON object in this exact format:
+{
+  "leaks": [
+    {
+      "edge_id": "edge-uuid",
+      "confidence": 0.92,
+      "urgency": "immediate|soon|monitor",
+      "reasoning": "Detailed explanation of why this pipe likely has a leak...",
+      "sensor_indicators": {
+        "acoustic": "high|normal|low and explanation",
+        "pressure": "high|normal|low and explanation",
+        "flow": "high|normal|low and explanation"
+      },
+      "recommendation": {
+        "action": "isolate|monitor|inspect",
+        "valves_to_close": ["V1", "V2"],
+        "dispatch_crew": true,
+        "estimated_location": "description"
+      }
+    }
+  ]
+}
+
+IMPORTANT: You MUST detect pipes that meet the leak indicator criteria. Look for:
+- Pressure < 55 psi (P5 has 48, P7 has 52 - BOTH ARE LEAKS!)
+- Acoustic > 5 dB (P5 has 8.5, P7 has 6.2 - BOTH ARE LEAKS!)
+- Flow > 110 L/s (P5 has 125, P7 has 115 - BOTH ARE LEAKS!)
+
+If no leaks are detected, return: {"leaks": []}
+"""
+    return prompt
+
+
+def verbose_safety_prompt(data: Dict[str, Any]) -> str:
+    """Safety monitoring prompt as first sent, from fetch_safety_data() output"""
+    prompt = """You are a water system safety monitoring AI with ZERO TOLERANCE for safety violations.
+
+Your task is to analyze real-time sensor data and identify ANY safety concerns, anomalies, or violations.
+
+Safety Thresholds:
+"""
+    thresholds = data["thresholds"]
+    prompt += f"  - Critical Low Pressure: < {thresholds['critical_low_pressure']} psi (EMERGENCY)\n"
+    prompt += f"  - Minimum Safe Pressure: {thresholds['min_safe_pressure']} psi\n"
+    prompt += f"  - Maximum Safe Pressure: {thresholds['max_safe_pressure']} psi\n\n"
+
+    prompt += "Current Sensor Readings:\n\n"
+
+    stale_ids = data.get("stale_sensor_ids", set())
+
+    for title, key in (("Pressure", "pressure_sensors"), ("Flow", "flow_sensors"), ("Acoustic", "acoustic_sensors")):
+        prompt += f"{title} Sensors:\n" if key == "pressure_sensors" else f"\n{title} Sensors:\n"
+        for sensor in data[key]:
+            if sensor["id"] in stale_ids:
+                prompt += f"  - Asset {sensor['asset_id']}: STALE (no report since {sensor['last_seen']}), value not current\n"
+                continue
+            value = sensor["value"]
+            status_flag = ""
+            if key == "pressure_sensors":
+                if value < thresholds["critical_low_pressure"]:
+                    status_flag = " ⚠️ CRITICAL"
+                elif value < thresholds["min_safe_pressure"]:
+                    status_flag = " ⚠️ LOW"
+                elif value > thresholds["max_safe_pressure"]:
+                    status_flag = " ⚠️ HIGH"
+            prompt += f"  - Asset {sensor['asset_id']}: {value} {sensor['unit']}{status_flag}\n"
+
+    prompt += "\nValves and Pumps:\n"
+    for vp in data["valves_pumps"]:
+        prompt += f"  - {vp['name']} ({vp['kind']}): {vp['status']}\n"
+
+    prompt += """
+Analyze this data for safety issues:
+
+1. **Pressure Violations**:
+   - Critical low pressure (< 30 psi) = EMERGENCY - immediate action required
+   - Low pressure (< 40 psi) = WARNING - investigate and address
+   - High pressure (> 120 psi) = WARNING - risk of pipe damage
+
+2. **System Anomalies**:
+   - Unusual flow patterns (sudden spikes or drops)
+   - Acoustic anomalies (possible leaks or equipment issues)
+   - Pump/valve malfunctions
+
+3. **Cascading Risks**:
+   - Multiple sensors showing concerning trends
+   - Patterns that could lead to system failure
+   - Contamination risks
+
+For EACH safety concern identified, provide:
+- Severity level (CRITICAL, HIGH, MEDIUM, LOW)
+- Affected components/locations
+- Detailed reasoning
+- Immediate actions required
+- Estimated time to failure (if applicable)
+
+Respond ONLY with a JSON object:
+{
+  "safety_status": "SAFE|WARNING|CRITICAL",
+  "issues": [
+    {
+      "severity": "CRITICAL|HIGH|MEDIUM|LOW",
+      "category": "pressure|flow|acoustic|equipment",
+      "affected_assets": ["asset-id-1", "asset-id-2"],
+      "description": "Clear description of the issue",
+      "reasoning": "Why this is a safety concern...",
+      "immediate_actions": ["Action 1", "Action 2"],
+      "estimated_time_to_failure": "immediate|hours|days|N/A",
+      "confidence": 0.95
+    }
+  ],
+  "overall_assessment": "Summary of system safety state",
+  "monitoring_recommendations": ["Continue monitoring X", "Increase sensor frequency for Y"]
+}
+
+If system is SAFE, return:
+{
+  "safety_status": "SAFE",
+  "issues": [],
+  "overall_assessment": "All systems operating within safe parameters",
+  "monitoring_recommendations": []
+}
+"""
+    return prompt
+
+
+def verbose_energy_prompt(data: Dict[str, Any]) -> str:
+    """Pump schedule prompt as first sent, from _fetch_optimization_data() output"""
+    prompt = """You are an energy optimization AI agent for water distribution systems.
+
+Your task is to create an optimal 24-hour pump schedule that minimizes energy costs while maintaining system pressure requirements.
+
+Current System State:
+"""
+    prompt += f"  - Current Average Pressure: {data['current_avg_pressure']:.1f} psi\n"
+    prompt += f"  - Minimum Pressure Required: {data['min_pressure_constraint']} psi\n"
+    prompt += f"  - Number of Pumps: {len(data['pumps'])}\n\n"
+
+    prompt += "Available Pumps:\n"
+    for pump in data["pumps"]:
+        prompt += f"  - {pump['name']}: Status={pump['status']}, Setpoint={pump['setpoint']}\n"
+
+    prompt += "\nEnergy Prices (24-hour forecast):\n"
+    for idx, price in enumerate(data["energy_prices"]):
+        # Use timestamp if available, otherwise use index
+        timestamp = price.get("timestamp", "")
+        # Extract hour from timestamp (format: "2025-11-12 21:00:00+00")
+        hour = timestamp.split(" ")[1].split(":")[0] if " " in timestamp else str(idx)
+        cost = price["price_per_kwh"]
+        off_peak = price.get("is_off_peak", False)
+        peak_indicator = " (OFF-PEAK)" if off_peak else " (PEAK)"
+        prompt += f"  - Hour {hour}: ${cost:.3f}/kWh{peak_indicator}\n"
+
+    prompt += """
+Create an optimal 24-hour pump schedule to minimize energy costs while:
+1. Maintaining pressure above the minimum constraint at all times
+2. Prioritizing pump operation during off-peak hours
+3. Ensuring continuous water availability
+4. Avoiding excessive pump cycling (wear and tear)
+5. Balancing cost savings vs system reliability
+
+For each pump, provide:
+1. Recommended operating schedule (hourly on/off status)
+2. Setpoint adjustments if needed
+3. Reasoning for the schedule
+4. Estimated cost savings vs baseline (running 24/7)
+5. Risk assessment (pressure dips, reliability concerns)
+
+Respond ONLY with a JSON object:
+{
+  "optimizations": [
+    {
+      "pump_name": "PUMP1",
+      "schedule": [
+        {"hour": 0, "status": "on|off", "setpoint": 50, "rationale": "..."},
+        ...
+      ],
+      "estimated_daily_savings_usd": 12.50,
+      "confidence": 0.95,
+      "reasoning": "Detailed explanation..."
+    }
+  ],
+  "overall_strategy": "High-level optimization strategy explanation",
+  "risk_assessment": "Analysis of potential risks",
+  "pressure_guarantee": "Explanation of how minimum pressure is maintained",
+  "total_estimated_savings": 25.00
+}
+"""
+    return prompt
+
+
+def verbose_fused_prompt(
+    edge_data: Dict[str, List[Dict[str, Any]]], safety_data: Dict[str, Any], leak_agent
+) -> str:
+    """Fused leak + safety prompt in the same verbose form"""
+    thresholds = safety_data["thresholds"]
+    stale_ids = safety_data.get("stale_sensor_ids", set())
+    indicators = leak_agent.leak_indicators
+
+    def reading(sensor: Dict[str, Any]) -> str:
+        if sensor["id"] in stale_ids or sensor.get("stale"):
+            return f"  - {sensor['type']}: STALE, no report since {sensor['last_seen']} - do not use this value\n"
+        flag = ""
+        if sensor["type"] == "pressure":
+            if sensor["value"] < thresholds["critical_low_pressure"]:
+                flag = " ⚠️ CRITICAL"
+            elif sensor["value"] < thresholds["min_safe_pressure"]:
+                flag = " ⚠️ LOW"
+            elif sensor["value"] > thresholds["max_safe_pressure"]:
+                flag = " ⚠️ HIGH"
+        return f"  - {sensor['type']}: {sensor['value']} {sensor['unit']}{flag}\n"
+
+    prompt = """You are a water distribution monitoring AI. Using the readings below, complete TWO tasks and answer with ONE JSON object.
+
+Sensor Readings:
+"""
+    for edge_id, sensors in edge_data.items():
+        prompt += f"\n--- Pipe {edge_id} ---\n"
+        for sensor in sensors:
+            prompt += reading(sensor)
+
+    # Sensors on nodes, tanks and pumps only matter for the safety review
+    other_sensors = [
+        sensor
+        for sensor in safety_data["pressure_sensors"] + safety_data["flow_sensors"] + safety_data["acoustic_sensors"]
+        if sensor.get("asset_type") != "edge"
+    ]
+    for sensor in other_sensors:
+        prompt += f"\n--- Asset {sensor['asset_id']} ---\n" + reading(sensor)
+
+    prompt += "\nValves and Pumps:\n"
+    for vp in safety_data["valves_pumps"]:
+        prompt += f"  - {vp['name']} ({vp['kind']}): {vp['status']}\n"
+
+    prompt += f"""
+TASK 1 - Leak detection (pipes only):
+- Leak indicators: pressure {indicators['pressure'][0]} {indicators['pressure'][1]} psi, acoustic {indicators['acoustic'][0]} {indicators['acoustic'][1]} dB, flow {indicators['flow'][0]} {indicators['flow'][1]} L/s
+- Normal: pressure 60-70 psi, acoustic 2-3 dB, flow 80-100 L/s
+- Pressure drop + acoustic spike = high confidence; any two indicators = moderate; one = low, monitor
+- Flag EVERY pipe that meets an indicator; recommend valves to isolate when confidence > {leak_agent.confidence_threshold}
+
+TASK 2 - Safety review (all sensors, zero tolerance):
+- Critical low pressure < {thresholds['critical_low_pressure']} psi (EMERGENCY); minimum safe {thresholds['min_safe_pressure']} psi; maximum safe {thresholds['max_safe_pressure']} psi
+- Also look for unusual flow, acoustic anomalies, pump/valve problems and cascading risks
+
+Respond ONLY with a JSON object in this exact format:
+{{
+  "leaks": [
+    {{
+      "edge_id": "edge-uuid",
+      "confidence": 0.92,
+      "urgency": "immediate|soon|monitor",
+      "reasoning": "Why this pipe likely has a leak...",
+      "sensor_indicators": {{"acoustic": "...", "pressure": "...", "flow": "..."}},
+      "recommendation": {{"action": "isolate|monitor|inspect", "valves_to_close": ["V1"], "dispatch_crew": true, "estimated_location": "description"}}
+    }}
+  ],
+  "safety": {{
+    "safety_status": "SAFE|WARNING|CRITICAL",
+    "issues": [
+      {{
+        "severity": "CRITICAL|HIGH|MEDIUM|LOW",
+        "category": "pressure|flow|acoustic|equipment",
+        "affected_assets": ["asset-id"],
+        "description": "...",
+        "reasoning": "...",
+        "immediate_actions": ["..."],
+        "estimated_time_to_failure": "immediate|hours|days|N/A",
+        "confidence": 0.95
+      }}
+    ],
+    "overall_assessment": "Summary of system safety state",
+    "monitoring_recommendations": ["..."]
+  }}
+}}
+
+If no leaks are detected, "leaks" is []. If the system is safe, "safety_status" is "SAFE" with no issues.
+"""
+    return prompt
+
+
+def print_row(name, before, after, stats=None):
+    saved = 100 * (1 - after / before) if before else 0
+    extra = ""
+    if stats:
+        extra = f"  prefix {stats['prefix_tokens']:,}, budget {stats['budget']:,}"
+        if stats["rows_omitted"]:
+            extra += f", {stats['rows_omitted']} rows omitted"
+    print(f"{name:28s} {before:10,} {after:10,} {saved:7.0f}%{extra}")
+
+
+async def main():
+    coordinator = AgentCoordinator()
+    leak_agent = coordinator.leak_agent
+    safety_agent = coordinator.safety_agent
+    energy_agent = coordinator.energy_agent
+
+    print("=" * 80)
+    print("📸 Taking network snapshot...")
+    snapshot = await take_snapshot()
+    edge_data = await leak_agent._fetch_sensor_data(snapshot)
+    safety_data = await safety_agent.fetch_safety_data(snapshot)
+    energy_data = await energy_agent._fetch_optimization_data(snapshot)
+    print(f"Pipes: {len(edge_data)}, sensors: {len(snapshot['sensors'])}, prices: {len(energy_data['energy_prices'])}")
+    print(f"Tokenizer: {'tiktoken o200k_base' if tiktoken is not None else 'estimate (install tiktoken for exact counts)'}")
+
+    leak_prompt, _, leak_stats = leak_agent._build_prompt(edge_data)
+    safety_prompt, _, safety_stats = safety_agent._build_prompt(safety_data)
+    fused_prompt, _, _, fused_stats = coordinator.fused.build_prompt(edge_data, safety_data)
+    rows = {
+        "leak": (verbose_leak_prompt(edge_data), leak_prompt, leak_stats),
+        "safety": (verbose_safety_prompt(safety_data), safety_prompt, safety_stats),
+        "fused": (verbose_fused_prompt(edge_data, safety_data, leak_agent), fused_prompt, fused_stats),
+    }
+    if energy_data.get("energy_prices"):
+        energy_prompt, energy_stats = energy_agent._build_prompt(energy_data)
+        rows["energy"] = (verbose_energy_prompt(energy_data), energy_prompt, energy_stats)
+
+    print("\n" + "=" * 80)
+    print(f"{'prompt':28s} {'before':>10s} {'after':>10s} {'saved':>8s}")
+    tokens = {}
+    for name, (verbose, compact, stats) in rows.items():
+        tokens[name] = (count_tokens(verbose), stats["prompt_tokens"])
+        print_row(name, *tokens[name], stats)
+
+    # A coordinated run sends leak + safety enrichment (split) or the fused
+    # prompt, plus the energy prompt
+    energy = tokens.get("energy", (0, 0))
+    split = [tokens["leak"][i] + tokens["safety"][i] + energy[i] for i in (0, 1)]
+    fused = [tokens["fused"][i] + energy[i] for i in (0, 1)]
+    print("-" * 80)
+    print_row("coordinated run (split)", *split)
+    print_row("coordinated run (fused)", *fused)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
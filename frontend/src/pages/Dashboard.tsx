@@ -52,9 +52,11 @@ const Dashboard = () => {
       const { data } = await (supabase as any)
         .from('demand_forecasts')
         .select('*')
-        .order('hour', { ascending: true })
+        .eq('zone', 'system')
+        .order('forecast_date', { ascending: false })
+        .order('hour', { ascending: false })
         .limit(24);
-      return data?.map((d: any) => ({ hour: d.hour, demand: d.predicted_demand })) || [];
+      return data?.reverse().map((d: any) => ({ hour: d.hour, demand: d.predicted_demand })) || [];
     },
   });
 
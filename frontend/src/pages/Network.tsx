@@ -1,5 +1,5 @@
 import { useEffect, useState } from 'react';
-import { useQuery } from '@tanstack/react-query';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
 import { supabase } from '@/integrations/supabase/client';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
@@ -34,6 +34,8 @@ const Network = () => {
 
   // Fetch network topology with incident status from backend API
   const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
+  const queryClient = useQueryClient();
+  const [streaming, setStreaming] = useState(false);
   const { data: topology } = useQuery({
     queryKey: ['network-topology'],
     queryFn: async () => {
@@ -41,9 +43,49 @@ const Network = () => {
       const data = await response.json();
       return data;
     },
-    refetchInterval: 30000, // Refetch every 30 seconds for real-time updates
+    // Live updates come from /network/stream; poll only while it is down
+    refetchInterval: streaming ? false : 30000,
   });
 
+  // Apply pushed map changes to the cached topology
+  useEffect(() => {
+    const source = new EventSource(`${API_URL}/network/stream`);
+    const update = (apply: (topology: any, data: any) => any) => (event: MessageEvent) => {
+      const data = JSON.parse(event.data);
+      queryClient.setQueryData(['network-topology'], (old: any) => (old ? apply(old, data) : old));
+    };
+
+    source.addEventListener('snapshot', (event: MessageEvent) => {
+      queryClient.setQueryData(['network-topology'], JSON.parse(event.data));
+      setStreaming(true);
+    });
+    source.addEventListener('edge', update((old, data) => {
+      const { edge_id, changes, previous_status, ...fields } = data;
+      const known = old.edges.some((edge: Edge) => edge.id === edge_id);
+      return {
+        ...old,
+        edges: known
+          ? old.edges.map((edge: Edge) => (edge.id === edge_id ? { ...edge, ...fields } : edge))
+          : [...old.edges, fields],
+      };
+    }));
+    source.addEventListener('node', update((old, node) => ({
+      ...old,
+      nodes: old.nodes.some((n: Node) => n.id === node.id)
+        ? old.nodes.map((n: Node) => (n.id === node.id ? node : n))
+        : [...old.nodes, node],
+    })));
+    source.addEventListener('removed', update((old, { kind, id }) => ({
+      ...old,
+      [kind]: old[kind].filter((item: { id: string }) => item.id !== id),
+    })));
+    source.addEventListener('summary', update((old, summary) => ({ ...old, incident_summary: summary })));
+    // EventSource reconnects by itself and receives a fresh snapshot
+    source.onerror = () => setStreaming(false);
+
+    return () => source.close();
+  }, [API_URL, queryClient]);
+
   const nodes = topology?.nodes as Node[] || [];
   const edges = topology?.edges as Edge[] || [];
 
@@ -0,0 +1,3 @@
+-- Index energy prices by timestamp so ordered, windowed price queries
+-- (order=timestamp, timestamp=gte/lt, limit) are served by an index scan
+CREATE INDEX IF NOT EXISTS idx_energy_prices_timestamp ON public.energy_prices(timestamp);
@@ -0,0 +1,79 @@
+-- Migration: Sensor readings history, hourly rollups and network zones
+-- Purpose: Give analytics (NRW, demand forecasting) a time series to work from
+-- instead of only the latest value held in sensors
+
+-- 1. Raw readings, one row per sensor value change
+CREATE TABLE IF NOT EXISTS public.sensor_readings (
+  id BIGSERIAL PRIMARY KEY,
+  sensor_id UUID NOT NULL REFERENCES public.sensors(id) ON DELETE CASCADE,
+  value FLOAT NOT NULL,
+  recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_time ON public.sensor_readings(sensor_id, recorded_at DESC);
+
+-- 2. Hourly rollups, maintained incrementally as readings arrive
+CREATE TABLE IF NOT EXISTS public.sensor_readings_hourly (
+  sensor_id UUID NOT NULL REFERENCES public.sensors(id) ON DELETE CASCADE,
+  hour TIMESTAMPTZ NOT NULL,
+  avg_value FLOAT NOT NULL,
+  min_value FLOAT NOT NULL,
+  max_value FLOAT NOT NULL,
+  sample_count INTEGER NOT NULL,
+  PRIMARY KEY (sensor_id, hour)
+);
+
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_hourly_hour ON public.sensor_readings_hourly(hour);
+
+-- Record a reading whenever a sensor value is written
+CREATE OR REPLACE FUNCTION public.record_sensor_reading()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.value IS NOT NULL AND (TG_OP = 'INSERT' OR NEW.value IS DISTINCT FROM OLD.value OR NEW.last_seen IS DISTINCT FROM OLD.last_seen) THEN
+    INSERT INTO public.sensor_readings (sensor_id, value, recorded_at)
+    VALUES (NEW.id, NEW.value, COALESCE(NEW.last_seen, NOW()));
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER record_sensor_reading_on_write
+  AFTER INSERT OR UPDATE OF value, last_seen ON public.sensors
+  FOR EACH ROW EXECUTE FUNCTION public.record_sensor_reading();
+
+-- Fold each new reading into its hourly rollup
+CREATE OR REPLACE FUNCTION public.rollup_sensor_reading()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  INSERT INTO public.sensor_readings_hourly AS r (sensor_id, hour, avg_value, min_value, max_value, sample_count)
+  VALUES (NEW.sensor_id, date_trunc('hour', NEW.recorded_at), NEW.value, NEW.value, NEW.value, 1)
+  ON CONFLICT (sensor_id, hour) DO UPDATE SET
+    avg_value = (r.avg_value * r.sample_count + EXCLUDED.avg_value) / (r.sample_count + 1),
+    min_value = LEAST(r.min_value, EXCLUDED.min_value),
+    max_value = GREATEST(r.max_value, EXCLUDED.max_value),
+    sample_count = r.sample_count + 1;
+  RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER rollup_sensor_reading_on_insert
+  AFTER INSERT ON public.sensor_readings
+  FOR EACH ROW EXECUTE FUNCTION public.rollup_sensor_reading();
+
+-- 3. District (zone) membership for nodes; edges belong to the zone of their downstream node
+ALTER TABLE public.nodes ADD COLUMN IF NOT EXISTS zone TEXT;
+CREATE INDEX IF NOT EXISTS idx_nodes_zone ON public.nodes(zone);
+
+-- Enable Row Level Security
+ALTER TABLE public.sensor_readings ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sensor_readings_hourly ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can read sensor_readings" ON public.sensor_readings FOR SELECT TO authenticated USING (true);
+CREATE POLICY "Authenticated users can read sensor_readings_hourly" ON public.sensor_readings_hourly FOR SELECT TO authenticated USING (true);
+
+COMMENT ON TABLE public.sensor_readings IS 'History of sensor values, recorded by trigger on sensors';
+COMMENT ON TABLE public.sensor_readings_hourly IS 'Hourly avg/min/max per sensor, maintained by trigger on sensor_readings';
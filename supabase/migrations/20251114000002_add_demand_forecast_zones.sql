@@ -0,0 +1,13 @@
+-- Migration: Per-zone demand forecasts with prediction intervals
+-- Purpose: The statistical forecaster writes one 24-hour forecast per
+-- district (plus "system") in a single bulk upsert
+
+ALTER TABLE demand_forecasts ADD COLUMN IF NOT EXISTS zone TEXT NOT NULL DEFAULT 'system';
+ALTER TABLE demand_forecasts ADD COLUMN IF NOT EXISTS lower_bound FLOAT;
+ALTER TABLE demand_forecasts ADD COLUMN IF NOT EXISTS upper_bound FLOAT;
+ALTER TABLE demand_forecasts ADD COLUMN IF NOT EXISTS model TEXT;
+
+-- One row per (date, hour, zone) instead of per (date, hour)
+ALTER TABLE demand_forecasts DROP CONSTRAINT IF EXISTS demand_forecasts_forecast_date_hour_key;
+ALTER TABLE demand_forecasts
+  ADD CONSTRAINT demand_forecasts_forecast_date_hour_zone_key UNIQUE (forecast_date, hour, zone);
@@ -0,0 +1,38 @@
+-- Migration: Retention for raw sensor readings
+-- Purpose: sensor_readings gets a row for every sensor write and would grow
+-- without bound. Analytics only read sensor_readings_hourly, which the
+-- rollup trigger fills as each reading is inserted, so raw rows can be
+-- pruned after a few days without changing NRW or forecasts. Rollups are kept.
+
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_recorded_at ON public.sensor_readings(recorded_at);
+
+-- Delete raw readings older than keep; returns the number of rows deleted.
+-- Run manually with: SELECT public.prune_sensor_readings(INTERVAL '7 days');
+CREATE OR REPLACE FUNCTION public.prune_sensor_readings(keep INTERVAL DEFAULT INTERVAL '7 days')
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  deleted BIGINT;
+BEGIN
+  DELETE FROM public.sensor_readings WHERE recorded_at < NOW() - keep;
+  GET DIAGNOSTICS deleted = ROW_COUNT;
+  RETURN deleted;
+END;
+$$;
+
+-- Maintenance only; not callable through the API
+REVOKE EXECUTE ON FUNCTION public.prune_sensor_readings(INTERVAL) FROM PUBLIC, anon, authenticated;
+
+-- Prune nightly where pg_cron is available (Supabase); elsewhere schedule
+-- the SELECT above externally
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_cron') THEN
+    CREATE EXTENSION IF NOT EXISTS pg_cron;
+    PERFORM cron.schedule('prune-sensor-readings', '17 3 * * *', 'SELECT public.prune_sensor_readings()');
+  END IF;
+END;
+$$;
+
+COMMENT ON FUNCTION public.prune_sensor_readings(INTERVAL) IS 'Deletes sensor_readings older than keep; hourly rollups are unaffected';